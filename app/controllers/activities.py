@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.models import get_db
-from app.middleware.dependencies import require_minecraft_cookie
+from app.models.entities import World
+from app.middleware.dependencies import require_minecraft_cookie, check_realm_owner
+from app.helpers.activity_helper import ActivityHelper
 
 router = APIRouter()
 
@@ -17,9 +19,11 @@ async def get_live_player_list(
 
 @router.get("/{world_id}")
 async def get_world_activity(
-    world_id: int,
-    cookie: str = Depends(require_minecraft_cookie),
+    world: World = Depends(check_realm_owner),
     db: Session = Depends(get_db)
 ):
     """Get activity for a specific world"""
-    return {"playerActivityDto": {"profileUuid": "", "joinTime": 0, "leaveTime": 0}}
+    return {
+        "periodInMillis": int(ActivityHelper.ACTIVITY_PERIOD.total_seconds() * 1000),
+        "playerActivityDto": ActivityHelper.get_activity(db, world.Id)
+    }
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.models import get_db
 from app.middleware.dependencies import require_admin_key
 from app.helpers.config_helper import ConfigHelper
+from app.schemas.responses import ConfigurationUpdateResponse, ConfigurationChangeResponse
 
 router = APIRouter()
 
@@ -16,13 +17,19 @@ async def get_configuration(
     return ConfigHelper.get_config()
 
 
-@router.post("")
+@router.post("", response_model=ConfigurationUpdateResponse)
 async def update_configuration(
     config: dict,
     admin_key: str = Depends(require_admin_key),
     db: Session = Depends(get_db)
 ):
     """Update configuration"""
-    for key, value in config.items():
-        ConfigHelper.set_setting(db, key, value)
-    return {"success": True}
+    try:
+        changes = ConfigHelper.set_settings(db, config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ConfigurationUpdateResponse(changes=[
+        ConfigurationChangeResponse(key=change.key, oldValue=change.old_value, newValue=change.new_value)
+        for change in changes
+    ])
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.middleware.dependencies import require_admin_key
+from app.helpers.metrics import Metrics
+
+router = APIRouter()
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics(
+    admin_key: str = Depends(require_admin_key)
+):
+    """Get metrics of this worker in the Prometheus text format"""
+    return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,28 +1,177 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Iterator, Optional, Set
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import Select, and_, or_, select
 from sqlalchemy.orm import Session
-from app.models import get_db
-from app.models.entities import World
+from app.models import get_db, SessionLocal
+from app.models.entities import World, Subscription, VolumeUsage
+from app.models.enums import StateEnum, SettingsEnum
 from app.middleware.dependencies import require_admin_key
+from app.helpers.config_helper import ConfigHelper
+from app.helpers.container_state import ContainerState
+from app.helpers.disk_usage_helper import MIB
+from app.helpers.region_helper import RegionHelper
+from app.helpers.stats_collector import StatsCollector
 
 router = APIRouter()
 
+SUBSCRIPTION_FILTERS = ("active", "expired", "none")
+EXPORT_BATCH_SIZE = 1000
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _build_query(
+    running: Set[int],
+    owner: Optional[str],
+    name_prefix: Optional[str],
+    state: Optional[StateEnum],
+    subscription: Optional[str]
+) -> Select:
+    """Select the listed columns only, so rows are never hydrated into World objects
+    
+    Disk usage is the last measurement stored by DiskUsageHelper, so listing
+    never touches the volumes.
+    """
+    query = select(
+        World.Id,
+        World.Owner,
+        World.OwnerUUID,
+        World.Name,
+        World.Motd,
+        World.RegionSelectionPreference,
+        Subscription.ExpiresAt,
+        Subscription.DiskQuota,
+        VolumeUsage.Bytes.label("DiskUsage"),
+        VolumeUsage.MeasuredAt.label("DiskMeasuredAt")
+    ).outerjoin(Subscription, Subscription.Id == World.SubscriptionId).outerjoin(
+        VolumeUsage, VolumeUsage.WorldId == World.Id
+    )
+    
+    if owner:
+        query = query.where(or_(World.Owner == owner, World.OwnerUUID == owner))
+    if name_prefix:
+        query = query.where(World.Name.like(f"{_escape_like(name_prefix)}%", escape="\\"))
+    
+    if state == StateEnum.UNINITIALIZED:
+        query = query.where(World.Name.is_(None))
+    elif state == StateEnum.OPEN:
+        query = query.where(World.Id.in_(running))
+    elif state == StateEnum.CLOSED:
+        query = query.where(and_(World.Name.is_not(None), World.Id.not_in(running)))
+    
+    now = datetime.now()
+    if subscription == "none":
+        query = query.where(World.SubscriptionId.is_(None))
+    elif subscription == "active":
+        query = query.where(Subscription.ExpiresAt >= now)
+    elif subscription == "expired":
+        query = query.where(Subscription.ExpiresAt < now)
+    
+    return query.order_by(World.Id)
+
+
+def _row_to_dict(row, running: Set[int]) -> dict:
+    if row.Name is None:
+        state = StateEnum.UNINITIALIZED.value
+    elif row.Id in running:
+        state = StateEnum.OPEN.value
+    else:
+        state = StateEnum.CLOSED.value
+    
+    expires_at = row.ExpiresAt
+    region = RegionHelper.recommend(row.RegionSelectionPreference)
+    quota = row.DiskQuota if row.DiskQuota is not None else ConfigHelper.get_setting(SettingsEnum.RealmDiskQuota.value)
+    return {
+        "id": row.Id,
+        "owner": row.Owner,
+        "ownerUUID": row.OwnerUUID,
+        "name": row.Name,
+        "motd": row.Motd,
+        "state": state,
+        "expiresAt": expires_at.isoformat() if expires_at else None,
+        "expired": expires_at < datetime.now() if expires_at else None,
+        "region": region.name if region else None,
+        "diskUsage": row.DiskUsage,
+        "diskUsageMeasuredAt": row.DiskMeasuredAt.isoformat() if row.DiskMeasuredAt else None,
+        "diskQuota": quota * MIB if quota else None
+    }
+
 
 @router.get("")
 async def get_all_servers(
+    after: Optional[int] = Query(None, description="Id of the last server of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    owner: Optional[str] = Query(None, description="Owner name or UUID"),
+    name_prefix: Optional[str] = None,
+    state: Optional[StateEnum] = None,
+    subscription: Optional[str] = Query(None, pattern=f"^({'|'.join(SUBSCRIPTION_FILTERS)})$"),
     admin_key: str = Depends(require_admin_key),
     db: Session = Depends(get_db)
 ):
-    """Get all servers (admin)"""
-    worlds = db.query(World).all()
-    return {
-        "servers": [
-            {
-                "id": world.Id,
-                "owner": world.Owner,
-                "ownerUUID": world.OwnerUUID,
-                "name": world.Name,
-                "motd": world.Motd
-            }
-            for world in worlds
-        ]
-    }
+    """Get a page of servers ordered by id (admin)"""
+    running = await ContainerState.get_running()
+    query = _build_query(running, owner, name_prefix, state, subscription)
+    if after is not None:
+        query = query.where(World.Id > after)
+    
+    rows = db.execute(query.limit(limit)).all()
+    servers = [_row_to_dict(row, running) for row in rows]
+    return ORJSONResponse({
+        "servers": servers,
+        "next": servers[-1]["id"] if len(servers) == limit else None
+    })
+
+
+@router.get("/export")
+async def export_servers(
+    owner: Optional[str] = Query(None, description="Owner name or UUID"),
+    name_prefix: Optional[str] = None,
+    state: Optional[StateEnum] = None,
+    subscription: Optional[str] = Query(None, pattern=f"^({'|'.join(SUBSCRIPTION_FILTERS)})$"),
+    admin_key: str = Depends(require_admin_key)
+):
+    """Stream all matching servers as newline-delimited JSON (admin)"""
+    running = await ContainerState.get_running()
+    query = _build_query(running, owner, name_prefix, state, subscription)
+    
+    def generate() -> Iterator[bytes]:
+        # The request's session is closed before streaming starts, so use our own
+        db = SessionLocal()
+        try:
+            after = None
+            while True:
+                page = query if after is None else query.where(World.Id > after)
+                rows = db.execute(page.limit(EXPORT_BATCH_SIZE)).all()
+                if not rows:
+                    return
+                yield b"".join(
+                    orjson.dumps(_row_to_dict(row, running), option=orjson.OPT_APPEND_NEWLINE)
+                    for row in rows
+                )
+                if len(rows) < EXPORT_BATCH_SIZE:
+                    return
+                after = rows[-1].Id
+        finally:
+            db.close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/stats")
+async def get_all_server_stats(admin_key: str = Depends(require_admin_key)):
+    """Get the recent resource use of every running server (admin)"""
+    return ORJSONResponse({"servers": StatsCollector.get_all()})
+
+
+@router.get("/{world_id}/stats")
+async def get_server_stats(world_id: int, admin_key: str = Depends(require_admin_key)):
+    """Get the buffered resource samples of a running server (admin)"""
+    summary = StatsCollector.get_summary(world_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No stats for this server")
+    return ORJSONResponse({"summary": summary, "samples": StatsCollector.get_window(world_id)})
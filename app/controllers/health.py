@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+class StartupState:
+    """Tracks which startup dependencies are ready"""
+    database: bool = False
+    docker: bool = False
+    errors: dict = {}
+    
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls.database and cls.docker
+
+
+@router.get("/live")
+async def live():
+    """The process is up and serving requests"""
+    return {"status": "up"}
+
+
+@router.get("/ready")
+async def ready():
+    """The database and Docker checks have completed"""
+    body = {
+        "status": "ready" if StartupState.is_ready() else "starting",
+        "database": StartupState.database,
+        "docker": StartupState.docker,
+        "errors": StartupState.errors
+    }
+    return JSONResponse(status_code=200 if StartupState.is_ready() else 503, content=body)
@@ -1,24 +1,188 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import uuid
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session, joinedload
 from app.models import get_db
-from app.middleware.dependencies import require_minecraft_cookie
+from app.models.entities import World, Player, Invite
+from app.schemas.requests import PlayerRequest
+from app.schemas.responses import InviteList, PendingInviteResponse, PendingInviteCountResponse
+from app.middleware.dependencies import get_player_info, check_realm_owner
+from app.helpers.invite_helper import InviteHelper
+from app.helpers.version_helper import VersionHelper
 
 router = APIRouter()
 
 
-@router.get("/pending")
+@router.get("/pending", response_model=InviteList)
 async def get_pending_invites(
-    cookie: str = Depends(require_minecraft_cookie),
+    player_info: dict = Depends(get_player_info),
     db: Session = Depends(get_db)
 ):
     """Get pending invites"""
-    return {"invites": []}
+    invites = db.query(Invite).filter(
+        Invite.RecipientUuid == player_info["uuid"]
+    ).options(
+        joinedload(Invite.World)
+    ).order_by(Invite.Date.desc()).all()
+    
+    return InviteList(invites=[
+        PendingInviteResponse(
+            invitationId=invite.InvitationId,
+            worldName=invite.World.Name,
+            worldOwnerName=invite.World.Owner,
+            worldOwnerUuid=invite.World.OwnerUUID,
+            date=int(invite.Date.timestamp() * 1000) if invite.Date else 0
+        )
+        for invite in invites
+        if invite.World  # Hidden once its world is deleted, until the invite is removed
+    ])
 
 
-@router.get("/count/pending")
+@router.get("/count/pending", response_model=PendingInviteCountResponse)
 async def get_pending_invites_count(
-    cookie: str = Depends(require_minecraft_cookie),
+    player_info: dict = Depends(get_player_info),
     db: Session = Depends(get_db)
 ):
     """Get count of pending invites"""
-    return {"count": 0}
+    return PendingInviteCountResponse(count=InviteHelper.get_pending_count(db, player_info["uuid"]))
+
+
+@router.post("/{world_id}")
+async def invite_player(
+    world_id: int,
+    request: PlayerRequest,
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Invite a player to a world"""
+    if request.Uuid == world.OwnerUUID:
+        raise HTTPException(status_code=400, detail="You cannot invite yourself")
+    
+    existing = db.query(Player).filter(
+        Player.WorldId == world_id,
+        Player.Uuid == request.Uuid
+    ).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Player already invited")
+    
+    player = Player(
+        Name=request.Name,
+        Uuid=request.Uuid,
+        Operator=request.Operator,
+        Accepted=False,
+        Online=False,
+        Permission=request.Permission,
+        WorldId=world_id
+    )
+    invite = Invite(
+        InvitationId=str(uuid.uuid4()),
+        RecipientUuid=request.Uuid,
+        WorldId=world_id
+    )
+    db.add(player)
+    db.add(invite)
+    VersionHelper.world_changed(db, world, [request.Uuid])
+    db.commit()
+    
+    InviteHelper.invite_created(db, request.Uuid)
+    return {"success": True}
+
+
+@router.put("/accept/{invitation_id}")
+async def accept_invite(
+    invitation_id: str,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Accept a pending invite"""
+    invite = db.query(Invite).filter(
+        Invite.InvitationId == invitation_id,
+        Invite.RecipientUuid == player_info["uuid"]
+    ).first()
+    if not invite:
+        raise HTTPException(status_code=404, detail="Invite not found")
+    
+    player = db.query(Player).filter(
+        Player.WorldId == invite.WorldId,
+        Player.Uuid == invite.RecipientUuid
+    ).first()
+    if player:
+        player.Accepted = True
+    
+    VersionHelper.world_changed(db, invite.World)
+    db.delete(invite)
+    db.commit()
+    
+    InviteHelper.invite_removed(db, player_info["uuid"])
+    return {"success": True}
+
+
+@router.put("/reject/{invitation_id}")
+async def reject_invite(
+    invitation_id: str,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Reject a pending invite"""
+    invite = db.query(Invite).filter(
+        Invite.InvitationId == invitation_id,
+        Invite.RecipientUuid == player_info["uuid"]
+    ).first()
+    if not invite:
+        raise HTTPException(status_code=404, detail="Invite not found")
+    
+    db.query(Player).filter(
+        Player.WorldId == invite.WorldId,
+        Player.Uuid == invite.RecipientUuid,
+        Player.Accepted == False
+    ).delete(synchronize_session=False)
+    VersionHelper.world_changed(db, invite.World, [invite.RecipientUuid])
+    db.delete(invite)
+    db.commit()
+    
+    InviteHelper.invite_removed(db, player_info["uuid"])
+    return {"success": True}
+
+
+@router.delete("/{world_id}/invite/{player_uuid}")
+async def remove_player(
+    world_id: int,
+    player_uuid: str,
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Remove a player or revoke their pending invite"""
+    VersionHelper.world_changed(db, world, [player_uuid])
+    removed_invites = db.query(Invite).filter(
+        Invite.WorldId == world_id,
+        Invite.RecipientUuid == player_uuid
+    ).delete(synchronize_session=False)
+    db.query(Player).filter(
+        Player.WorldId == world_id,
+        Player.Uuid == player_uuid
+    ).delete(synchronize_session=False)
+    db.commit()
+    
+    if removed_invites:
+        InviteHelper.invite_removed(db, player_uuid, removed_invites)
+    return {"success": True}
+
+
+@router.delete("/{world_id}")
+async def leave_world(
+    world_id: int,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Leave a world the player is a member of"""
+    world = db.query(World).filter(World.Id == world_id).first()
+    if world:
+        VersionHelper.world_changed(db, world, [player_info["uuid"]])
+    deleted = db.query(Player).filter(
+        Player.WorldId == world_id,
+        Player.Uuid == player_info["uuid"]
+    ).delete(synchronize_session=False)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="You are not a member of this world")
+    
+    db.commit()
+    return {"success": True}
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends
+import time
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from app.models import get_db
 from app.middleware.dependencies import require_minecraft_cookie
+from app.helpers.version_helper import make_etag, not_modified, with_etag
 
 router = APIRouter()
 
@@ -35,9 +38,20 @@ async def check_tos_agreed(
 
 @router.get("/v1/news")
 async def get_news(
+    request: Request,
     cookie: str = Depends(require_minecraft_cookie),
     db: Session = Depends(get_db)
 ):
     """Get news"""
     from app.helpers.config_helper import ConfigHelper
-    return {"newsLink": ConfigHelper.get_setting("NewsLink") or ""}
+    
+    started = time.perf_counter()
+    news_link = ConfigHelper.get_setting("NewsLink") or ""
+    # Tagged by the link itself, as the configuration version differs between workers
+    etag = make_etag("news", news_link)
+    cached = not_modified(request, etag, "news")
+    if cached:
+        return cached
+    
+    content = {"newsLink": news_link}
+    return with_etag(ORJSONResponse(content), etag, "news", started)
@@ -1,15 +1,51 @@
-from fastapi import APIRouter, Depends
+import time
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from app.models import get_db
-from app.middleware.dependencies import require_minecraft_cookie
+from app.schemas.requests import NotificationUuidsRequest
+from app.schemas.responses import NotificationsResponse
+from app.middleware.dependencies import get_player_info
+from app.helpers.notification_helper import NotificationHelper
+from app.helpers.version_helper import make_etag, not_modified, with_etag
 
 router = APIRouter()
 
 
-@router.get("")
+@router.get("", response_model=NotificationsResponse)
 async def get_notifications(
-    cookie: str = Depends(require_minecraft_cookie),
+    request: Request,
+    player_info: dict = Depends(get_player_info),
     db: Session = Depends(get_db)
 ):
     """Get notifications"""
-    return {"notifications": []}
+    started = time.perf_counter()
+    etag = make_etag("notifications", NotificationHelper.get_version(db, player_info["uuid"]))
+    cached = not_modified(request, etag, "notifications")
+    if cached:
+        return cached
+    
+    content = {"notifications": NotificationHelper.get_unseen(db, player_info["uuid"])}
+    return with_etag(ORJSONResponse(content), etag, "notifications", started)
+
+
+@router.post("/seen")
+async def mark_notifications_seen(
+    request: NotificationUuidsRequest,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Mark notifications as seen"""
+    NotificationHelper.mark_seen(db, player_info["uuid"], request.uuidList)
+    return {"success": True}
+
+
+@router.post("/dismiss")
+async def dismiss_notifications(
+    request: NotificationUuidsRequest,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Dismiss notifications"""
+    NotificationHelper.dismiss(db, player_info["uuid"], request.uuidList)
+    return {"success": True}
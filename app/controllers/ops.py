@@ -1,16 +1,47 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.models import get_db
-from app.middleware.dependencies import require_minecraft_cookie
+from app.models.entities import World
+from app.schemas.responses import OpsResponse
+from app.middleware.dependencies import check_realm_owner
+from app.helpers.ops_helper import OpsHelper
 
 router = APIRouter()
 
 
-@router.get("/{world_id}")
+@router.get("/{world_id}", response_model=OpsResponse)
 async def get_ops(
     world_id: int,
-    cookie: str = Depends(require_minecraft_cookie),
+    world: World = Depends(check_realm_owner),
     db: Session = Depends(get_db)
 ):
     """Get operators for a world"""
-    return {"ops": []}
+    return OpsResponse(ops=OpsHelper.get_ops(db, world_id))
+
+
+@router.post("/{world_id}/{player_uuid}", response_model=OpsResponse)
+async def op_player(
+    world_id: int,
+    player_uuid: str,
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Make a player an operator"""
+    if not OpsHelper.set_operator(db, world_id, player_uuid, True):
+        raise HTTPException(status_code=404, detail="Player not found")
+    
+    return OpsResponse(ops=OpsHelper.get_ops(db, world_id))
+
+
+@router.delete("/{world_id}/{player_uuid}", response_model=OpsResponse)
+async def deop_player(
+    world_id: int,
+    player_uuid: str,
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Remove a player's operator status"""
+    if not OpsHelper.set_operator(db, world_id, player_uuid, False):
+        raise HTTPException(status_code=404, detail="Player not found")
+    
+    return OpsResponse(ops=OpsHelper.get_ops(db, world_id))
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.models import get_db
+from fastapi.responses import ORJSONResponse
 from app.middleware.dependencies import require_minecraft_cookie
+from app.helpers.region_helper import RegionHelper
+from app.schemas.responses import RegionDataListResponse
 
 router = APIRouter()
 
 
-@router.get("/ping/stat")
+@router.get("/ping/stat", response_model=RegionDataListResponse, response_class=ORJSONResponse)
 async def ping_regions(
-    cookie: str = Depends(require_minecraft_cookie),
-    db: Session = Depends(get_db)
+    cookie: str = Depends(require_minecraft_cookie)
 ):
-    """Ping regions"""
-    return {"regions": []}
+    """Get the measured service quality of every region"""
+    return ORJSONResponse({"regions": RegionHelper.get_regions()})
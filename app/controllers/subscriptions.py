@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends
+import time
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from app.models import get_db
+from app.models.entities import World, Subscription
 from app.middleware.dependencies import require_minecraft_cookie
+from app.helpers.subscription_helper import SubscriptionHelper
+from app.helpers.version_helper import VersionHelper, make_etag, not_modified, with_etag
 
 router = APIRouter()
 
@@ -9,19 +14,27 @@ router = APIRouter()
 @router.get("/{world_id}")
 async def get_subscription(
     world_id: int,
+    request: Request,
     cookie: str = Depends(require_minecraft_cookie),
     db: Session = Depends(get_db)
 ):
     """Get subscription for a world"""
-    from app.models.entities import World
-    from datetime import datetime, timedelta
+    started = time.perf_counter()
+    etag = make_etag("subscription", world_id, VersionHelper.get_world_version(world_id))
+    cached = not_modified(request, etag, "subscription")
+    if cached:
+        return cached
     
-    world = db.query(World).filter(World.Id == world_id).first()
-    if not world or not world.Subscription:
-        return {"subscriptionType": "NORMAL", "daysLeft": 30}
+    # One query for just the subscription columns, without loading the world
+    subscription = db.query(Subscription).join(
+        World, World.SubscriptionId == Subscription.Id
+    ).filter(World.Id == world_id).first()
+    if not subscription:
+        content = {"subscriptionType": "NORMAL", "daysLeft": 30}
+    else:
+        content = {
+            "subscriptionType": subscription.SubscriptionType,
+            "daysLeft": max(0, SubscriptionHelper.days_left(subscription))
+        }
     
-    days_left = (world.Subscription.StartDate + timedelta(days=30) - datetime.now()).days
-    return {
-        "subscriptionType": world.Subscription.SubscriptionType,
-        "daysLeft": max(0, days_left)
-    }
+    return with_etag(ORJSONResponse(content), etag, "subscription", started)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.models import get_db
-from app.middleware.dependencies import require_minecraft_cookie
+from app.models.entities import World
+from app.middleware.dependencies import check_realm_owner
+from app.helpers.disk_usage_helper import DiskUsageHelper
 
 router = APIRouter()
 
@@ -10,8 +12,14 @@ router = APIRouter()
 async def upload_world(
     world_id: int,
     slot_id: int,
-    cookie: str = Depends(require_minecraft_cookie),
+    world: World = Depends(check_realm_owner),
     db: Session = Depends(get_db)
 ):
-    """Upload world"""
+    """Upload world, refused once the realm's volume is over its quota
+    
+    Uploads are not implemented: no upload URL is handed out and nothing is
+    written, so the quota check only refuses the request itself.
+    """
+    if not DiskUsageHelper.has_room(db, world):
+        raise HTTPException(status_code=403, detail="Realm is over its storage quota")
     return {"uploadUrl": ""}
@@ -1,32 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.orm import Session, joinedload
 from typing import List
-from datetime import datetime, timedelta
 
 from app.models import get_db
 from app.models.entities import World, Player, Slot
-from app.models.enums import GamemodeEnum, CompatibilityEnum, SettingsEnum, WorldTypeEnum
-from app.schemas.responses import WorldResponse, ServersResponse, SlotResponse, PlayerResponse
-from app.schemas.requests import WorldCreateRequest, UpdateWorldConfigurationRequest, SlotOptionsRequest
+from app.models.enums import GamemodeEnum, CompatibilityEnum, SettingsEnum, WorldTypeEnum, WorldTemplateTypeEnum
+from app.schemas.responses import WorldResponse, ServersResponse, SlotResponse, PlayerResponse, ConnectionResponse
+from app.schemas.requests import WorldCreateRequest, UpdateWorldConfigurationRequest, SlotOptionsRequest, ResetWorldRequest
 from app.middleware.dependencies import require_minecraft_cookie, get_player_info, check_realm_owner
 from app.helpers.minecraft_version_parser import MinecraftVersion
 from app.helpers.world_helper import WorldHelper
 from app.helpers.config_helper import ConfigHelper
 from app.helpers.docker_helper import DockerHelper
+from app.helpers.ops_helper import OpsHelper
+from app.helpers.shared_state import world_lock
+from app.helpers.container_state import ContainerState
+from app.helpers.subscription_helper import SubscriptionHelper
+from app.helpers.join_helper import JoinHelper
+from app.helpers.deletion_helper import DeletionHelper
+from app.helpers.slot_helper import SlotHelper
+from app.helpers.resource_helper import ResourceHelper
+from app.helpers.image_helper import ImageHelper
+from app.helpers.template_helper import TemplateHelper
+from app.helpers.disk_usage_helper import DiskUsageHelper
+from app.helpers.version_helper import VersionHelper, make_etag, not_modified, open_worlds, with_etag
 
 router = APIRouter()
 
 
-@router.get("", response_model=ServersResponse)
+# Response dicts are built directly in field order, so they serialize
+# exactly like the pydantic models without validating every player twice
+_WORLD_TEMPLATE = {
+    name: None if field.is_required() else field.default
+    for name, field in WorldResponse.model_fields.items()
+}
+_PLAYER_FIELDS = tuple(PlayerResponse.model_fields)
+
+
+def _get_compatibility(game_ver: MinecraftVersion, active_version: str) -> str:
+    """Compare the client version with the version a world runs"""
+    active_ver = MinecraftVersion(active_version)
+    
+    if game_ver == active_ver:
+        return CompatibilityEnum.COMPATIBLE.value
+    if game_ver < active_ver:
+        return CompatibilityEnum.NEEDS_DOWNGRADE.value
+    return CompatibilityEnum.NEEDS_UPGRADE.value
+
+
+def _build_world_response(world: World, state: str, game_ver: MinecraftVersion, game_version: str) -> dict:
+    """Build the WorldResponse fields of a world"""
+    active_slot = world.ActiveSlot
+    active_version = active_slot.Version if active_slot else game_version
+    
+    response = dict(_WORLD_TEMPLATE)
+    response.update(
+        Id=world.Id,
+        Owner=world.Owner,
+        OwnerUUID=world.OwnerUUID,
+        Name=world.Name,
+        Motd=world.Motd,
+        GameMode=active_slot.GameMode if active_slot else GamemodeEnum.Survival,
+        IsHardcore=active_slot.Hardcore if active_slot else False,
+        State=state,
+        WorldType=world.WorldType,
+        MaxPlayers=world.MaxPlayers,
+        ActiveSlot=active_slot.SlotId if active_slot else 1,
+        Member=world.Member,
+        Players=[{name: getattr(p, name) for name in _PLAYER_FIELDS} for p in world.Players],
+        ActiveVersion=active_version,
+        Compatibility=_get_compatibility(game_ver, active_version)
+    )
+    
+    if world.Minigame:
+        response["MinigameId"] = world.Minigame.Id
+        response["MinigameName"] = world.Minigame.Name
+        response["MinigameImage"] = world.Minigame.Image
+    
+    return response
+
+
+@router.get("", response_model=ServersResponse, response_class=ORJSONResponse)
 async def get_stable_worlds(
+    request: Request,
     player_info: dict = Depends(get_player_info),
     db: Session = Depends(get_db)
 ):
     """Get all stable worlds for the player"""
+    started = time.perf_counter()
     player_uuid = player_info["uuid"]
     player_name = player_info["name"]
     game_version = player_info["version"]
     
+    running = await ContainerState.get_running()
+    # Which worlds are listed is only known once this worker has built the list at this version
+    known_worlds = VersionHelper.get_player_worlds(player_uuid)
+    if known_worlds is not None:
+        etag = make_etag(
+            "worlds", player_uuid, VersionHelper.get_player_version(player_uuid), game_version,
+            open_worlds(known_worlds, running)
+        )
+        cached = not_modified(request, etag, "worlds")
+        if cached:
+            return cached
+    
+    game_ver = MinecraftVersion(game_version)
+    
     # Get owned worlds
     owned_worlds = db.query(World).filter(
         World.OwnerUUID == player_uuid
@@ -64,62 +145,28 @@ async def get_stable_worlds(
             Member=False
         )
         db.add(world)
+        VersionHelper.bump(db, player_uuids=[player_uuid])
         db.commit()
         db.refresh(world)
         owned_worlds.append(world)
     
+    version = VersionHelper.get_player_version(player_uuid)
+    world_ids = [world.Id for world in (*owned_worlds, *member_worlds)]
+    VersionHelper.remember_player_worlds(player_uuid, version, world_ids)
+    etag = make_etag("worlds", player_uuid, version, game_version, open_worlds(world_ids, running))
     all_worlds = []
     
     # Process owned worlds
     for world in owned_worlds:
-        active_version = world.ActiveSlot.Version if world.ActiveSlot else game_version
-        game_ver = MinecraftVersion(game_version)
-        active_ver = MinecraftVersion(active_version)
-        
-        if game_ver == active_ver:
-            versions_compared = 0
-        elif game_ver < active_ver:
-            versions_compared = -1
-        else:
-            versions_compared = 1
+        state = WorldHelper.state_of(world, running)
         
-        is_compatible = (
-            CompatibilityEnum.COMPATIBLE.value if versions_compared == 0 else
-            CompatibilityEnum.NEEDS_DOWNGRADE.value if versions_compared < 0 else
-            CompatibilityEnum.NEEDS_UPGRADE.value
-        )
-        
-        world_helper = WorldHelper(db, world.Id)
-        state = await world_helper.get_state()
-        
-        response = WorldResponse(
-            Id=world.Id,
-            Owner=world.Owner,
-            OwnerUUID=world.OwnerUUID,
-            Name=world.Name,
-            Motd=world.Motd,
-            GameMode=world.ActiveSlot.GameMode if world.ActiveSlot else GamemodeEnum.Survival,
-            IsHardcore=world.ActiveSlot.Hardcore if world.ActiveSlot else False,
-            State=state,
-            WorldType=world.WorldType,
-            MaxPlayers=world.MaxPlayers,
-            ActiveSlot=world.ActiveSlot.SlotId if world.ActiveSlot else 1,
-            Member=world.Member,
-            Players=[PlayerResponse.model_validate(p) for p in world.Players],
-            ActiveVersion=active_version,
-            Compatibility=is_compatible
-        )
-        
-        if world.Minigame:
-            response.MinigameId = world.Minigame.Id
-            response.MinigameName = world.Minigame.Name
-            response.MinigameImage = world.Minigame.Image
+        response = _build_world_response(world, state, game_ver, game_version)
         
         if world.Subscription:
-            days_left = (world.Subscription.StartDate + timedelta(days=30) - datetime.now()).days
-            response.DaysLeft = days_left
-            response.Expired = days_left < 0
-            response.ExpiredTrial = False
+            days_left = SubscriptionHelper.days_left(world.Subscription)
+            response["DaysLeft"] = days_left
+            response["Expired"] = days_left < 0
+            response["ExpiredTrial"] = False
         
         all_worlds.append(response)
     
@@ -128,62 +175,56 @@ async def get_stable_worlds(
         if not world.ActiveSlot or not world.Subscription:
             continue
         
-        game_ver = MinecraftVersion(game_version)
-        active_ver = MinecraftVersion(world.ActiveSlot.Version)
+        state = WorldHelper.state_of(world, running)
         
-        if game_ver == active_ver:
-            versions_compared = 0
-        elif game_ver < active_ver:
-            versions_compared = -1
-        else:
-            versions_compared = 1
-        is_compatible = (
-            CompatibilityEnum.COMPATIBLE.value if versions_compared == 0 else
-            CompatibilityEnum.NEEDS_DOWNGRADE.value if versions_compared < 0 else
-            CompatibilityEnum.NEEDS_UPGRADE.value
-        )
-        
-        world_helper = WorldHelper(db, world.Id)
-        state = await world_helper.get_state()
-        
-        response = WorldResponse(
-            Id=world.Id,
-            Owner=world.Owner,
-            OwnerUUID=world.OwnerUUID,
-            Name=world.Name,
-            Motd=world.Motd,
-            GameMode=world.ActiveSlot.GameMode,
-            IsHardcore=world.ActiveSlot.Hardcore,
-            State=state,
-            WorldType=world.WorldType,
-            MaxPlayers=world.MaxPlayers,
-            ActiveSlot=world.ActiveSlot.SlotId,
-            Member=True,
-            Players=[PlayerResponse.model_validate(p) for p in world.Players],
-            DaysLeft=0,
-            Expired=(world.Subscription.StartDate + timedelta(days=30) - datetime.now()).days < 0,
-            ExpiredTrial=False,
-            ActiveVersion=world.ActiveSlot.Version,
-            Compatibility=is_compatible
-        )
-        
-        if world.Minigame:
-            response.MinigameId = world.Minigame.Id
-            response.MinigameName = world.Minigame.Name
-            response.MinigameImage = world.Minigame.Image
+        response = _build_world_response(world, state, game_ver, game_version)
+        response["Member"] = True
+        response["DaysLeft"] = 0
+        response["Expired"] = SubscriptionHelper.days_left(world.Subscription) < 0
+        response["ExpiredTrial"] = False
         
         all_worlds.append(response)
     
-    return ServersResponse(servers=all_worlds)
+    return with_etag(ORJSONResponse({"servers": all_worlds}), etag, "worlds", started)
+
 
+@router.get("/templates/{template_type}")
+async def get_templates(
+    template_type: WorldTemplateTypeEnum,
+    request: Request,
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(TemplateHelper.DEFAULT_PAGE_SIZE, ge=1, le=TemplateHelper.MAX_PAGE_SIZE),
+    cookie: str = Depends(require_minecraft_cookie)
+):
+    """Get a page of templates of a type, served from memory"""
+    started = time.perf_counter()
+    etag = make_etag("templates", TemplateHelper.get_version(), template_type.value, page, pageSize)
+    cached = not_modified(request, etag, "templates")
+    if cached:
+        return cached
+    
+    body = TemplateHelper.get_page(template_type.value, page, pageSize)
+    return with_etag(Response(content=body, media_type="application/json"), etag, "templates", started)
 
-@router.get("/{world_id}")
+
+@router.get("/{world_id}", response_model=WorldResponse, response_class=ORJSONResponse)
 async def get_world(
     world_id: int,
+    request: Request,
     player_info: dict = Depends(get_player_info),
     db: Session = Depends(get_db)
 ):
     """Get a specific world"""
+    started = time.perf_counter()
+    game_version = player_info["version"]
+    running = await ContainerState.get_running()
+    etag = make_etag(
+        "world", world_id, VersionHelper.get_world_version(world_id), game_version, open_worlds([world_id], running)
+    )
+    cached = not_modified(request, etag, "world")
+    if cached:
+        return cached
+    
     world = db.query(World).filter(World.Id == world_id).options(
         joinedload(World.Subscription),
         joinedload(World.Slots),
@@ -195,56 +236,16 @@ async def get_world(
     if not world:
         raise HTTPException(status_code=404, detail="World not found")
     
-    game_version = player_info["version"]
-    active_version = world.ActiveSlot.Version if world.ActiveSlot else game_version
-    game_ver = MinecraftVersion(game_version)
-    active_ver = MinecraftVersion(active_version)
-    
-    if game_ver == active_ver:
-        versions_compared = 0
-    elif game_ver < active_ver:
-        versions_compared = -1
-    else:
-        versions_compared = 1
+    state = WorldHelper.state_of(world, running)
     
-    is_compatible = (
-        CompatibilityEnum.COMPATIBLE.value if versions_compared == 0 else
-        CompatibilityEnum.NEEDS_DOWNGRADE.value if versions_compared < 0 else
-        CompatibilityEnum.NEEDS_UPGRADE.value
-    )
-    
-    world_helper = WorldHelper(db, world.Id)
-    state = await world_helper.get_state()
-    
-    response = WorldResponse(
-        Id=world.Id,
-        Owner=world.Owner,
-        OwnerUUID=world.OwnerUUID,
-        Name=world.Name,
-        Motd=world.Motd,
-        GameMode=world.ActiveSlot.GameMode if world.ActiveSlot else GamemodeEnum.Survival,
-        IsHardcore=world.ActiveSlot.Hardcore if world.ActiveSlot else False,
-        State=state,
-        WorldType=world.WorldType,
-        MaxPlayers=world.MaxPlayers,
-        ActiveSlot=world.ActiveSlot.SlotId if world.ActiveSlot else 1,
-        Member=world.Member,
-        Players=[PlayerResponse.model_validate(p) for p in world.Players],
-        ActiveVersion=active_version,
-        Compatibility=is_compatible
-    )
-    
-    if world.Minigame:
-        response.MinigameId = world.Minigame.Id
-        response.MinigameName = world.Minigame.Name
-        response.MinigameImage = world.Minigame.Image
+    response = _build_world_response(world, state, MinecraftVersion(game_version), game_version)
     
     if world.Subscription:
-        days_left = (world.Subscription.StartDate + timedelta(days=30) - datetime.now()).days
-        response.DaysLeft = days_left
-        response.Expired = days_left < 0
+        days_left = SubscriptionHelper.days_left(world.Subscription)
+        response["DaysLeft"] = days_left
+        response["Expired"] = days_left < 0
     
-    return response
+    return with_etag(ORJSONResponse(response), etag, "world", started)
 
 
 @router.post("")
@@ -264,6 +265,7 @@ async def create_world(
         Member=False
     )
     db.add(world)
+    VersionHelper.bump(db, player_uuids=[player_info["uuid"]])
     db.commit()
     db.refresh(world)
     
@@ -285,6 +287,7 @@ async def update_world(
     if request.WorldType is not None:
         world.WorldType = request.WorldType
     
+    VersionHelper.world_changed(db, world)
     db.commit()
     return {"success": True}
 
@@ -300,9 +303,71 @@ async def open_world(
         raise HTTPException(status_code=400, detail="No active slot")
     
     docker_helper = DockerHelper(world_id)
-    if not await docker_helper.is_running():
-        await docker_helper.start_server(world.ActiveSlot.SlotId)
+    # Pulled before taking the lock, in case the image of this version is not cached yet
+    image = await ImageHelper.ensure_for_version(world.ActiveSlot.Version)
+    async with world_lock(world_id):
+        if not await docker_helper.is_running():
+            OpsHelper.world_started(world_id)
+            port = await docker_helper.start_server(
+                world.ActiveSlot.SlotId,
+                files={"ops.json": OpsHelper.ops_json(db, world)},
+                environment=SlotHelper.environment(world.ActiveSlot),
+                limits=ResourceHelper.get_limits(world),
+                image=image
+            )
+            ContainerState.invalidate()
+            JoinHelper.server_started(db, world_id, port)
+            VersionHelper.world_changed(db, world)
+            db.commit()
+    
+    return {"success": True}
+
+
+@router.post("/{world_id}/slot/{slot_id}")
+async def update_slot(
+    world_id: int,
+    request: SlotOptionsRequest,
+    slot_id: int = Path(ge=1, le=3),
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Update the options of a slot, applying them to the running server where possible"""
+    slot = next((s for s in world.Slots if s.SlotId == slot_id), None)
+    previous = SlotHelper.environment(slot) if slot else None
+    if not slot:
+        slot = Slot(WorldId=world.Id, SlotId=slot_id)
+        db.add(slot)
+    for name, value in request.model_dump().items():
+        setattr(slot, name, value)
+    
+    VersionHelper.world_changed(db, world)
+    db.commit()
     
+    if world.ActiveSlot and world.ActiveSlot.SlotId == slot_id:
+        await SlotHelper.apply(world, previous)
+    return {"success": True}
+
+
+@router.put("/{world_id}/slot/{slot_id}")
+async def switch_slot(
+    world_id: int,
+    slot_id: int = Path(ge=1, le=3),
+    player_info: dict = Depends(get_player_info),
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Switch the active slot, replacing the running server in the background"""
+    slot = next((s for s in world.Slots if s.SlotId == slot_id), None)
+    if not slot:
+        version = world.ActiveSlot.Version if world.ActiveSlot else player_info["version"]
+        slot = Slot(WorldId=world.Id, SlotId=slot_id, SlotName="", Version=version)
+        db.add(slot)
+    
+    if world.ActiveSlot is not slot:
+        world.ActiveSlot = slot
+        VersionHelper.world_changed(db, world)
+        db.commit()
+        await SlotHelper.apply(world)
     return {"success": True}
 
 
@@ -314,8 +379,13 @@ async def close_world(
 ):
     """Close/stop a world server"""
     docker_helper = DockerHelper(world_id)
-    if await docker_helper.is_running():
-        await docker_helper.stop_server()
+    async with world_lock(world_id):
+        if await docker_helper.is_running():
+            await docker_helper.stop_server()
+            ContainerState.invalidate()
+            JoinHelper.server_stopped(db, world_id)
+            VersionHelper.world_changed(db, world)
+            db.commit()
     
     return {"success": True}
 
@@ -326,11 +396,80 @@ async def delete_world(
     world: World = Depends(check_realm_owner),
     db: Session = Depends(get_db)
 ):
-    """Delete a world"""
-    docker_helper = DockerHelper(world_id)
-    await docker_helper.delete_server()
+    """Delete a world, tearing down its server in the background"""
+    async with world_lock(world_id):
+        # Bumped first, while the players soft_delete removes are still listed
+        VersionHelper.world_changed(db, world)
+        DeletionHelper.soft_delete(db, world)
+        JoinHelper.server_stopped(db, world_id)
+        db.commit()
     
-    db.delete(world)
-    db.commit()
+    DeletionHelper.wake()
+    return {"success": True}
+
+
+@router.post("/{world_id}/reset")
+async def reset_world(
+    world_id: int,
+    request: ResetWorldRequest,
+    world: World = Depends(check_realm_owner),
+    db: Session = Depends(get_db)
+):
+    """Reset the active slot's world to a template's, or to a new one generated from the request's options"""
+    if not world.ActiveSlot:
+        raise HTTPException(status_code=400, detail="No active slot")
+    
+    archive = generation = None
+    if request.worldTemplateId > 0:
+        try:
+            archive = await TemplateHelper.get_world_file(request.worldTemplateId)
+        except LookupError:
+            raise HTTPException(status_code=404, detail="Template not found")
+        # The reset empties the slot first, so only the rest of the volume counts
+        if not DiskUsageHelper.has_room(db, world, archive.stat().st_size, replacing_slot=world.ActiveSlot.SlotId):
+            raise HTTPException(status_code=403, detail="Realm is over its storage quota")
+    else:
+        try:
+            generation = DockerHelper.generation_properties(request.seed, request.levelType, request.generateStructures)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    image = await ImageHelper.ensure_for_version(world.ActiveSlot.Version)
+    async with world_lock(world_id):
+        was_running = await DockerHelper(world_id).reset_world(
+            world.ActiveSlot.SlotId, archive, generation, image=image
+        )
+        if was_running:
+            ContainerState.invalidate()
+            JoinHelper.server_stopped(db, world_id)
+        VersionHelper.world_changed(db, world)
+        db.commit()
     
     return {"success": True}
+
+
+@router.get("/v1/{world_id}/join/pc", response_model=ConnectionResponse)
+async def join_world(
+    world_id: int,
+    player_info: dict = Depends(get_player_info),
+    db: Session = Depends(get_db)
+):
+    """Get the address to join a world at, starting it if it is closed"""
+    world = db.query(World).filter(World.Id == world_id).first()
+    if not world:
+        raise HTTPException(status_code=404, detail="World not found")
+    
+    player_uuid = player_info["uuid"]
+    if world.OwnerUUID != player_uuid:
+        member = db.query(Player.Id).filter(
+            Player.WorldId == world_id,
+            Player.Uuid == player_uuid,
+            Player.Accepted == True
+        ).first()
+        if not member:
+            raise HTTPException(status_code=403, detail="You are not a member of this world")
+    
+    if not world.ActiveSlot:
+        raise HTTPException(status_code=400, detail="No active slot")
+    
+    return await JoinHelper.join(db, world, SlotHelper.environment(world.ActiveSlot), ResourceHelper.get_limits(world))
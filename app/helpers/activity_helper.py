@@ -0,0 +1,350 @@
+import re
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import Player, PlayerSession, World
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper, StreamHandle
+from app.helpers.metrics import Metrics
+from app.helpers.shared_state import LeaderLock
+from app.helpers.version_helper import VersionHelper
+
+Metrics.describe("activity_events_total", "Player joins, leaves and server stops read from server logs")
+Metrics.describe("activity_sessions_written_total", "Player sessions inserted")
+Metrics.describe("activity_events_dropped_total", "Events dropped because the database rejected them")
+
+# A single pass over a timestamped log line finds any event the pipeline needs
+_LOG_EVENT = re.compile(
+    r"^(?P<stamp>\S+) .*?\]: (?:"
+    r"UUID of player (?P<uuid_name>\w+) is (?P<uuid>[0-9a-fA-F-]{32,36})"
+    r"|(?P<joined>\w+) joined the game"
+    r"|(?P<left>\w+) left the game"
+    r"|(?P<stopping>Stopping server)"
+    r")\s*$"
+)
+
+
+class ActivityEvent(NamedTuple):
+    kind: str  # join, leave or stop
+    world_id: int
+    time: datetime
+    uuid: Optional[str]
+    name: Optional[str]
+
+
+def _parse_stamp(stamp: str) -> datetime:
+    """Convert a Docker log timestamp to the naive local time stored elsewhere"""
+    # Docker writes nanoseconds, which datetime cannot hold
+    moment = datetime.fromisoformat(stamp[:26].rstrip("Z")).replace(tzinfo=timezone.utc)
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def parse_line(world_id: int, line: str, uuids: Dict[str, str]) -> Optional[ActivityEvent]:
+    """Turn a timestamped log line into an event, remembering player UUIDs as they log in"""
+    match = _LOG_EVENT.match(line)
+    if not match:
+        return None
+    if match["uuid"]:
+        uuids[match["uuid_name"]] = match["uuid"].replace("-", "").lower()
+        return None
+    
+    moment = _parse_stamp(match["stamp"])
+    if match["stopping"]:
+        return ActivityEvent("stop", world_id, moment, None, None)
+    name = match["joined"] or match["left"]
+    return ActivityEvent("join" if match["joined"] else "leave", world_id, moment, uuids.get(name), name)
+
+
+class ActivityHelper:
+    """Player activity read from server logs
+    
+    The worker holding the leader lock follows the log of every running
+    realm on its own thread, and closes the stream to stop following it.
+    Parsed events go through an in-memory queue to a writer that persists
+    them in batches: joins as one multi-row insert, leaves and stops as
+    executemany updates, with the versions of the worlds whose players
+    came or went bumped in the same transaction. A batch that keeps
+    failing is written one event at a time, dropping the events the
+    database rejects, so one bad event cannot hold up the queue. Replaying a line is a no-op, so a new leader
+    resumes from the latest stored event.
+    """
+    LEADER_KEY = 1
+    BATCH_SIZE = 1000
+    # Failed writes of the batch at the head of the queue before it is split
+    MAX_ATTEMPTS = 3
+    ACTIVITY_PERIOD = timedelta(days=7)
+    ACTIVITY_LIMIT = 1000
+    _queue: Deque[ActivityEvent] = deque()
+    _failures: int = 0
+    _tailers: Dict[int, StreamHandle] = {}
+    _leader = LeaderLock(LEADER_KEY)
+    
+    @classmethod
+    def _tail(cls, world_id: int, since: int, handle: StreamHandle) -> None:
+        uuids: Dict[str, str] = {}
+        try:
+            stream = DockerHelper(world_id).open_server_logs(since=since, timestamps=True)
+            if not handle.attach(stream):
+                return
+            for raw in stream:
+                try:
+                    event = parse_line(world_id, raw.decode("utf-8", errors="replace"), uuids)
+                except Exception as e:
+                    print(f"Skipped a log line of world {world_id} that could not be parsed: {e}")
+                    continue
+                if event:
+                    cls._queue.append(event)
+            if not handle.stopped:
+                # The log ends with the container, whether or not it shut down cleanly
+                cls._queue.append(ActivityEvent("stop", world_id, datetime.now(), None, None))
+        except Exception as e:
+            if not handle.stopped:
+                print(f"Failed to follow the log of world {world_id}: {e}")
+        finally:
+            if cls._tailers.get(world_id) is handle:
+                cls._tailers.pop(world_id, None)
+    
+    @staticmethod
+    def _resume_time(world_id: int) -> int:
+        db = SessionLocal()
+        try:
+            latest = db.execute(
+                select(func.max(func.coalesce(PlayerSession.LeaveTime, PlayerSession.JoinTime)))
+                .where(PlayerSession.WorldId == world_id)
+            ).scalar()
+        finally:
+            db.close()
+        # Docker only takes whole seconds, and replaying the overlap is harmless
+        return int(latest.timestamp()) - 1 if latest else 1
+    
+    @classmethod
+    def _stop_tailers(cls, world_ids: Set[int]) -> None:
+        for world_id in world_ids:
+            handle = cls._tailers.pop(world_id, None)
+            if handle:
+                handle.stop()
+    
+    @classmethod
+    async def sync_tailers(cls) -> None:
+        """Follow the logs of running realms while this worker is the leader"""
+        if not await cls._leader.is_leader():
+            cls._stop_tailers(set(cls._tailers))
+            return
+        
+        running = await ContainerState.get_running()
+        for world_id in running - set(cls._tailers):
+            since = await asyncio.to_thread(cls._resume_time, world_id)
+            handle = StreamHandle()
+            cls._tailers[world_id] = handle
+            threading.Thread(
+                target=cls._tail,
+                args=(world_id, since, handle),
+                name=f"activity-{world_id}",
+                daemon=True
+            ).start()
+        cls._stop_tailers(set(cls._tailers) - running)
+    
+    @classmethod
+    def _resolve_uuids(cls, db: Session, events: List[ActivityEvent]) -> List[ActivityEvent]:
+        """Fill in UUIDs missing because the login line predates the log position"""
+        missing = {(event.world_id, event.name) for event in events if event.kind != "stop" and not event.uuid}
+        if not missing:
+            return events
+        
+        world_ids = {world_id for world_id, _ in missing}
+        names = {name for _, name in missing}
+        known: Dict[Tuple[int, str], str] = {}
+        for row in db.execute(
+            select(Player.WorldId, Player.Name, Player.Uuid)
+            .where(Player.WorldId.in_(world_ids), Player.Name.in_(names))
+        ):
+            known[(row.WorldId, row.Name)] = row.Uuid
+        # Later sessions win, so a name always maps to its latest player
+        for row in db.execute(
+            select(PlayerSession.WorldId, PlayerSession.PlayerName, PlayerSession.PlayerUUID)
+            .where(PlayerSession.WorldId.in_(world_ids), PlayerSession.PlayerName.in_(names))
+            .order_by(PlayerSession.JoinTime)
+        ):
+            known[(row.WorldId, row.PlayerName)] = row.PlayerUUID
+        
+        return [
+            event._replace(uuid=known.get((event.world_id, event.name)))
+            if event.kind != "stop" and not event.uuid else event
+            for event in events
+        ]
+    
+    @classmethod
+    def write(cls, db: Session, events: List[ActivityEvent]) -> int:
+        """Persist a batch of events, returning the number of new sessions"""
+        events = cls._resolve_uuids(db, events)
+        sessions = PlayerSession.__table__
+        players = Player.__table__
+        
+        joins = [
+            {"WorldId": e.world_id, "PlayerUUID": e.uuid, "PlayerName": e.name, "JoinTime": e.time}
+            for e in events if e.kind == "join" and e.uuid
+        ]
+        inserted = 0
+        if joins:
+            statement = insert(PlayerSession).values(joins).on_conflict_do_nothing(
+                index_elements=["WorldId", "JoinTime", "PlayerUUID"]
+            )
+            inserted = db.execute(statement).rowcount
+        
+        leaves = [
+            {"world_id": e.world_id, "uuid": e.uuid, "time": e.time}
+            for e in events if e.kind == "leave" and e.uuid
+        ]
+        if leaves:
+            db.execute(
+                update(sessions).where(
+                    sessions.c.WorldId == bindparam("world_id"),
+                    sessions.c.PlayerUUID == bindparam("uuid"),
+                    sessions.c.LeaveTime.is_(None),
+                    sessions.c.JoinTime <= bindparam("time")
+                ).values(LeaveTime=bindparam("time")),
+                leaves
+            )
+        
+        stops = [{"world_id": e.world_id, "time": e.time} for e in events if e.kind == "stop"]
+        if stops:
+            db.execute(
+                update(sessions).where(
+                    sessions.c.WorldId == bindparam("world_id"),
+                    sessions.c.LeaveTime.is_(None),
+                    sessions.c.JoinTime <= bindparam("time")
+                ).values(LeaveTime=bindparam("time")),
+                stops
+            )
+        
+        # Only the last event of each player in the batch decides Player.Online
+        online: Dict[Tuple[int, str], bool] = {}
+        stopped: Set[int] = set()
+        for event in events:
+            if event.kind == "stop":
+                stopped.add(event.world_id)
+                online = {key: value for key, value in online.items() if key[0] != event.world_id}
+            elif event.uuid:
+                online[(event.world_id, event.uuid)] = event.kind == "join"
+        if stopped:
+            db.execute(
+                update(players)
+                .where(players.c.WorldId.in_(stopped), players.c.Online == True)
+                .values(Online=False)
+            )
+        if online:
+            db.execute(
+                update(players).where(
+                    players.c.WorldId == bindparam("world_id"),
+                    players.c.Uuid == bindparam("uuid")
+                ).values(Online=bindparam("online")),
+                [{"world_id": world_id, "uuid": uuid, "online": value} for (world_id, uuid), value in online.items()]
+            )
+        
+        # World responses list who is online, so everyone who can see these worlds gets a new ETag
+        changed = stopped | {world_id for world_id, _ in online}
+        if changed:
+            player_uuids = db.execute(
+                select(Player.Uuid).where(Player.WorldId.in_(changed))
+            ).scalars().all()
+            owner_uuids = db.execute(
+                select(World.OwnerUUID).where(World.Id.in_(changed))
+            ).scalars().all()
+            VersionHelper.bump(db, sorted(changed), [*owner_uuids, *player_uuids])
+        
+        for event in events:
+            Metrics.increment("activity_events_total", kind=event.kind)
+        Metrics.increment("activity_sessions_written_total", inserted)
+        return inserted
+    
+    @classmethod
+    def _flush_with_new_session(cls) -> int:
+        written = 0
+        db = SessionLocal()
+        try:
+            while cls._queue:
+                batch = [cls._queue.popleft() for _ in range(min(len(cls._queue), cls.BATCH_SIZE))]
+                try:
+                    written += cls.write(db, batch)
+                    db.commit()
+                    cls._failures = 0
+                except Exception:
+                    db.rollback()
+                    cls._failures += 1
+                    if cls._failures < cls.MAX_ATTEMPTS:
+                        cls._queue.extendleft(reversed(batch))
+                        raise
+                    cls._failures = 0
+                    written += cls._write_each(db, batch)
+        finally:
+            db.close()
+        return written
+    
+    @classmethod
+    def _write_each(cls, db: Session, events: List[ActivityEvent]) -> int:
+        """Write events one at a time, dropping those the database rejects"""
+        written = 0
+        for index, event in enumerate(events):
+            try:
+                written += cls.write(db, [event])
+                db.commit()
+            except (IntegrityError, DataError) as e:
+                # Such as a session of a world removed since, which no retry can write
+                db.rollback()
+                Metrics.increment("activity_events_dropped_total", kind=event.kind)
+                print(f"Dropped a {event.kind} event of world {event.world_id}: {e}")
+            except Exception:
+                # Not the event's fault, like a lost connection, so keep the rest for later
+                db.rollback()
+                cls._queue.extendleft(reversed(events[index:]))
+                raise
+        return written
+    
+    @classmethod
+    async def run_tailers(cls, interval: float = 5.0) -> None:
+        """Periodically start following new realms and stop following stopped ones"""
+        while True:
+            try:
+                await cls.sync_tailers()
+            except Exception as e:
+                print(f"Failed to sync activity tailers: {e}")
+            await asyncio.sleep(interval)
+    
+    @classmethod
+    async def run_writer(cls, interval: float = 2.0) -> None:
+        """Periodically persist queued events"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(cls._flush_with_new_session)
+                except Exception as e:
+                    print(f"Failed to persist player activity: {e}")
+        finally:
+            await asyncio.to_thread(cls._flush_with_new_session)
+    
+    @classmethod
+    def get_activity(cls, db: Session, world_id: int, now: Optional[datetime] = None) -> List[dict]:
+        """Get a world's recent player sessions, latest first"""
+        since = (now or datetime.now()) - cls.ACTIVITY_PERIOD
+        rows = db.execute(
+            select(PlayerSession.PlayerUUID, PlayerSession.JoinTime, PlayerSession.LeaveTime)
+            .where(PlayerSession.WorldId == world_id, PlayerSession.JoinTime >= since)
+            .order_by(PlayerSession.JoinTime.desc())
+            .limit(cls.ACTIVITY_LIMIT)
+        ).all()
+        return [
+            {
+                "profileUuid": row.PlayerUUID,
+                "joinTime": int(row.JoinTime.timestamp() * 1000),
+                "leaveTime": int(row.LeaveTime.timestamp() * 1000) if row.LeaveTime else 0
+            }
+            for row in rows
+        ]
@@ -0,0 +1,111 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models import engine
+
+
+class ChangeListener:
+    """Dispatches Postgres NOTIFY messages to in-process handlers
+    
+    Every worker keeps one dedicated LISTEN connection that is watched by the
+    event loop, so notifications cost nothing until they arrive. Handlers get
+    the notification payload, or None after a reconnect, when messages may
+    have been missed and the handler should reload everything.
+    """
+    _handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+    _connection = None
+    _reconnect_task: Optional[asyncio.Task] = None
+    reconnect_delay: float = 5.0
+    
+    @classmethod
+    def subscribe(cls, channel: str, handler: Callable[[Optional[str]], None]) -> None:
+        """Register a handler for a channel"""
+        handlers = cls._handlers.setdefault(channel, [])
+        if handler not in handlers:
+            handlers.append(handler)
+        
+        if cls._connection is not None and len(handlers) == 1:
+            with cls._connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{channel}"')
+    
+    @staticmethod
+    def notify(db: Session, channel: str, payload: str) -> None:
+        """Queue a notification, delivered when the session's transaction commits"""
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+    
+    @classmethod
+    def _dispatch(cls, channel: str, payload: Optional[str]) -> None:
+        for handler in cls._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Change handler for {channel} failed: {e}")
+    
+    @classmethod
+    def _connect(cls) -> None:
+        pooled = engine.raw_connection()
+        pooled.detach()
+        connection = pooled.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            for channel in cls._handlers:
+                cursor.execute(f'LISTEN "{channel}"')
+        cls._connection = connection
+    
+    @classmethod
+    def _on_readable(cls) -> None:
+        try:
+            cls._connection.poll()
+        except Exception as e:
+            print(f"Lost change notification connection: {e}")
+            cls._disconnect()
+            cls._reconnect_task = asyncio.get_running_loop().create_task(cls._reconnect())
+            return
+        
+        while cls._connection.notifies:
+            notification = cls._connection.notifies.pop(0)
+            cls._dispatch(notification.channel, notification.payload)
+    
+    @classmethod
+    def _disconnect(cls) -> None:
+        if cls._connection is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(cls._connection.fileno())
+        except Exception:
+            pass
+        try:
+            cls._connection.close()
+        except Exception:
+            pass
+        cls._connection = None
+    
+    @classmethod
+    async def _reconnect(cls) -> None:
+        while True:
+            await asyncio.sleep(cls.reconnect_delay)
+            try:
+                await cls.start()
+            except Exception as e:
+                print(f"Failed to reconnect change notification connection: {e}")
+                continue
+            
+            # Notifications sent while disconnected are lost
+            for channel in cls._handlers:
+                cls._dispatch(channel, None)
+            return
+    
+    @classmethod
+    async def start(cls) -> None:
+        """Open the LISTEN connection and start watching it"""
+        await asyncio.to_thread(cls._connect)
+        asyncio.get_running_loop().add_reader(cls._connection.fileno(), cls._on_readable)
+    
+    @classmethod
+    async def stop(cls) -> None:
+        """Stop watching and close the LISTEN connection"""
+        if cls._reconnect_task:
+            cls._reconnect_task.cancel()
+            cls._reconnect_task = None
+        cls._disconnect()
@@ -1,7 +1,12 @@
 import json
-from typing import Dict, Any
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.models import SessionLocal
 from app.models.entities import Configuration
+from app.helpers.change_listener import ChangeListener
 
 
 class Settings:
@@ -11,36 +16,159 @@ class Settings:
     TrialMode: bool = False
     OnlineMode: bool = False
     AutomaticRealmsCreation: bool = True
+    # Default resource limits of a realm: MiB of memory, percent of one CPU, processes
+    RealmMemoryLimit: int = 2048
+    RealmCpuLimit: int = 200
+    RealmPidsLimit: int = 512
+    # Default disk quota of a realm's volume in MiB, 0 for none
+    RealmDiskQuota: int = 10240
+
+
+@dataclass
+class ConfigurationChange:
+    """A setting whose stored value was changed"""
+    key: str
+    old_value: Any
+    new_value: Any
 
 
 class ConfigHelper:
-    """Helper class for managing configuration"""
+    """Helper class for managing configuration
+    
+    Reads are served from an in-process cache. Every change is broadcast on
+    the configuration channel so all workers update their cache, and each
+    applied change increments the cache version.
+    """
+    CHANNEL = "configuration_changed"
+    # Postgres rejects NOTIFY payloads of 8000 bytes or more
+    MAX_PAYLOAD_SIZE = 7900
     _config_cache: Dict[str, Any] = {}
+    _version: int = 0
+    _version_changed: Optional[asyncio.Event] = None
+    _stale: bool = False
+    _reload_task: Optional[asyncio.Task] = None
     
     @classmethod
     def initialize(cls, db: Session) -> None:
         """Initialize configuration from database"""
-        settings = Settings()
-        
         # Add default settings if they don't exist
-        for key in dir(settings):
-            if not key.startswith('_'):
-                value = getattr(settings, key)
-                existing = db.query(Configuration).filter(Configuration.Key == key).first()
-                if not existing:
-                    config = Configuration(Key=key, Value=json.dumps(value))
-                    db.add(config)
-        
+        defaults = cls.get_defaults()
+        statement = insert(Configuration).values([
+            {"Key": key, "Value": json.dumps(value)}
+            for key, value in defaults.items()
+        ]).on_conflict_do_nothing(index_elements=[Configuration.Key])
+        db.execute(statement)
         db.commit()
         
-        # Load all settings into cache
-        all_settings = db.query(Configuration).all()
-        for setting in all_settings:
+        cls._load_all(db)
+        ChangeListener.subscribe(cls.CHANNEL, cls._on_change)
+    
+    @staticmethod
+    def get_defaults() -> Dict[str, Any]:
+        """Get the default value of every setting"""
+        return {key: getattr(Settings, key) for key in Settings.__annotations__}
+    
+    @classmethod
+    def _load_all(cls, db: Session) -> None:
+        """Load all settings into cache"""
+        for key, value in cls._read_all(db):
+            cls._apply(key, value)
+    
+    @classmethod
+    def _read_all(cls, db: Session) -> List[Tuple[str, Any]]:
+        return [(setting.Key, cls._decode(setting.Value)) for setting in db.query(Configuration).all()]
+    
+    @classmethod
+    def _read_with_new_session(cls) -> List[Tuple[str, Any]]:
+        db = SessionLocal()
+        try:
+            return cls._read_all(db)
+        finally:
+            db.close()
+    
+    @classmethod
+    async def _reload(cls) -> None:
+        # Changes arriving during a reload trigger one more, not one each.
+        # Rows are read in a thread but applied here, as _apply sets an asyncio.Event
+        while cls._stale:
+            cls._stale = False
             try:
-                cls._config_cache[setting.Key] = json.loads(setting.Value) if isinstance(setting.Value, str) else setting.Value
-            except (json.JSONDecodeError, TypeError):
-                # If JSON parsing fails, store the raw value
-                cls._config_cache[setting.Key] = setting.Value
+                settings = await asyncio.to_thread(cls._read_with_new_session)
+            except Exception as e:
+                print(f"Failed to reload configuration: {e}")
+                return
+            for key, value in settings:
+                cls._apply(key, value)
+    
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        try:
+            return json.loads(value) if isinstance(value, str) else value
+        except (json.JSONDecodeError, TypeError):
+            # If JSON parsing fails, store the raw value
+            return value
+    
+    @staticmethod
+    def validate(key: str, value: Any) -> None:
+        """Check a value against the type declared in Settings"""
+        expected = Settings.__annotations__.get(key)
+        if expected is None:
+            raise ValueError(f"Unknown setting: {key}")
+        
+        # bool is a subclass of int, so never accept one in place of the other
+        if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+            raise ValueError(f"Setting {key} must be of type {expected.__name__}")
+    
+    @classmethod
+    def _apply(cls, key: str, value: Any) -> None:
+        """Update the cache, bumping the version if the value changed"""
+        if key in cls._config_cache and cls._config_cache[key] == value:
+            return
+        
+        cls._config_cache[key] = value
+        cls._version += 1
+        if cls._version_changed is not None:
+            cls._version_changed.set()
+    
+    @classmethod
+    def _on_change(cls, payload: Optional[str]) -> None:
+        """Apply changes broadcast by any worker"""
+        if cls._reload_task is not None and not cls._reload_task.done():
+            # The running reload may have read rows older than this change
+            cls._stale = True
+        if not payload:
+            cls._stale = True
+            if cls._reload_task is None or cls._reload_task.done():
+                cls._reload_task = asyncio.get_running_loop().create_task(cls._reload())
+            return
+        
+        values = json.loads(payload)
+        for key, value in values.items():
+            cls.validate(key, value)
+        for key, value in values.items():
+            cls._apply(key, value)
+    
+    @classmethod
+    def get_version(cls) -> int:
+        """Get the number of configuration changes applied in this process"""
+        return cls._version
+    
+    @classmethod
+    async def wait_for_version(cls, version: int, timeout: float) -> bool:
+        """Wait until the cache version reaches the given version"""
+        if cls._version_changed is None:
+            cls._version_changed = asyncio.Event()
+        
+        try:
+            async with asyncio.timeout(timeout):
+                while True:
+                    cls._version_changed.clear()
+                    if cls._version >= version:
+                        break
+                    await cls._version_changed.wait()
+        except TimeoutError:
+            return False
+        return True
     
     @classmethod
     def get_config(cls) -> Dict[str, Any]:
@@ -55,11 +183,48 @@ class ConfigHelper:
     @classmethod
     def set_setting(cls, db: Session, key: str, value: Any) -> None:
         """Set a specific setting"""
-        cls._config_cache[key] = value
-        config = db.query(Configuration).filter(Configuration.Key == key).first()
-        if config:
-            config.Value = json.dumps(value)
-        else:
-            config = Configuration(Key=key, Value=json.dumps(value))
-            db.add(config)
+        cls.set_settings(db, {key: value})
+    
+    @classmethod
+    def set_settings(cls, db: Session, values: Dict[str, Any]) -> List[ConfigurationChange]:
+        """Set several settings in one transaction, returning what changed"""
+        for key, value in values.items():
+            cls.validate(key, value)
+        if not values:
+            return []
+        
+        current = {
+            row.Key: cls._decode(row.Value)
+            for row in db.query(Configuration).filter(
+                Configuration.Key.in_(list(values))
+            ).with_for_update()
+        }
+        changes = [
+            ConfigurationChange(key=key, old_value=current.get(key), new_value=value)
+            for key, value in values.items()
+            if key not in current or current[key] != value
+        ]
+        if not changes:
+            db.rollback()
+            return []
+        
+        statement = insert(Configuration).values([
+            {"Key": change.key, "Value": json.dumps(change.new_value)}
+            for change in changes
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[Configuration.Key],
+            set_={"Value": statement.excluded.Value}
+        )
+        db.execute(statement)
+        
+        payload = json.dumps({change.key: change.new_value for change in changes})
+        if len(payload.encode("utf-8")) > cls.MAX_PAYLOAD_SIZE:
+            # Too large to broadcast, tell workers to reload instead
+            payload = ""
+        ChangeListener.notify(db, cls.CHANNEL, payload)
         db.commit()
+        
+        for change in changes:
+            cls._apply(change.key, change.new_value)
+        return changes
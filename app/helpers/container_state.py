@@ -0,0 +1,64 @@
+import re
+import time
+import asyncio
+from typing import Dict, Optional, Set
+from app.helpers.docker_helper import docker
+
+# Matches the main container of a world, not helper containers like backups
+_CONTAINER_NAME = re.compile(r"^/?realm-server-(\d+)$")
+
+
+class ContainerState:
+    """Snapshot of which worlds have a running server container, and on which port
+    
+    One Docker API call lists every running realm container, and the result
+    is shared by all callers for TTL seconds. Concurrent refreshes wait on
+    the same call instead of each querying Docker.
+    """
+    TTL = 2.0
+    _running: Set[int] = set()
+    _ports: Dict[int, Optional[int]] = {}
+    _fetched_at: float = 0.0
+    _refresh: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _list_running() -> Dict[int, Optional[int]]:
+        # The low-level API returns plain dicts and skips building Container objects
+        containers = docker.from_env().api.containers(filters={"name": "realm-server-"})
+        ports = {}
+        for container in containers:
+            for name in container["Names"]:
+                match = _CONTAINER_NAME.match(name)
+                if match:
+                    ports[int(match.group(1))] = next((
+                        port["PublicPort"] for port in container["Ports"]
+                        if port.get("PrivatePort") == 25565 and "PublicPort" in port
+                    ), None)
+        return ports
+    
+    @classmethod
+    async def _fetch(cls) -> None:
+        cls._ports = await asyncio.to_thread(cls._list_running)
+        cls._running = set(cls._ports)
+        cls._fetched_at = time.monotonic()
+    
+    @classmethod
+    async def get_running(cls) -> Set[int]:
+        """Get the ids of worlds whose server container is running"""
+        if time.monotonic() - cls._fetched_at < cls.TTL:
+            return cls._running
+        if cls._refresh is None or cls._refresh.done():
+            cls._refresh = asyncio.create_task(cls._fetch())
+        await asyncio.shield(cls._refresh)
+        return cls._running
+    
+    @classmethod
+    async def get_port(cls, world_id: int) -> Optional[int]:
+        """Get the host port of a world's running server, or None if it is not running"""
+        await cls.get_running()
+        return cls._ports.get(world_id)
+    
+    @classmethod
+    def invalidate(cls) -> None:
+        """Force the next lookup to query Docker, e.g. after starting or stopping a server"""
+        cls._fetched_at = 0.0
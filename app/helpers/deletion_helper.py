@@ -0,0 +1,220 @@
+import re
+import time
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import World, Slot, Backup, Player, Invite, PlayerSession, Subscription, DeletionJob, VolumeUsage
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper, docker
+from app.helpers.invite_helper import InviteHelper
+from app.helpers.metrics import Metrics
+from app.helpers.shared_state import LeaderLock, world_lock
+
+Metrics.describe("deletion_jobs_total", "World deletion jobs run, by result")
+Metrics.describe("deletion_orphans_total", "Worlds queued for deletion because their Docker resources outlived them")
+
+# Main containers, helpers of slot switches and resets, and volumes all carry the world id
+_RESOURCE_NAME = re.compile(r"^/?realm-server-(\d+)(?:-next|-reset)?$")
+
+
+class DeletionHelper:
+    """Durable background teardown of deleted worlds
+    
+    Deleting a world only stamps World.DeletedAt, which hides it from every
+    query, and queues a DeletionJobs row. Workers on every host claim due
+    jobs with FOR UPDATE SKIP LOCKED and lease them for LEASE, so a job
+    whose worker dies is picked up again. Failures are retried with
+    backoff. A reconciler queues jobs for realm-server containers and
+    volumes whose world no longer exists.
+    """
+    LEASE = timedelta(minutes=10)
+    CONCURRENCY = 4
+    MAX_BACKOFF = 3600
+    ORPHAN_GRACE = 600
+    RECONCILER_KEY = 2
+    _wake = asyncio.Event()
+    _reconciler = LeaderLock(RECONCILER_KEY)
+    
+    @staticmethod
+    def queue(db: Session, world_ids: Iterable[int]) -> int:
+        """Queue worlds for teardown, skipping those already queued"""
+        rows = [{"WorldId": world_id} for world_id in world_ids]
+        if not rows:
+            return 0
+        statement = insert(DeletionJob).values(rows).on_conflict_do_nothing(index_elements=["WorldId"])
+        return db.execute(statement).rowcount
+    
+    @classmethod
+    def soft_delete(cls, db: Session, world: World) -> None:
+        """Hide a world and queue its teardown, committed with the caller's transaction
+        
+        Open invites go at once, along with the players who never accepted
+        them, since a hidden world can no longer be listed or joined.
+        """
+        world.DeletedAt = datetime.now()
+        cls.queue(db, [world.Id])
+        
+        invites = Invite.__table__
+        recipients = db.execute(
+            delete(invites).where(invites.c.WorldId == world.Id).returning(invites.c.RecipientUuid)
+        ).scalars().all()
+        players = Player.__table__
+        db.execute(delete(players).where(players.c.WorldId == world.Id, players.c.Accepted == False))
+        for recipient_uuid, count in Counter(recipients).items():
+            InviteHelper.invite_removed(db, recipient_uuid, count, commit=False)
+    
+    @classmethod
+    def wake(cls) -> None:
+        """Let this worker's job loop look for work right away"""
+        cls._wake.set()
+    
+    @classmethod
+    def _claim(cls, limit: int) -> List[Tuple[int, int]]:
+        db = SessionLocal()
+        try:
+            due = (
+                select(DeletionJob.Id)
+                .where(DeletionJob.RunAfter <= func.now())
+                .order_by(DeletionJob.RunAfter)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            rows = db.execute(
+                update(DeletionJob)
+                .where(DeletionJob.Id.in_(due))
+                .values(RunAfter=func.now() + cls.LEASE, Attempts=DeletionJob.Attempts + 1)
+                .returning(DeletionJob.WorldId, DeletionJob.Attempts)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+            return [(row.WorldId, row.Attempts) for row in rows]
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _remove_rows(world_id: int) -> None:
+        """Delete a world with everything referencing it, along with its job"""
+        worlds = World.__table__
+        slot_ids = select(Slot.Id).where(Slot.WorldId == world_id)
+        db = SessionLocal()
+        try:
+            # Break the references back into the rows about to go
+            db.execute(update(worlds).where(worlds.c.Id == world_id).values(ActiveSlotId=None, SubscriptionId=None))
+            db.execute(update(worlds).where(worlds.c.ParentWorldId == world_id).values(ParentWorldId=None))
+            db.execute(delete(Backup.__table__).where(Backup.__table__.c.SlotId.in_(slot_ids)))
+            for entity in (Slot, Player, Invite, PlayerSession, Subscription, VolumeUsage):
+                table = entity.__table__
+                db.execute(delete(table).where(table.c.WorldId == world_id))
+            db.execute(delete(worlds).where(worlds.c.Id == world_id))
+            db.execute(delete(DeletionJob.__table__).where(DeletionJob.__table__.c.WorldId == world_id))
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    def _retry_later(cls, world_id: int, attempts: int, error: str) -> None:
+        delay = timedelta(seconds=min(10 * 2 ** attempts, cls.MAX_BACKOFF))
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(DeletionJob)
+                .where(DeletionJob.WorldId == world_id)
+                .values(RunAfter=func.now() + delay, LastError=error)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    async def _process(cls, world_id: int, attempts: int) -> None:
+        try:
+            async with world_lock(world_id):
+                await DockerHelper(world_id).delete_server()
+                ContainerState.invalidate()
+                await asyncio.to_thread(cls._remove_rows, world_id)
+            Metrics.increment("deletion_jobs_total", result="done")
+        except Exception as e:
+            Metrics.increment("deletion_jobs_total", result="failed")
+            print(f"Failed to delete world {world_id} (attempt {attempts}): {e}")
+            await asyncio.to_thread(cls._retry_later, world_id, attempts, str(e))
+    
+    @classmethod
+    async def run_worker(cls, interval: float = 5.0) -> None:
+        """Run due deletion jobs, a few at a time, until none are left"""
+        while True:
+            try:
+                jobs = await asyncio.to_thread(cls._claim, cls.CONCURRENCY)
+                if jobs:
+                    await asyncio.gather(*(cls._process(world_id, attempts) for world_id, attempts in jobs))
+                    continue
+            except Exception as e:
+                print(f"Failed to run deletion jobs: {e}")
+            try:
+                await asyncio.wait_for(cls._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            cls._wake.clear()
+    
+    @staticmethod
+    def _list_resources() -> Dict[int, float]:
+        """Map the world ids of realm-server containers and volumes to their latest creation time"""
+        client = docker.from_env()
+        created: Dict[int, float] = {}
+        for container in client.api.containers(all=True, filters={"name": "realm-server-"}):
+            for name in container["Names"]:
+                match = _RESOURCE_NAME.match(name)
+                if match:
+                    world_id = int(match.group(1))
+                    created[world_id] = max(created.get(world_id, 0), container["Created"])
+        for volume in client.api.volumes(filters={"name": "realm-server-"}).get("Volumes") or []:
+            match = _RESOURCE_NAME.match(volume["Name"])
+            if match:
+                world_id = int(match.group(1))
+                timestamp = datetime.fromisoformat(volume["CreatedAt"]).timestamp()
+                created[world_id] = max(created.get(world_id, 0), timestamp)
+        return created
+    
+    @classmethod
+    def _queue_orphans(cls, world_ids: List[int]) -> int:
+        db = SessionLocal()
+        try:
+            live = set(db.execute(select(World.Id).where(World.Id.in_(world_ids))).scalars())
+            queued = cls.queue(db, [world_id for world_id in world_ids if world_id not in live])
+            db.commit()
+            return queued
+        finally:
+            db.close()
+    
+    @classmethod
+    async def reconcile(cls) -> int:
+        """Queue teardown of Docker resources left without a live world, on one worker only"""
+        if not await cls._reconciler.is_leader():
+            return 0
+        created = await asyncio.to_thread(cls._list_resources)
+        # Skip fresh resources, whose world may not be committed yet
+        cutoff = time.time() - cls.ORPHAN_GRACE
+        candidates = sorted(world_id for world_id, timestamp in created.items() if timestamp < cutoff)
+        if not candidates:
+            return 0
+        queued = await asyncio.to_thread(cls._queue_orphans, candidates)
+        if queued:
+            Metrics.increment("deletion_orphans_total", queued)
+            cls.wake()
+        return queued
+    
+    @classmethod
+    async def run_reconciler(cls, interval: float = 600.0) -> None:
+        """Periodically look for orphaned Docker resources"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await cls.reconcile()
+            except Exception as e:
+                print(f"Failed to reconcile Docker resources: {e}")
@@ -0,0 +1,295 @@
+import re
+import time
+import asyncio
+import subprocess
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import World, VolumeUsage
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import docker
+from app.helpers.image_helper import ImageHelper
+from app.helpers.metrics import Metrics
+from app.helpers.resource_helper import ResourceHelper
+from app.helpers.shared_state import LeaderLock
+
+Metrics.describe("volume_measurements_total", "Realm volumes whose disk usage was measured, by method")
+Metrics.describe("volume_quota_rejections_total", "Writes refused because a realm's volume is over its quota")
+
+_VOLUME_NAME = re.compile(r"^realm-server-(\d+)$")
+# One line of du -s -k for a volume mounted at /v/{world id}
+_DU_LINE = re.compile(r"^(\d+)\s+/v/(\d+)$")
+# One line of du -s -k for the world directory of a slot in such a volume
+_DU_SLOT_LINE = re.compile(r"^(\d+)\s+/v/(\d+)/slot-(\d+)$")
+# Measures the slots, then every mounted volume, at the lowest CPU priority and idle I/O priority where ionice exists.
+# Separate runs, since du counts a directory once per run.
+_SCAN_SCRIPT = (
+    'p=; command -v ionice >/dev/null && p="ionice -c 3"; '
+    '$p nice -n 19 du -s -k /v/*/slot-*; exec $p nice -n 19 du -s -k /v/*'
+)
+MIB = 1024 * 1024
+
+
+def parse_du_output(output: str) -> Dict[int, int]:
+    """Get the bytes used per world id from the output of the scan"""
+    usage = {}
+    for line in output.splitlines():
+        match = _DU_LINE.match(line.strip())
+        if match:
+            usage[int(match.group(2))] = int(match.group(1)) * 1024
+    return usage
+
+
+def parse_slot_usage(output: str) -> Dict[int, Dict[int, int]]:
+    """Get the bytes used per slot id of each world id from the output of the scan"""
+    usage: Dict[int, Dict[int, int]] = {}
+    for line in output.splitlines():
+        match = _DU_SLOT_LINE.match(line.strip())
+        if match:
+            usage.setdefault(int(match.group(2)), {})[int(match.group(3))] = int(match.group(1)) * 1024
+    return usage
+
+
+def parse_project_report(output: str, id_base: int) -> Dict[int, Tuple[int, int]]:
+    """Get the bytes used and hard limit per world id from `xfs_quota -c 'report -p -b -n -N'`
+    
+    Each line holds #project, then used, soft and hard in KiB. Projects not
+    above id_base belong to something else and are skipped.
+    """
+    report = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) < 4 or not fields[0].startswith("#"):
+            continue
+        try:
+            project, used, hard = int(fields[0][1:]), int(fields[1]), int(fields[3])
+        except ValueError:
+            continue
+        if project > id_base:
+            report[project - id_base] = (used * 1024, hard * 1024)
+    return report
+
+
+def select_scans(
+    volumes: Iterable[int],
+    measured: Dict[int, float],
+    active: Set[int],
+    now: float,
+    max_age: float
+) -> List[int]:
+    """Pick the volumes to measure again, never measured first, then oldest
+    
+    A volume only changes while its server runs, so those measured already
+    are picked when their server ran since, or when older than max_age.
+    """
+    picked = [
+        world_id for world_id in volumes
+        if world_id not in measured or world_id in active or now - measured[world_id] > max_age
+    ]
+    return sorted(picked, key=lambda world_id: measured.get(world_id, 0))
+
+
+class DiskUsageHelper:
+    """Disk used by each realm volume, and the quota it is held to
+    
+    Only the worker holding the leader lock measures, and results are kept
+    in VolumeUsages, so requests read them with one indexed lookup and never
+    touch the disk. With DISK_QUOTA_FILESYSTEM set to the XFS mount holding
+    the Docker volumes, mounted with prjquota, each volume is made a project
+    whose usage the filesystem keeps current, read for all volumes in one
+    report per pass, and its quota is applied as the hard limit. Otherwise
+    volumes are measured by du in a throwaway container at the lowest
+    priority, and only those whose server ran since their last scan are
+    measured again, along with any older than RESCAN_AFTER. Scans also
+    measure each slot's world directory, so a reset is only held to the
+    space left by the other slots.
+    """
+    LEADER_KEY = 4
+    SCAN_BATCH_SIZE = 50
+    SCAN_TIMEOUT = 1800
+    RESCAN_AFTER = 86400
+    SCAN_CONTAINER = "realm-disk-scan"
+    # Set at startup from DISK_QUOTA_FILESYSTEM, DISK_QUOTA_PROJECT_BASE and DISK_SCAN_IMAGE
+    _filesystem: Optional[str] = None
+    _project_id_base: int = 100000
+    _scan_image: str = "busybox:latest"
+    _was_running: Set[int] = set()
+    _leader = LeaderLock(LEADER_KEY)
+    
+    @classmethod
+    def configure(cls, filesystem: Optional[str], project_id_base: int, scan_image: str) -> None:
+        cls._filesystem = filesystem
+        cls._project_id_base = project_id_base
+        cls._scan_image = scan_image
+    
+    @staticmethod
+    def get_usage(db: Session, world_id: int) -> Optional[int]:
+        """Get the bytes a world's volume used when last measured, or None if never measured"""
+        return db.execute(select(VolumeUsage.Bytes).where(VolumeUsage.WorldId == world_id)).scalar()
+    
+    @classmethod
+    def has_room(cls, db: Session, world: World, incoming: int = 0, replacing_slot: Optional[int] = None) -> bool:
+        """Check that a world's volume can take incoming more bytes without exceeding its quota
+        
+        With replacing_slot, the incoming bytes replace that slot's world, so
+        only the rest of the volume counts. When the last measurement has no
+        per-slot breakdown, only the incoming bytes are held to the quota.
+        """
+        quota = ResourceHelper.get_disk_quota(world)
+        if not quota:
+            return True
+        row = db.execute(
+            select(VolumeUsage.Bytes, VolumeUsage.SlotBytes).where(VolumeUsage.WorldId == world.Id)
+        ).first()
+        used = row.Bytes if row else 0
+        if replacing_slot is not None:
+            slots = row.SlotBytes if row else None
+            used = used - slots.get(str(replacing_slot), 0) if slots is not None else 0
+        if used + incoming <= quota * MIB:
+            return True
+        Metrics.increment("volume_quota_rejections_total")
+        return False
+    
+    @staticmethod
+    def _list_volumes() -> Dict[int, str]:
+        volumes = docker.from_env().api.volumes(filters={"name": "realm-server-"})["Volumes"] or []
+        mountpoints = {}
+        for volume in volumes:
+            match = _VOLUME_NAME.match(volume["Name"])
+            if match:
+                mountpoints[int(match.group(1))] = volume["Mountpoint"]
+        return mountpoints
+    
+    @staticmethod
+    def _measured() -> Dict[int, float]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(VolumeUsage.WorldId, VolumeUsage.MeasuredAt)).all()
+            return {row.WorldId: row.MeasuredAt.timestamp() for row in rows}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _quotas(world_ids: List[int]) -> Dict[int, int]:
+        db = SessionLocal()
+        try:
+            worlds = db.query(World).filter(World.Id.in_(world_ids)).all()
+            return {world.Id: ResourceHelper.get_disk_quota(world) * MIB for world in worlds}
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _store(usage: Dict[int, int], slots: Optional[Dict[int, Dict[int, int]]] = None) -> None:
+        if not usage:
+            return
+        now = datetime.now()
+        statement = insert(VolumeUsage).values([
+            {
+                "WorldId": world_id,
+                "Bytes": used,
+                # JSON keys are strings
+                "SlotBytes": {str(slot_id): size for slot_id, size in slots.get(world_id, {}).items()}
+                if slots is not None else None,
+                "MeasuredAt": now
+            }
+            for world_id, used in usage.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[VolumeUsage.WorldId],
+            set_={
+                "Bytes": statement.excluded.Bytes,
+                "SlotBytes": statement.excluded.SlotBytes,
+                "MeasuredAt": statement.excluded.MeasuredAt
+            }
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    def _xfs_quota(cls, command: str) -> str:
+        return subprocess.run(
+            ["xfs_quota", "-x", "-c", command, cls._filesystem],
+            capture_output=True, text=True, check=True
+        ).stdout
+    
+    @classmethod
+    def _sync_projects(cls, mountpoints: Dict[int, str]) -> Dict[int, int]:
+        """Read every project's usage, making new volumes projects and updating changed limits"""
+        report = parse_project_report(cls._xfs_quota("report -p -b -n -N"), cls._project_id_base)
+        quotas = cls._quotas(list(mountpoints))
+        for world_id, quota in quotas.items():
+            project = cls._project_id_base + world_id
+            if world_id not in report:
+                # Tags the directory tree, so files written later are counted against the project
+                cls._xfs_quota(f"project -s -p {mountpoints[world_id]} {project}")
+            if report.get(world_id, (0, None))[1] != quota:
+                cls._xfs_quota(f"limit -p bhard={quota // 1024}k {project}")
+        return {world_id: used for world_id, (used, _) in report.items() if world_id in mountpoints}
+    
+    @classmethod
+    def _scan(cls, world_ids: List[int]) -> Tuple[Dict[int, int], Dict[int, Dict[int, int]]]:
+        """Measure volumes and their slots with du in one container mounting them all read-only"""
+        client = docker.from_env()
+        try:
+            client.containers.get(cls.SCAN_CONTAINER).remove(force=True)  # Left by an interrupted scan
+        except docker.errors.NotFound:
+            pass
+        container = client.containers.create(
+            image=cls._scan_image,
+            name=cls.SCAN_CONTAINER,
+            command=["sh", "-c", _SCAN_SCRIPT],
+            volumes={f"realm-server-{world_id}": {"bind": f"/v/{world_id}", "mode": "ro"} for world_id in world_ids},
+            cpu_shares=2,
+            network_disabled=True
+        )
+        try:
+            container.start()
+            # du exits non-zero when a volume is removed mid-scan, and still reports the others
+            container.wait(timeout=cls.SCAN_TIMEOUT)
+            output = container.logs(stdout=True, stderr=False).decode("utf-8", errors="replace")
+            return parse_du_output(output), parse_slot_usage(output)
+        finally:
+            container.remove(force=True)
+    
+    @classmethod
+    async def refresh(cls) -> int:
+        """Measure the volumes due for it and store their usage, returning how many were measured"""
+        mountpoints = await asyncio.to_thread(cls._list_volumes)
+        if cls._filesystem:
+            usage = await asyncio.to_thread(cls._sync_projects, mountpoints)
+            await asyncio.to_thread(cls._store, usage)
+            Metrics.increment("volume_measurements_total", len(usage), method="project")
+            return len(usage)
+        
+        running = set(await ContainerState.get_running())
+        measured = await asyncio.to_thread(cls._measured)
+        # Servers that stopped since the last pass get measured one last time
+        picked = select_scans(mountpoints, measured, running | cls._was_running, time.time(), cls.RESCAN_AFTER)
+        if picked:
+            await ImageHelper.ensure(cls._scan_image)
+        count = 0
+        for start in range(0, len(picked), cls.SCAN_BATCH_SIZE):
+            usage, slots = await asyncio.to_thread(cls._scan, picked[start:start + cls.SCAN_BATCH_SIZE])
+            await asyncio.to_thread(cls._store, usage, slots)
+            Metrics.increment("volume_measurements_total", len(usage), method="scan")
+            count += len(usage)
+        cls._was_running = running
+        return count
+    
+    @classmethod
+    async def run_accountant(cls, interval: float = 60.0) -> None:
+        """Periodically measure realm volumes, on one worker only"""
+        while True:
+            try:
+                if await cls._leader.is_leader():
+                    await cls.refresh()
+            except Exception as e:
+                print(f"Disk usage accounting failed: {e}")
+            await asyncio.sleep(interval)
@@ -1,7 +1,81 @@
-import docker
+import io
+import sys
+import asyncio
+import secrets
 import socket
-from typing import Optional
-from docker.models.containers import Container
+import tarfile
+import time
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, TYPE_CHECKING
+from app.helpers.rcon import RconError, RconPool
+
+if TYPE_CHECKING:
+    from docker.models.containers import Container
+    from app.helpers.resource_helper import ResourceLimits
+
+
+def _lazy_import(name: str):
+    """Import a module on first attribute access"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# The docker SDK pulls in requests and friends, so only load it once used
+docker = _lazy_import("docker")
+
+# Values of level-type by the levelType of reset requests, in the spelling every server version accepts
+LEVEL_TYPES = {0: "default", 1: "flat", 2: "largebiomes", 3: "amplified"}
+
+# Following logs blocks a thread for a whole boot, so keep that off asyncio's default pool
+_log_watchers = ThreadPoolExecutor(max_workers=128, thread_name_prefix="log-watch")
+
+
+def _escape_property(value: str) -> str:
+    """Escape a value for a Java properties file, leaving only printable ASCII other than backslashes as is"""
+    escaped = []
+    for char in value:
+        if "!" <= char <= "~" and char != "\\":
+            escaped.append(char)
+            continue
+        units = char.encode("utf-16-be")
+        escaped.extend(f"\\u{int.from_bytes(units[i:i + 2], 'big'):04x}" for i in range(0, len(units), 2))
+    return "".join(escaped)
+
+
+class StreamHandle:
+    """Stop handle of a Docker stream read on another thread, which closes the stream once it is open"""
+    
+    def __init__(self):
+        self.stopped = False
+        self._stream = None
+        self._lock = threading.Lock()
+    
+    def attach(self, stream) -> bool:
+        """Keep the opened stream, or close it at once if already stopped"""
+        with self._lock:
+            if not self.stopped:
+                self._stream = stream
+                return True
+        stream.close()
+        return False
+    
+    def stop(self) -> None:
+        with self._lock:
+            self.stopped = True
+            stream = self._stream
+        if stream is not None:
+            # Shuts the socket down, so the reading thread returns without waiting for more data
+            stream.close()
 
 
 class DockerHelper:
@@ -25,19 +99,34 @@ class DockerHelper:
             port = s.getsockname()[1]
         return port
     
-    async def create_container(self, slot_id: int) -> Container:
+    async def create_container(
+        self,
+        slot_id: int,
+        port: Optional[int] = None,
+        environment: Optional[Dict[str, str]] = None,
+        name: Optional[str] = None,
+        limits: Optional['ResourceLimits'] = None,
+        image: str = "realm-server"
+    ) -> 'Container':
         """Create a Docker container for the server"""
-        free_port = self._find_free_port()
-        container_name = f"realm-server-{self.world_id}"
+        free_port = port or self._find_free_port()
+        container_name = name or f"realm-server-{self.world_id}"
         
         container = self.docker_client.containers.create(
-            image="realm-server",
+            image=image,
             name=container_name,
             detach=True,
             auto_remove=True,
             ports={'25565/tcp': ('0.0.0.0', free_port)},
             volumes={f"realm-server-{self.world_id}": {'bind': '/mc', 'mode': 'rw'}},
-            environment={'SLOT_ID': str(slot_id)}
+            environment={
+                **(environment or {}),
+                'SLOT_ID': str(slot_id),
+                'ENABLE_RCON': 'true',
+                # Every container gets its own password, read back when connecting
+                'RCON_PASSWORD': secrets.token_urlsafe(24)
+            },
+            **(limits.to_container_options() if limits else {})
         )
         return container
     
@@ -49,10 +138,125 @@ class DockerHelper:
         except docker.errors.NotFound:
             return False
     
-    async def start_server(self, slot_id: int) -> None:
-        """Start the server container"""
-        container = await self.create_container(slot_id)
+    def _put_files(self, container: 'Container', files: Dict[str, bytes], directory: str = "/mc") -> None:
+        """Copy files into the server directory of a container, or another directory"""
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name=name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+        container.put_archive(directory, archive.getvalue())
+    
+    async def start_server(
+        self,
+        slot_id: int,
+        files: Optional[Dict[str, bytes]] = None,
+        environment: Optional[Dict[str, str]] = None,
+        limits: Optional['ResourceLimits'] = None,
+        image: str = "realm-server"
+    ) -> int:
+        """Start the server container, writing the given files into it first
+        
+        Returns the host port the server is bound to.
+        """
+        port = self._find_free_port()
+        container = await self.create_container(slot_id, port, environment, limits=limits, image=image)
+        if files:
+            self._put_files(container, files)
         container.start()
+        return port
+    
+    @staticmethod
+    def _wait_for_log(stream, marker: bytes) -> bool:
+        # The stream ends when the container exits, or when it is closed
+        for line in stream:
+            if marker in line:
+                return True
+        return False
+    
+    async def wait_until_ready(self, timeout: float = 180.0) -> bool:
+        """Wait until the server has finished starting and accepts players"""
+        name = f"realm-server-{self.world_id}"
+        loop = asyncio.get_running_loop()
+        try:
+            container = await loop.run_in_executor(_log_watchers, self.docker_client.containers.get, name)
+            stream = await loop.run_in_executor(_log_watchers, lambda: container.logs(stream=True, follow=True))
+        except docker.errors.NotFound:
+            return False
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(_log_watchers, self._wait_for_log, stream, b"Done ("), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # Shuts the socket down, so a thread still blocked reading it returns at once
+            stream.close()
+    
+    async def get_running_slot(self) -> Optional[Dict[str, str]]:
+        """Get the environment the running server was created with, or None if it is not running"""
+        try:
+            container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
+        except docker.errors.NotFound:
+            return None
+        if container.status != 'running':
+            return None
+        return dict(item.split("=", 1) for item in container.attrs["Config"]["Env"])
+    
+    def _wait_removed(self, name: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                container = self.docker_client.containers.get(name)
+            except docker.errors.NotFound:
+                return
+            if container.status == 'running':
+                container.wait(timeout=max(1, int(deadline - time.monotonic())))
+            else:
+                # Exited, and auto_remove is about to delete it
+                time.sleep(0.05)
+        raise TimeoutError(f"{name} was not removed within {timeout:g}s")
+    
+    async def replace_server(
+        self,
+        slot_id: int,
+        files: Dict[str, bytes],
+        environment: Dict[str, str],
+        limits: Optional['ResourceLimits'] = None,
+        image: str = "realm-server",
+        timeout: float = 180.0
+    ) -> Tuple[int, float]:
+        """Replace the running server with one for another slot or version
+        
+        The replacement is created as realm-server-{id}-next while the old
+        server runs, then started once the old one has stopped and been
+        removed: both would share server.properties, server.jar and the logs
+        in /mc, so they never run side by side. Returns the new port and the
+        seconds the world was unavailable.
+        """
+        name = f"realm-server-{self.world_id}"
+        next_name = f"{name}-next"
+        try:
+            self.docker_client.containers.get(next_name).remove(force=True)  # Left by a failed switch
+        except docker.errors.NotFound:
+            pass
+        
+        port = self._find_free_port()
+        container = await self.create_container(slot_id, port, environment, name=next_name, limits=limits, image=image)
+        try:
+            self._put_files(container, files)
+            stopped_at = time.monotonic()
+            await self.stop_server()
+            await asyncio.to_thread(self._wait_removed, name, timeout)
+            container.start()
+            container.rename(name)
+        except Exception:
+            container.remove(force=True)
+            raise
+        
+        if not await self.wait_until_ready(timeout):
+            raise RuntimeError(f"{name} did not finish starting")
+        return port, time.monotonic() - stopped_at
     
     async def get_server_port(self) -> int:
         """Get the port the server is bound to"""
@@ -68,31 +272,155 @@ class DockerHelper:
                 container.stop()
             else:
                 await self.execute_command("stop")
+        except (docker.errors.NotFound, docker.errors.APIError):
+            pass  # Already stopping, so the fallback exec found no running container
+        finally:
+            RconPool.discard(self.world_id)
+    
+    def _remove_server(self) -> None:
+        # Includes helpers left behind by an interrupted slot switch or reset
+        name = f"realm-server-{self.world_id}"
+        for name in (name, f"{name}-next", f"{name}-reset"):
+            try:
+                self.docker_client.containers.get(name).remove(force=True)
+            except docker.errors.NotFound:
+                pass
+        
+        try:
+            volume = self.docker_client.volumes.get(f"realm-server-{self.world_id}")
+            volume.remove()
         except docker.errors.NotFound:
             pass
     
     async def delete_server(self) -> None:
-        """Delete the server container and volume"""
+        """Delete the server containers and volume"""
+        RconPool.discard(self.world_id)
+        # Removing a big volume takes a while, so keep it off the event loop
+        await asyncio.to_thread(self._remove_server)
+    
+    @staticmethod
+    def world_directory(slot_id: int) -> str:
+        """Get the directory in the volume holding a slot's world, which the entrypoint sets as level-name"""
+        return f"/mc/slot-{slot_id}"
+    
+    @staticmethod
+    def generation_properties(seed: str, level_type: int, generate_structures: bool) -> bytes:
+        """Build the server.properties lines the entrypoint applies when a slot's world is generated
+        
+        Raises ValueError for an unknown level type.
+        """
+        if level_type not in LEVEL_TYPES:
+            raise ValueError(f"Unknown level type {level_type}")
+        return (
+            f"level-seed={_escape_property(seed)}\n"
+            f"level-type={LEVEL_TYPES[level_type]}\n"
+            f"generate-structures={str(generate_structures).lower()}\n"
+        ).encode("utf-8")
+    
+    def _reset_world(
+        self,
+        slot_id: int,
+        archive: Optional[Path],
+        generation: Optional[bytes],
+        image: str,
+        timeout: float
+    ) -> bool:
+        name = f"realm-server-{self.world_id}"
+        running = False
         try:
-            container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
-            container.remove(force=True)
+            container = self.docker_client.containers.get(name)
+            running = container.status == 'running'
+            container.stop(timeout=int(timeout))
         except docker.errors.NotFound:
-            print("Container offline, removing only server data")
+            pass
+        self._wait_removed(name, timeout)
         
+        directory = self.world_directory(slot_id)
+        reset_name = f"{name}-reset"
         try:
-            volume = self.docker_client.volumes.get(f"realm-server-{self.world_id}")
-            volume.remove()
+            self.docker_client.containers.get(reset_name).remove(force=True)  # Left by a failed reset
         except docker.errors.NotFound:
             pass
+        # A throwaway container of the server image empties the directory and receives the template
+        helper = self.docker_client.containers.create(
+            image=image,
+            name=reset_name,
+            entrypoint=["sh", "-c", f"rm -rf {directory} && mkdir -p {directory}"],
+            volumes={name: {'bind': '/mc', 'mode': 'rw'}}
+        )
+        try:
+            helper.start()
+            helper.wait(timeout=int(timeout))
+            if archive:
+                with open(archive, "rb") as file:
+                    helper.put_archive(directory, file)
+            elif generation:
+                self._put_files(helper, {"generation.properties": generation}, directory)
+        finally:
+            helper.remove(force=True)
+        return running
+    
+    async def reset_world(
+        self,
+        slot_id: int,
+        archive: Optional[Path] = None,
+        generation: Optional[bytes] = None,
+        image: str = "realm-server",
+        timeout: float = 180.0
+    ) -> bool:
+        """Replace a slot's world with a template's, or an empty one to generate anew
+        
+        An empty world is generated with the generation_properties given, if
+        any. A running server is stopped first. Returns whether it was running.
+        """
+        RconPool.discard(self.world_id)
+        return await asyncio.to_thread(self._reset_world, slot_id, archive, generation, image, timeout)
     
     async def execute_command(self, command: str) -> str:
-        """Execute a command in the container"""
+        """Execute a console command in the container"""
+        return await self.execute_commands([command])
+    
+    async def get_rcon_endpoint(self) -> Tuple[str, int, str]:
+        """Get the address and password of the server's RCON listener"""
         container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
-        exec_result = container.exec_run(command)
-        return exec_result.output.decode('utf-8')
+        env = dict(item.split("=", 1) for item in container.attrs["Config"]["Env"])
+        networks = container.attrs["NetworkSettings"]["Networks"]
+        address = next((n["IPAddress"] for n in networks.values() if n.get("IPAddress")), None)
+        if not address or "RCON_PASSWORD" not in env:
+            raise RconError(f"No RCON endpoint for realm-server-{self.world_id}")
+        return address, 25575, env["RCON_PASSWORD"]
+    
+    async def execute_commands(self, commands: List[str]) -> str:
+        """Execute console commands over the pooled RCON connection, pipelined
+        
+        Falls back to running rcon-cli inside the container when the server
+        cannot be reached over the network.
+        """
+        try:
+            responses = await RconPool.execute(self.world_id, commands, self.get_rcon_endpoint)
+            return "\n".join(responses)
+        except (RconError, OSError, asyncio.TimeoutError):
+            pass
+        
+        container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
+        outputs = [container.exec_run(["rcon-cli", command]).output.decode('utf-8') for command in commands]
+        return "\n".join(outputs)
+    
+    def open_server_logs(self, since: Optional[int] = None, timestamps: bool = False):
+        """Open a stream of raw server log lines, which ends when the container stops or the stream is closed
+        
+        Starts at since, in Unix seconds, if given, otherwise at the last 100 lines.
+        """
+        container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
+        options = {"since": since} if since else {"tail": 100}
+        return container.logs(stream=True, follow=True, timestamps=timestamps, **options)
+    
+    def iter_server_logs(self, since: Optional[int] = None, timestamps: bool = False):
+        """Follow server log lines until the container stops, blocking between lines"""
+        for line in self.open_server_logs(since, timestamps):
+            yield line.decode('utf-8', errors='replace')
     
     async def get_server_logs_stream(self, handler):
         """Stream server logs"""
-        container = self.docker_client.containers.get(f"realm-server-{self.world_id}")
-        for line in container.logs(stream=True, follow=True, tail=100):
-            handler(line.decode('utf-8'))
+        for line in self.iter_server_logs():
+            handler(line)
@@ -0,0 +1,264 @@
+import re
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+from sqlalchemy import func, select
+from app.models import SessionLocal
+from app.models.entities import Slot
+from app.helpers.docker_helper import docker
+from app.helpers.metrics import Metrics
+from app.helpers.minecraft_version_parser import MinecraftVersion
+from app.helpers.shared_state import CacheInvalidator, LeaderLock
+
+Metrics.describe("image_pulls_total", "Server image pulls, by result")
+Metrics.describe("image_evictions_total", "Server images removed to stay under the disk budget")
+Metrics.describe("image_cache_bytes", "Disk used by server images")
+
+# Characters Docker does not allow in a tag
+_INVALID_TAG = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+@dataclass
+class TagRule:
+    min_version: MinecraftVersion
+    tag: str
+
+
+def parse_tag_rules(value: str) -> List[TagRule]:
+    """Parse SERVER_IMAGE_TAGS, a comma separated list of minVersion=tag, newest first
+    
+    A tag may contain {version}, replaced by the slot's version, to build one
+    image per version.
+    """
+    rules = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        version, _, tag = item.partition("=")
+        rules.append(TagRule(min_version=MinecraftVersion(version.strip()), tag=tag.strip()))
+    rules.sort(key=lambda rule: rule.min_version, reverse=True)
+    return rules
+
+
+@dataclass
+class CachedImage:
+    ref: str
+    size: int
+    last_used: float
+
+
+def select_evictions(images: List[CachedImage], budget: int, keep: Set[str], wanted: Set[str]) -> List[str]:
+    """Pick the images to remove to get under budget bytes, least recently used first
+    
+    Images in keep, those of existing containers, are never picked, and
+    wanted ones, those of versions in use, only once nothing else is left.
+    Budget 0 disables eviction.
+    """
+    total = sum(image.size for image in images)
+    if not budget or total <= budget:
+        return []
+    evicted = []
+    for image in sorted(images, key=lambda image: (image.ref in wanted, image.last_used)):
+        if total <= budget:
+            break
+        if image.ref in keep:
+            continue
+        evicted.append(image.ref)
+        total -= image.size
+    return evicted
+
+
+class ImageHelper:
+    """Server images per Minecraft version
+    
+    A version maps to a tag of SERVER_IMAGE through SERVER_IMAGE_TAGS, so
+    SERVER_IMAGE may point at any registry, including a local one. The
+    images of every version found in Slots are pulled ahead of time a few at
+    a time, most used versions first. Images are then evicted least recently
+    used first while the cache exceeds SERVER_IMAGE_BUDGET_MB. Last use is
+    shared across workers, and only the worker holding the leader lock
+    pulls and evicts in the background.
+    """
+    CACHE_NAME = "image_usage"
+    LEADER_KEY = 3
+    PULL_CONCURRENCY = 2
+    # Set at startup from SERVER_IMAGE, SERVER_IMAGE_TAGS and SERVER_IMAGE_BUDGET_MB
+    _repository: str = "realm-server"
+    _rules: List[TagRule] = []
+    _budget: int = 0
+    _last_used: Dict[str, float] = {}
+    _wanted: Set[str] = set()
+    _pulls: Dict[str, asyncio.Task] = {}
+    _leader = LeaderLock(LEADER_KEY)
+    
+    @classmethod
+    def configure(cls, repository: str, rules: List[TagRule], budget: int = 0) -> None:
+        cls._repository = repository
+        cls._rules = rules
+        cls._budget = budget
+        cls._last_used = {}
+    
+    @classmethod
+    def get_tag(cls, version: str) -> str:
+        """Get the image tag serving a Minecraft version"""
+        try:
+            parsed = MinecraftVersion(version)
+        except ValueError:
+            parsed = None
+        for rule in cls._rules:
+            # Snapshots are newer than any rule can tell, so they take the newest one
+            if parsed is None or parsed.snapshot or parsed >= rule.min_version:
+                return _INVALID_TAG.sub("_", rule.tag.replace("{version}", version))[:128]
+        return "latest"
+    
+    @classmethod
+    def get_image(cls, version: str) -> str:
+        """Get the image reference serving a Minecraft version"""
+        return f"{cls._repository}:{cls.get_tag(version)}"
+    
+    @staticmethod
+    def _is_present(image: str) -> bool:
+        try:
+            docker.from_env().api.inspect_image(image)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+    
+    @staticmethod
+    def _pull(image: str) -> None:
+        repository, _, tag = image.rpartition(":")
+        docker.from_env().api.pull(repository, tag=tag)
+    
+    @classmethod
+    async def _fetch(cls, image: str) -> None:
+        try:
+            if await asyncio.to_thread(cls._is_present, image):
+                return
+            await asyncio.to_thread(cls._pull, image)
+            Metrics.increment("image_pulls_total", result="pulled")
+        except Exception:
+            Metrics.increment("image_pulls_total", result="failed")
+            raise
+    
+    @classmethod
+    async def ensure(cls, image: str) -> None:
+        """Make sure an image is present, sharing one pull between concurrent callers"""
+        task = cls._pulls.get(image)
+        if task is None:
+            task = asyncio.create_task(cls._fetch(image))
+            cls._pulls[image] = task
+            task.add_done_callback(lambda _: cls._pulls.pop(image, None))
+        await asyncio.shield(task)
+    
+    @classmethod
+    async def ensure_for_version(cls, version: str) -> str:
+        """Get the image for a version, pulling it if missing, and record its use"""
+        image = cls.get_image(version)
+        await cls.ensure(image)
+        await cls.mark_used(image)
+        return image
+    
+    @classmethod
+    async def mark_used(cls, image: str) -> None:
+        """Record that a server was started from an image"""
+        at = time.time()
+        cls._last_used[image] = at
+        await asyncio.to_thread(cls._publish_use, image, at)
+    
+    @classmethod
+    def _publish_use(cls, image: str, at: float) -> None:
+        db = SessionLocal()
+        try:
+            CacheInvalidator.publish(db, cls.CACHE_NAME, image, {"at": at})
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    def _on_message(cls, key: Optional[str], data: Optional[dict]) -> None:
+        if key is not None:
+            cls._last_used[key] = max(cls._last_used.get(key, 0), data["at"])
+    
+    @staticmethod
+    def _versions_in_use() -> List[str]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Slot.Version).group_by(Slot.Version).order_by(func.count().desc())
+            ).scalars()
+            return [version for version in rows if version]
+        finally:
+            db.close()
+    
+    @classmethod
+    async def prefetch(cls) -> int:
+        """Pull the images of every version in use, PULL_CONCURRENCY at a time"""
+        versions = await asyncio.to_thread(cls._versions_in_use)
+        images = list(dict.fromkeys(cls.get_image(version) for version in versions))
+        cls._wanted = set(images)
+        semaphore = asyncio.Semaphore(cls.PULL_CONCURRENCY)
+        
+        async def fetch(image: str) -> bool:
+            async with semaphore:
+                try:
+                    await cls.ensure(image)
+                    return True
+                except Exception as e:
+                    print(f"Failed to pull {image}: {e}")
+                    return False
+        
+        return sum(await asyncio.gather(*(fetch(image) for image in images)))
+    
+    @classmethod
+    def _list_cached(cls) -> List[CachedImage]:
+        client = docker.from_env().api
+        images = []
+        for image in client.images(name=cls._repository):
+            for ref in image.get("RepoTags") or []:
+                # Never used since this process started, so fall back to when it was pulled
+                last_used = cls._last_used.get(ref)
+                if last_used is None:
+                    last_used = float(image.get("Created", 0))
+                images.append(CachedImage(ref=ref, size=image["Size"], last_used=last_used))
+                break
+        return images
+    
+    @staticmethod
+    def _images_in_use() -> Set[str]:
+        containers = docker.from_env().api.containers(all=True, filters={"name": "realm-server-"})
+        return {container["Image"] for container in containers}
+    
+    @classmethod
+    def _evict(cls) -> int:
+        images = cls._list_cached()
+        Metrics.set_gauge("image_cache_bytes", sum(image.size for image in images))
+        evicted = 0
+        for ref in select_evictions(images, cls._budget, cls._images_in_use(), cls._wanted):
+            try:
+                docker.from_env().api.remove_image(ref)
+                cls._last_used.pop(ref, None)
+                evicted += 1
+            except docker.errors.APIError as e:
+                # Started from since the listing, or shared with another tag
+                print(f"Failed to evict {ref}: {e}")
+        Metrics.increment("image_evictions_total", evicted)
+        return evicted
+    
+    @classmethod
+    async def evict(cls) -> int:
+        """Remove least recently used images until the cache fits the budget"""
+        return await asyncio.to_thread(cls._evict)
+    
+    @classmethod
+    async def run_manager(cls, interval: float = 300.0) -> None:
+        """Periodically prefetch images in use and evict unused ones, on one worker only"""
+        while True:
+            try:
+                if await cls._leader.is_leader():
+                    await cls.prefetch()
+                    await cls.evict()
+            except Exception as e:
+                print(f"Image maintenance failed: {e}")
+            await asyncio.sleep(interval)
+
+
+CacheInvalidator.register(ImageHelper.CACHE_NAME, ImageHelper._on_message)
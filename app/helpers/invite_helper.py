@@ -0,0 +1,54 @@
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.models.entities import Invite
+from app.helpers.shared_state import CacheInvalidator
+
+
+class InviteHelper:
+    """Helper class for pending invite counts"""
+    CACHE_NAME = "pending_invites"
+    _pending_counts: Dict[str, int] = {}
+    
+    @classmethod
+    def get_pending_count(cls, db: Session, recipient_uuid: str) -> int:
+        """Get the pending invite count, querying only on a cache miss"""
+        count = cls._pending_counts.get(recipient_uuid)
+        if count is None:
+            count = db.query(Invite).filter(Invite.RecipientUuid == recipient_uuid).count()
+            cls._pending_counts[recipient_uuid] = count
+        return count
+    
+    @classmethod
+    def invite_created(cls, db: Session, recipient_uuid: str) -> None:
+        """Account for a new invite"""
+        if recipient_uuid in cls._pending_counts:
+            cls._pending_counts[recipient_uuid] += 1
+        cls._broadcast(db, recipient_uuid)
+    
+    @classmethod
+    def invite_removed(cls, db: Session, recipient_uuid: str, count: int = 1, commit: bool = True) -> None:
+        """Account for accepted, rejected, revoked or deleted invites
+        
+        Without commit, the other workers are told when the caller commits.
+        """
+        if recipient_uuid in cls._pending_counts:
+            cls._pending_counts[recipient_uuid] = max(0, cls._pending_counts[recipient_uuid] - count)
+        cls._broadcast(db, recipient_uuid, commit)
+    
+    @classmethod
+    def _broadcast(cls, db: Session, recipient_uuid: str, commit: bool = True) -> None:
+        """Tell the other workers to drop their cached count"""
+        CacheInvalidator.publish(db, cls.CACHE_NAME, recipient_uuid)
+        if commit:
+            db.commit()
+    
+    @classmethod
+    def invalidate(cls, recipient_uuid: Optional[str], data: Optional[dict] = None) -> None:
+        """Drop the cached count so the next poll reloads it, or all counts if no key is given"""
+        if recipient_uuid is None:
+            cls._pending_counts.clear()
+        else:
+            cls._pending_counts.pop(recipient_uuid, None)
+
+
+CacheInvalidator.register(InviteHelper.CACHE_NAME, InviteHelper.invalidate)
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Dict, Optional, Set
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import World
+from app.models.enums import SettingsEnum
+from app.helpers.config_helper import ConfigHelper
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper
+from app.helpers.image_helper import ImageHelper
+from app.helpers.ops_helper import OpsHelper
+from app.helpers.resource_helper import ResourceLimits
+from app.helpers.shared_state import CacheInvalidator, world_lock
+from app.helpers.version_helper import VersionHelper
+
+
+class JoinHelper:
+    """Resolves join addresses from a cached world-to-port map
+    
+    The map is updated when a server starts, finishes booting or stops, and
+    every update is broadcast so all workers share it. Joining a closed
+    realm starts it in the background, once per world, and the client is
+    told to retry with pendingUpdate until the server has booted.
+    """
+    CACHE_NAME = "server_addresses"
+    BOOT_TIMEOUT = 180.0
+    _ready: Dict[int, int] = {}
+    _booting: Dict[int, int] = {}
+    _starts: Dict[int, asyncio.Task] = {}
+    # The event loop only keeps weak references to tasks
+    _watches: Set[asyncio.Task] = set()
+    
+    @staticmethod
+    def get_address(port: Optional[int]) -> str:
+        host = ConfigHelper.get_setting(SettingsEnum.DefaultServerAddress.value)
+        return f"{host}:{port}" if port else ""
+    
+    @classmethod
+    def _apply(cls, world_id: int, port: Optional[int], ready: bool) -> None:
+        cls._ready.pop(world_id, None)
+        cls._booting.pop(world_id, None)
+        if port:
+            (cls._ready if ready else cls._booting)[world_id] = port
+    
+    @classmethod
+    def _publish(cls, db: Session, world_id: int, port: Optional[int], ready: bool) -> None:
+        cls._apply(world_id, port, ready)
+        CacheInvalidator.publish(db, cls.CACHE_NAME, str(world_id), {"port": port, "ready": ready})
+    
+    @classmethod
+    def server_started(cls, db: Session, world_id: int, port: int) -> None:
+        """Record a started server as booting and watch it until it accepts players"""
+        cls._publish(db, world_id, port, False)
+        task = asyncio.create_task(cls._watch_boot(world_id, port))
+        cls._watches.add(task)
+        task.add_done_callback(cls._watches.discard)
+    
+    @classmethod
+    def server_ready(cls, db: Session, world_id: int, port: int) -> None:
+        """Record a server that has already finished booting"""
+        cls._publish(db, world_id, port, True)
+    
+    @classmethod
+    def server_stopped(cls, db: Session, world_id: int) -> None:
+        """Forget the address of a stopped server"""
+        cls._publish(db, world_id, None, False)
+    
+    @classmethod
+    async def _watch_boot(cls, world_id: int, port: int) -> None:
+        ready = await DockerHelper(world_id).wait_until_ready(cls.BOOT_TIMEOUT)
+        if cls._booting.get(world_id) != port:
+            return  # Stopped or restarted in the meantime
+        db = SessionLocal()
+        try:
+            if ready:
+                cls.server_ready(db, world_id, port)
+            else:
+                cls.server_stopped(db, world_id)
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    async def _start(
+        cls,
+        world_id: int,
+        slot_id: int,
+        files: Dict[str, bytes],
+        environment: Dict[str, str],
+        limits: ResourceLimits
+    ) -> None:
+        try:
+            docker_helper = DockerHelper(world_id)
+            image = await ImageHelper.ensure_for_version(environment["VERSION"])
+            async with world_lock(world_id):
+                # Another worker may have started it while this one waited for the lock
+                if await docker_helper.is_running():
+                    return
+                OpsHelper.world_started(world_id)
+                port = await docker_helper.start_server(
+                    slot_id, files=files, environment=environment, limits=limits, image=image
+                )
+                ContainerState.invalidate()
+                db = SessionLocal()
+                try:
+                    world = db.query(World).filter(World.Id == world_id).first()
+                    VersionHelper.world_changed(db, world)
+                    cls.server_started(db, world_id, port)
+                    db.commit()
+                finally:
+                    db.close()
+        except Exception as e:
+            print(f"Failed to start world {world_id} for joining: {e}")
+        finally:
+            cls._starts.pop(world_id, None)
+    
+    @classmethod
+    async def join(cls, db: Session, world: World, environment: Dict[str, str], limits: ResourceLimits) -> dict:
+        """Get the address to join a world at, starting its server if needed"""
+        running = await ContainerState.get_running()
+        running_port = await ContainerState.get_port(world.Id)
+        if world.Id in cls._ready:
+            if world.Id in running:
+                return {"address": cls.get_address(cls._ready[world.Id]), "pendingUpdate": False}
+            cls._apply(world.Id, None, False)  # Crashed or stopped in-game
+        
+        if world.Id in cls._booting or world.Id in cls._starts:
+            return {"address": cls.get_address(cls._booting.get(world.Id)), "pendingUpdate": True}
+        
+        if running_port:
+            # Started before this worker learned of it, so it has long finished booting
+            cls._apply(world.Id, running_port, True)
+            return {"address": cls.get_address(running_port), "pendingUpdate": False}
+        
+        # Build the files here, since the request's session is gone once the task runs
+        files = {"ops.json": OpsHelper.ops_json(db, world)}
+        cls._starts[world.Id] = asyncio.create_task(
+            cls._start(world.Id, world.ActiveSlot.SlotId, files, environment, limits)
+        )
+        return {"address": "", "pendingUpdate": True}
+    
+    @classmethod
+    def _on_message(cls, key: Optional[str], data: Optional[dict]) -> None:
+        if key is None:
+            # Fall back to the container snapshot until servers change again
+            cls._ready.clear()
+            cls._booting.clear()
+            return
+        cls._apply(int(key), data["port"], data["ready"])
+
+
+CacheInvalidator.register(JoinHelper.CACHE_NAME, JoinHelper._on_message)
@@ -0,0 +1,51 @@
+from typing import Dict, Tuple
+
+
+class Metrics:
+    """In-process counters and gauges rendered in the Prometheus text format"""
+    _counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+    _gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+    _help: Dict[str, str] = {}
+    
+    @classmethod
+    def describe(cls, name: str, help_text: str) -> None:
+        """Set the help text of a metric"""
+        cls._help[name] = help_text
+    
+    @classmethod
+    def increment(cls, name: str, value: float = 1, **labels: str) -> None:
+        """Add to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        cls._counters[key] = cls._counters.get(key, 0) + value
+    
+    @classmethod
+    def set_gauge(cls, name: str, value: float, **labels: str) -> None:
+        """Set a gauge"""
+        cls._gauges[(name, tuple(sorted(labels.items())))] = value
+    
+    @classmethod
+    def remove_gauge(cls, name: str, **labels: str) -> None:
+        """Stop reporting a gauge, e.g. for a world that no longer runs"""
+        cls._gauges.pop((name, tuple(sorted(labels.items()))), None)
+    
+    @classmethod
+    def get(cls, name: str, **labels: str) -> float:
+        """Get the current value of a counter or gauge"""
+        key = (name, tuple(sorted(labels.items())))
+        return cls._counters.get(key, cls._gauges.get(key, 0))
+    
+    @classmethod
+    def render(cls) -> str:
+        """Render all metrics in the Prometheus text format"""
+        lines = []
+        for kind, values in (("counter", cls._counters), ("gauge", cls._gauges)):
+            described = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in described:
+                    if name in cls._help:
+                        lines.append(f"# HELP {name} {cls._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    described.add(name)
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
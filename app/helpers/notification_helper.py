@@ -0,0 +1,183 @@
+import json
+import asyncio
+import hashlib
+from typing import Dict, List, Set, Tuple, Iterable
+from sqlalchemy import literal_column
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.models import SessionLocal
+from app.models.entities import Notification, PlayerNotificationState
+from app.helpers.shared_state import CacheInvalidator
+
+
+class NotificationHelper:
+    """Helper class serving notifications from memory
+    
+    The active notifications are kept in memory along with the set of Ids
+    each player has seen. Newly seen Ids are persisted in batches, unioned
+    with the stored ones so workers never overwrite each other, and are
+    broadcast in the same transaction to the other workers, which merge
+    them into their sets. Ids of notifications that no longer exist are
+    dropped on every write, so the stored sets stay as small as the catalog.
+    """
+    CACHE_NAME = "seen_notifications"
+    # Union of the stored and the new Ids, without those of deleted notifications
+    MERGED_SEEN_IDS = literal_column(
+        'ARRAY(SELECT DISTINCT id FROM unnest("PlayerNotificationStates"."SeenIds" || excluded."SeenIds") AS id'
+        ' WHERE id IN (SELECT "Id" FROM "Notifications") ORDER BY id)'
+    )
+    _notifications: List[Tuple[int, dict]] = []
+    _ids_by_uuid: Dict[str, int] = {}
+    _dismissable: Set[str] = set()
+    _seen: Dict[str, Set[int]] = {}
+    _dirty: Set[str] = set()
+    _newly_seen: Dict[str, Set[int]] = {}
+    _remote_seen: Dict[str, Set[int]] = {}
+    _catalog_version: str = ""
+    
+    @classmethod
+    def load(cls, db: Session) -> None:
+        """Load the active notifications into memory"""
+        notifications = db.query(Notification).order_by(Notification.Id).all()
+        cls._notifications = [
+            (n.Id, {
+                "notificationUuid": n.NotificationUuid,
+                "dismissable": n.Dismissable,
+                "seen": False,
+                "type": n.Type,
+                "title": n.Title,
+                "message": n.Message,
+                "image": n.Image,
+                "urlButton": n.UrlButton,
+                "url": n.Url,
+                "buttonText": n.ButtonText
+            })
+            for n in notifications
+        ]
+        cls._ids_by_uuid = {n.NotificationUuid: n.Id for n in notifications}
+        cls._dismissable = {n.NotificationUuid for n in notifications if n.Dismissable}
+        # Derived from the content rather than the load time, so every worker tags alike
+        cls._catalog_version = hashlib.blake2b(
+            json.dumps(cls._notifications, sort_keys=True).encode("utf-8"), digest_size=8
+        ).hexdigest()
+    
+    @classmethod
+    def _get_seen(cls, db: Session, player_uuid: str) -> Set[int]:
+        """Get the Ids a player has seen, loading them on first use"""
+        seen = cls._seen.get(player_uuid)
+        if seen is None:
+            state = db.query(PlayerNotificationState).filter(
+                PlayerNotificationState.PlayerUUID == player_uuid
+            ).first()
+            seen = set(state.SeenIds) if state else set()
+            # Ids marked by other workers may not be persisted yet
+            seen |= cls._remote_seen.pop(player_uuid, set())
+            cls._seen[player_uuid] = seen
+        return seen
+    
+    @classmethod
+    def get_version(cls, db: Session, player_uuid: str) -> str:
+        """Get a version that changes whenever the player's unseen list may change"""
+        seen = sorted(cls._get_seen(db, player_uuid))
+        digest = hashlib.blake2b(json.dumps(seen).encode("utf-8"), digest_size=8).hexdigest()
+        return f"{cls._catalog_version}-{digest}"
+    
+    @classmethod
+    def get_unseen(cls, db: Session, player_uuid: str) -> List[dict]:
+        """Get the notifications the player has not seen yet"""
+        seen = cls._get_seen(db, player_uuid)
+        return [
+            notification
+            for notification_id, notification in cls._notifications
+            if notification_id not in seen
+        ]
+    
+    @classmethod
+    def mark_seen(cls, db: Session, player_uuid: str, notification_uuids: Iterable[str]) -> None:
+        """Mark notifications as seen, queueing the change for persistence"""
+        seen = cls._get_seen(db, player_uuid)
+        new_ids = set()
+        for notification_uuid in notification_uuids:
+            notification_id = cls._ids_by_uuid.get(notification_uuid)
+            if notification_id is not None and notification_id not in seen:
+                new_ids.add(notification_id)
+        
+        if new_ids:
+            seen |= new_ids
+            cls._dirty.add(player_uuid)
+            cls._newly_seen.setdefault(player_uuid, set()).update(new_ids)
+    
+    @classmethod
+    def merge_remote(cls, player_uuid: str, data: dict) -> None:
+        """Merge seen state broadcast by another worker"""
+        if player_uuid is None:
+            # Messages were missed, so reload seen state from the database
+            cls._seen = {player: seen for player, seen in cls._seen.items() if player in cls._dirty}
+            return
+        
+        # The sender persists these, as flushes union rather than overwrite
+        if player_uuid in cls._seen:
+            cls._seen[player_uuid].update(data["ids"])
+        else:
+            cls._remote_seen.setdefault(player_uuid, set()).update(data["ids"])
+    
+    @classmethod
+    def dismiss(cls, db: Session, player_uuid: str, notification_uuids: Iterable[str]) -> None:
+        """Dismiss notifications, ignoring those that are not dismissable"""
+        cls.mark_seen(db, player_uuid, [u for u in notification_uuids if u in cls._dismissable])
+    
+    @classmethod
+    def flush(cls, db: Session) -> int:
+        """Persist newly seen Ids in a single upsert, broadcasting them on commit"""
+        if not cls._dirty:
+            return 0
+        
+        dirty, cls._dirty = cls._dirty, set()
+        newly_seen, cls._newly_seen = cls._newly_seen, {}
+        rows = [
+            {"PlayerUUID": player_uuid, "SeenIds": sorted(ids)}
+            for player_uuid, ids in newly_seen.items()
+        ]
+        
+        statement = insert(PlayerNotificationState).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PlayerNotificationState.PlayerUUID],
+            set_={"SeenIds": cls.MERGED_SEEN_IDS}
+        )
+        try:
+            db.execute(statement)
+            # Only the new Ids, as NOTIFY payloads are capped
+            for player_uuid, ids in newly_seen.items():
+                CacheInvalidator.publish(db, cls.CACHE_NAME, player_uuid, {"ids": sorted(ids)})
+            db.commit()
+        except Exception:
+            db.rollback()
+            cls._dirty |= dirty
+            for player_uuid, ids in newly_seen.items():
+                cls._newly_seen.setdefault(player_uuid, set()).update(ids)
+            raise
+        return len(rows)
+    
+    @classmethod
+    def _flush_with_new_session(cls) -> int:
+        db = SessionLocal()
+        try:
+            return cls.flush(db)
+        finally:
+            db.close()
+    
+    @classmethod
+    async def run_flusher(cls, interval: float = 5.0) -> None:
+        """Periodically persist queued seen state changes"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(cls._flush_with_new_session)
+                except Exception as e:
+                    print(f"Failed to persist seen notifications: {e}")
+        finally:
+            await asyncio.to_thread(cls._flush_with_new_session)
+
+
+CacheInvalidator.register(NotificationHelper.CACHE_NAME, NotificationHelper.merge_remote)
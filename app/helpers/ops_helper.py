@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from app.models.entities import World, Player
+from app.helpers.docker_helper import DockerHelper
+from app.helpers.version_helper import VersionHelper
+
+
+class OpsHelper:
+    """Helper class for realm operators
+    
+    The Players table is the source of truth. Changes are queued and applied
+    to running servers in batches, and ops.json is rewritten when a server
+    starts so a stopped server never needs to be touched.
+    """
+    _pending: Dict[int, Dict[str, bool]] = {}
+    
+    @classmethod
+    def get_ops(cls, db: Session, world_id: int) -> List[str]:
+        """Get the names of a world's operators"""
+        rows = db.query(Player.Name).filter(
+            Player.WorldId == world_id,
+            Player.Operator == True
+        ).order_by(Player.Name).all()
+        return [row.Name for row in rows]
+    
+    @classmethod
+    def set_operator(cls, db: Session, world_id: int, player_uuid: str, operator: bool) -> bool:
+        """Grant or revoke operator status, queueing the change for the server"""
+        player = db.query(Player).filter(
+            Player.WorldId == world_id,
+            Player.Uuid == player_uuid
+        ).first()
+        if not player:
+            return False
+        
+        if player.Operator != operator:
+            player.Operator = operator
+            VersionHelper.world_changed(db, player.World)
+            db.commit()
+            cls._pending.setdefault(world_id, {})[player.Name] = operator
+        return True
+    
+    @classmethod
+    def ops_json(cls, db: Session, world: World) -> bytes:
+        """Build the ops.json contents for a world"""
+        entries = []
+        if world.OwnerUUID:
+            entries.append((world.OwnerUUID, world.Owner))
+        operators = db.query(Player.Uuid, Player.Name).filter(
+            Player.WorldId == world.Id,
+            Player.Operator == True
+        ).all()
+        entries.extend((row.Uuid, row.Name) for row in operators)
+        
+        return json.dumps([
+            {
+                "uuid": cls._format_uuid(player_uuid),
+                "name": name,
+                "level": 4,
+                "bypassesPlayerLimit": False
+            }
+            for player_uuid, name in entries
+        ], indent=2).encode("utf-8")
+    
+    @staticmethod
+    def _format_uuid(player_uuid: str) -> str:
+        """Format an undashed UUID the way the server stores it"""
+        if len(player_uuid) == 32 and "-" not in player_uuid:
+            return "-".join([
+                player_uuid[:8], player_uuid[8:12], player_uuid[12:16],
+                player_uuid[16:20], player_uuid[20:]
+            ])
+        return player_uuid
+    
+    @classmethod
+    def world_started(cls, world_id: int) -> None:
+        """Drop queued changes already covered by a freshly written ops.json"""
+        cls._pending.pop(world_id, None)
+    
+    @classmethod
+    async def flush(cls) -> int:
+        """Apply queued changes to running servers, one batch of console commands per world"""
+        pending, cls._pending = cls._pending, {}
+        applied = 0
+        for world_id, changes in pending.items():
+            docker_helper = DockerHelper(world_id)
+            commands = [
+                f"{'op' if operator else 'deop'} {name}"
+                for name, operator in changes.items()
+            ]
+            try:
+                if not await docker_helper.is_running():
+                    continue
+                await docker_helper.execute_commands(commands)
+                applied += len(commands)
+            except Exception as e:
+                print(f"Failed to apply operator changes to world {world_id}: {e}")
+                # Requeue, letting changes made since this flush started win
+                cls._pending[world_id] = {**changes, **cls._pending.get(world_id, {})}
+        return applied
+    
+    @classmethod
+    async def run_flusher(cls, interval: float = 1.0) -> None:
+        """Periodically apply queued operator changes"""
+        while True:
+            await asyncio.sleep(interval)
+            await cls.flush()
@@ -0,0 +1,193 @@
+import time
+import struct
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.helpers.metrics import Metrics
+
+Metrics.describe("rcon_commands_total", "Console commands sent over RCON")
+Metrics.describe("rcon_connects_total", "RCON connections opened")
+
+# Packet types of the Source RCON protocol used by Minecraft
+_TYPE_COMMAND = 2
+_TYPE_LOGIN = 3
+
+# Minecraft splits longer responses into several packets of this size
+_MAX_PAYLOAD = 4096
+
+
+class RconError(Exception):
+    """Raised when an RCON connection fails or is refused"""
+    pass
+
+
+class RconClient:
+    """One authenticated RCON connection to a server
+    
+    Commands are pipelined: each is written as soon as it is sent and
+    responses are matched to their request id, so a batch of commands
+    costs a single round-trip.
+    """
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 1
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._partial: Dict[int, List[bytes]] = {}
+        self._read_task: Optional[asyncio.Task] = None
+        self.last_used = time.monotonic()
+    
+    @classmethod
+    async def connect(cls, host: str, port: int, password: str, timeout: float = 5.0) -> 'RconClient':
+        """Open and authenticate a connection"""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        client = cls(reader, writer)
+        client._read_task = asyncio.create_task(client._read_loop())
+        try:
+            await asyncio.wait_for(client._request(_TYPE_LOGIN, password), timeout)
+        except Exception:
+            client.close()
+            raise
+        Metrics.increment("rcon_connects_total")
+        return client
+    
+    @property
+    def closed(self) -> bool:
+        return self._read_task is None or self._read_task.done()
+    
+    def _send(self, packet_type: int, payload: str) -> asyncio.Future:
+        request_id = self._next_id
+        self._next_id = self._next_id % 0x7FFFFFFF + 1
+        body = struct.pack("<ii", request_id, packet_type) + payload.encode("utf-8") + b"\x00\x00"
+        self._writer.write(struct.pack("<i", len(body)) + body)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        return future
+    
+    async def _request(self, packet_type: int, payload: str) -> str:
+        if self.closed:
+            raise RconError("Connection is closed")
+        future = self._send(packet_type, payload)
+        await self._writer.drain()
+        return await future
+    
+    async def _read_loop(self) -> None:
+        error: Exception = RconError("Connection closed by server")
+        try:
+            while True:
+                header = await self._reader.readexactly(4)
+                body = await self._reader.readexactly(struct.unpack("<i", header)[0])
+                request_id, _ = struct.unpack("<ii", body[:8])
+                payload = body[8:-2]
+                if request_id == -1:
+                    # A failed login answers with id -1
+                    error = RconError("Authentication failed")
+                    return
+                self._partial.setdefault(request_id, []).append(payload)
+                if len(payload) < _MAX_PAYLOAD:
+                    future = self._waiting.pop(request_id, None)
+                    response = b"".join(self._partial.pop(request_id))
+                    if future and not future.done():
+                        future.set_result(response.decode("utf-8", errors="replace"))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            error = RconError(str(e) or "Connection closed by server")
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._waiting.clear()
+            self._writer.close()
+    
+    async def commands(self, commands: List[str]) -> List[str]:
+        """Run several commands, writing all of them before awaiting any response"""
+        if self.closed:
+            raise RconError("Connection is closed")
+        self.last_used = time.monotonic()
+        futures = [self._send(_TYPE_COMMAND, command) for command in commands]
+        await self._writer.drain()
+        Metrics.increment("rcon_commands_total", len(commands))
+        return list(await asyncio.gather(*futures))
+    
+    async def command(self, command: str) -> str:
+        """Run a single command"""
+        return (await self.commands([command]))[0]
+    
+    def close(self) -> None:
+        if self._read_task:
+            self._read_task.cancel()
+        self._writer.close()
+
+
+class RconPool:
+    """Persistent RCON connections, one per running realm
+    
+    A connection is opened on first use, replaced once if it turns out to
+    be broken, and closed after IDLE_TIMEOUT without commands.
+    """
+    IDLE_TIMEOUT = 300.0
+    _clients: Dict[int, RconClient] = {}
+    _connecting: Dict[int, asyncio.Task] = {}
+    
+    @classmethod
+    async def _get(cls, world_id: int, resolve: Callable[[], Awaitable[Tuple[str, int, str]]]) -> RconClient:
+        client = cls._clients.get(world_id)
+        if client and not client.closed:
+            return client
+        
+        # Concurrent callers share one connection attempt
+        task = cls._connecting.get(world_id)
+        if task is None:
+            async def connect() -> RconClient:
+                host, port, password = await resolve()
+                return await RconClient.connect(host, port, password)
+            task = asyncio.create_task(connect())
+            cls._connecting[world_id] = task
+            task.add_done_callback(lambda _: cls._connecting.pop(world_id, None))
+        client = await asyncio.shield(task)
+        cls._clients[world_id] = client
+        return client
+    
+    @classmethod
+    async def execute(
+        cls,
+        world_id: int,
+        commands: List[str],
+        resolve: Callable[[], Awaitable[Tuple[str, int, str]]]
+    ) -> List[str]:
+        """Run commands on a realm, reconnecting once if the pooled connection is broken
+        
+        resolve returns the host, port and password to connect with.
+        """
+        client = await cls._get(world_id, resolve)
+        try:
+            return await client.commands(commands)
+        except RconError:
+            cls.discard(world_id)
+            client = await cls._get(world_id, resolve)
+            return await client.commands(commands)
+    
+    @classmethod
+    def discard(cls, world_id: int) -> None:
+        """Close the connection to a realm, e.g. once its server stops"""
+        client = cls._clients.pop(world_id, None)
+        if client:
+            client.close()
+    
+    @classmethod
+    def close_idle(cls) -> int:
+        """Close broken connections and those unused for IDLE_TIMEOUT"""
+        now = time.monotonic()
+        idle = [
+            world_id for world_id, client in cls._clients.items()
+            if client.closed or now - client.last_used > cls.IDLE_TIMEOUT
+        ]
+        for world_id in idle:
+            cls.discard(world_id)
+        return len(idle)
+    
+    @classmethod
+    async def run_maintenance(cls, interval: float = 60.0) -> None:
+        """Periodically close broken and idle connections"""
+        while True:
+            await asyncio.sleep(interval)
+            cls.close_idle()
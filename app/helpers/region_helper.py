@@ -0,0 +1,183 @@
+import json
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.models.enums import RegionEnum, RegionSelectionPreferenceEnum, RegionServiceQualityEnum
+from app.helpers.metrics import Metrics
+
+Metrics.describe("region_ping_milliseconds", "Last measured connect time to a region's node")
+Metrics.describe("region_load_ratio", "Running realms on a region's node over its capacity")
+
+# Upper bounds of connect time in milliseconds for each quality
+_QUALITY_THRESHOLDS = (
+    (50, RegionServiceQualityEnum.Great),
+    (100, RegionServiceQualityEnum.Good),
+    (200, RegionServiceQualityEnum.Okay)
+)
+
+
+@dataclass
+class RegionNode:
+    region: RegionEnum
+    host: str
+    port: int
+    capacity: int
+
+
+@dataclass
+class RegionSample:
+    ping_ms: Optional[float]
+    load: Optional[float]
+    measured_at: float
+
+
+def parse_nodes(value: str) -> List[RegionNode]:
+    """Parse REGION_NODES, a comma separated list of Region=host:port[:capacity]
+    
+    Raises ValueError naming the first malformed entry.
+    """
+    nodes = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        region, _, address = item.partition("=")
+        try:
+            host, port, *rest = address.split(":")
+            nodes.append(RegionNode(
+                region=RegionEnum[region.strip()],
+                host=host,
+                port=int(port),
+                capacity=int(rest[0]) if rest else 50
+            ))
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid REGION_NODES entry {item!r}, expected Region=host:port[:capacity]")
+    return nodes
+
+
+def _preference_kind(preference: dict) -> Optional[RegionSelectionPreferenceEnum]:
+    # Stored either as the enum value or its name, depending on the client
+    kind = preference.get("regionSelectionPreference")
+    if isinstance(kind, int) and kind in RegionSelectionPreferenceEnum._value2member_map_:
+        return RegionSelectionPreferenceEnum(kind)
+    for member in RegionSelectionPreferenceEnum:
+        if isinstance(kind, str) and kind.replace("_", "").lower() == member.name.lower():
+            return member
+    return None
+
+
+class RegionHelper:
+    """Background measurement of region nodes and region recommendations
+    
+    A prober periodically connects to the Docker API of every configured
+    node, timing the connection and reading how many containers run there.
+    Requests only read the latest samples, which count as unknown once
+    older than TTL.
+    """
+    TTL = 90.0
+    TIMEOUT = 2.0
+    # Set at startup from REGION_NODES
+    _nodes: List[RegionNode] = []
+    _samples: Dict[RegionEnum, RegionSample] = {}
+    
+    @classmethod
+    def configure(cls, nodes: List[RegionNode]) -> None:
+        cls._nodes = nodes
+        cls._samples = {}
+    
+    @classmethod
+    async def _probe(cls, node: RegionNode) -> RegionSample:
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(node.host, node.port), cls.TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return RegionSample(ping_ms=None, load=None, measured_at=time.monotonic())
+        ping_ms = (time.perf_counter() - started) * 1000
+        
+        load = None
+        try:
+            writer.write(f"GET /info HTTP/1.0\r\nHost: {node.host}\r\n\r\n".encode("ascii"))
+            raw = await asyncio.wait_for(reader.read(), cls.TIMEOUT)
+            body = raw.partition(b"\r\n\r\n")[2]
+            load = json.loads(body)["ContainersRunning"] / node.capacity
+        except (OSError, asyncio.TimeoutError, ValueError, KeyError):
+            pass  # Reachable but not answering as a Docker API, so only the ping is known
+        finally:
+            writer.close()
+        return RegionSample(ping_ms=ping_ms, load=load, measured_at=time.monotonic())
+    
+    @classmethod
+    async def probe_all(cls) -> None:
+        """Measure every node concurrently"""
+        nodes = cls._nodes
+        samples = await asyncio.gather(*(cls._probe(node) for node in nodes))
+        for node, sample in zip(nodes, samples):
+            cls._samples[node.region] = sample
+            if sample.ping_ms is not None:
+                Metrics.set_gauge("region_ping_milliseconds", round(sample.ping_ms, 2), region=node.region.name)
+            if sample.load is not None:
+                Metrics.set_gauge("region_load_ratio", round(sample.load, 3), region=node.region.name)
+    
+    @classmethod
+    async def run_prober(cls, interval: float = 30.0) -> None:
+        """Periodically measure every node"""
+        while True:
+            try:
+                await cls.probe_all()
+            except Exception as e:
+                print(f"Region probe failed: {e}")
+            await asyncio.sleep(interval)
+    
+    @classmethod
+    def get_quality(cls, region: RegionEnum) -> RegionServiceQualityEnum:
+        """Get the service quality of a region from its latest fresh sample"""
+        sample = cls._samples.get(region)
+        if not sample or sample.ping_ms is None or time.monotonic() - sample.measured_at > cls.TTL:
+            return RegionServiceQualityEnum.Unknown
+        
+        quality = RegionServiceQualityEnum.Poor
+        for threshold, level in _QUALITY_THRESHOLDS:
+            if sample.ping_ms < threshold:
+                quality = level
+                break
+        if sample.load is not None:
+            if sample.load >= 1:
+                return RegionServiceQualityEnum.Poor
+            if sample.load >= 0.8:
+                # A busy node is one level worse than its latency alone suggests
+                return RegionServiceQualityEnum(min(quality + 1, RegionServiceQualityEnum.Poor))
+        return quality
+    
+    @classmethod
+    def get_regions(cls) -> List[dict]:
+        """Get every configured region with its quality, best first"""
+        regions = []
+        for node in cls._nodes:
+            sample = cls._samples.get(node.region)
+            regions.append({
+                "regionName": node.region.name,
+                "serviceQuality": cls.get_quality(node.region).value,
+                "ping": round(sample.ping_ms) if sample and sample.ping_ms is not None else None,
+                "load": round(sample.load, 3) if sample and sample.load is not None else None
+            })
+        regions.sort(key=lambda r: (r["serviceQuality"], r["ping"] if r["ping"] is not None else float("inf")))
+        return regions
+    
+    @classmethod
+    def recommend(cls, preference: Optional[dict]) -> Optional[RegionEnum]:
+        """Pick a region for a world from its RegionSelectionPreference and measured quality
+        
+        A manually chosen region is kept unless it is poor or unknown, in
+        which case the best measured region is used like for automatic
+        selection.
+        """
+        if preference and _preference_kind(preference) == RegionSelectionPreferenceEnum.Manual:
+            preferred = preference.get("preferredRegion")
+            if preferred in RegionEnum.__members__:
+                region = RegionEnum[preferred]
+                if any(node.region == region for node in cls._nodes) and \
+                        cls.get_quality(region) < RegionServiceQualityEnum.Poor:
+                    return region
+        
+        regions = cls.get_regions()
+        if not regions or regions[0]["serviceQuality"] == RegionServiceQualityEnum.Unknown:
+            return None
+        return RegionEnum[regions[0]["regionName"]]
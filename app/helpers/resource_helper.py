@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Optional
+from app.models.entities import World
+from app.models.enums import SettingsEnum
+from app.helpers.config_helper import ConfigHelper
+
+
+@dataclass
+class ResourceLimits:
+    """Resource limits of a realm container"""
+    memory_mb: int
+    cpu_percent: int
+    pids: int
+    
+    def to_container_options(self) -> dict:
+        """Get the docker-py create options enforcing these limits"""
+        return {
+            "mem_limit": f"{self.memory_mb}m",
+            # Same as the memory limit, so the container never swaps
+            "memswap_limit": f"{self.memory_mb}m",
+            "nano_cpus": self.cpu_percent * 10_000_000,
+            "pids_limit": self.pids
+        }
+
+
+class ResourceHelper:
+    """Helper class for realm resource limits"""
+    
+    @staticmethod
+    def get_limits(world: World) -> ResourceLimits:
+        """Get a world's limits from its subscription, falling back to the Realm* settings"""
+        subscription = world.Subscription
+        
+        def pick(override: Optional[int], setting: SettingsEnum) -> int:
+            return override if override is not None else ConfigHelper.get_setting(setting.value)
+        
+        return ResourceLimits(
+            memory_mb=pick(subscription.MemoryLimit if subscription else None, SettingsEnum.RealmMemoryLimit),
+            cpu_percent=pick(subscription.CpuLimit if subscription else None, SettingsEnum.RealmCpuLimit),
+            pids=pick(subscription.PidsLimit if subscription else None, SettingsEnum.RealmPidsLimit)
+        )
+    
+    @staticmethod
+    def get_disk_quota(world: World) -> int:
+        """Get a world's disk quota in MiB from its subscription, falling back to RealmDiskQuota; 0 is none"""
+        subscription = world.Subscription
+        if subscription and subscription.DiskQuota is not None:
+            return subscription.DiskQuota
+        return ConfigHelper.get_setting(SettingsEnum.RealmDiskQuota.value)
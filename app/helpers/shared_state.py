@@ -0,0 +1,127 @@
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models import engine
+from app.helpers.change_listener import ChangeListener
+
+# First key of the two-key advisory locks taken on worlds
+WORLD_LOCK_NAMESPACE = 0x5245
+# First key of the advisory locks electing the worker that runs a background job
+LEADER_LOCK_NAMESPACE = 0x4C44
+
+
+@asynccontextmanager
+async def world_lock(world_id: int):
+    """Serialize lifecycle operations on a world across all workers and hosts
+    
+    Holds a Postgres session advisory lock on a dedicated connection for the
+    duration of the block.
+    """
+    connection = await asyncio.to_thread(engine.connect)
+    try:
+        await asyncio.to_thread(
+            connection.execute,
+            text("SELECT pg_advisory_lock(:namespace, :world_id)"),
+            {"namespace": WORLD_LOCK_NAMESPACE, "world_id": world_id}
+        )
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(
+                connection.execute,
+                text("SELECT pg_advisory_unlock(:namespace, :world_id)"),
+                {"namespace": WORLD_LOCK_NAMESPACE, "world_id": world_id}
+            )
+    finally:
+        await asyncio.to_thread(connection.close)
+
+
+class LeaderLock:
+    """Elects a single worker across all hosts to run a background job
+    
+    The winner holds a Postgres session advisory lock on a dedicated
+    connection for as long as it lives, so another worker takes over once
+    that connection is gone.
+    """
+    
+    def __init__(self, key: int):
+        self.key = key
+        self._connection = None
+    
+    def _check(self) -> bool:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+                self._connection.commit()
+                return True
+            except Exception:
+                # The lock went away with the connection
+                self._connection.invalidate()
+                self._connection = None
+        
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:namespace, :key)"),
+                {"namespace": LEADER_LOCK_NAMESPACE, "key": self.key}
+            ).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+    
+    async def is_leader(self) -> bool:
+        """Check that this worker still holds the lock, trying to take it if not"""
+        return await asyncio.to_thread(self._check)
+
+
+class CacheInvalidator:
+    """Broadcasts per-key cache updates to the other workers
+    
+    Each cache registers a handler under a name. Messages published by a
+    worker are ignored by that same worker, which has already updated its
+    own cache.
+    """
+    CHANNEL = "cache_invalidated"
+    _handlers: Dict[str, Callable[[str, Optional[dict]], None]] = {}
+    
+    @staticmethod
+    def _worker_id() -> str:
+        # Looked up on use so forked workers never share an id
+        return f"{os.uname().nodename}:{os.getpid()}"
+    
+    @classmethod
+    def register(cls, name: str, handler: Callable[[str, Optional[dict]], None]) -> None:
+        """Register the handler for a cache; handler(key, data) gets key None on resync"""
+        cls._handlers[name] = handler
+        ChangeListener.subscribe(cls.CHANNEL, cls._on_message)
+    
+    @classmethod
+    def publish(cls, db: Session, name: str, key: str, data: Optional[dict] = None) -> None:
+        """Queue a message, delivered when the session's transaction commits"""
+        payload = json.dumps({"worker": cls._worker_id(), "cache": name, "key": key, "data": data})
+        ChangeListener.notify(db, cls.CHANNEL, payload)
+    
+    @classmethod
+    def _on_message(cls, payload: Optional[str]) -> None:
+        if payload is None:
+            # Messages may have been missed, so every cache starts over
+            for handler in cls._handlers.values():
+                handler(None, None)
+            return
+        
+        message = json.loads(payload)
+        if message["worker"] == cls._worker_id():
+            return
+        handler = cls._handlers.get(message["cache"])
+        if handler:
+            handler(message["key"], message.get("data"))
@@ -0,0 +1,167 @@
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy.orm import joinedload
+from app.models import SessionLocal
+from app.models.entities import World, Slot
+from app.models.enums import DifficultyEnum, GamemodeEnum
+from app.helpers.docker_helper import DockerHelper
+from app.helpers.container_state import ContainerState
+from app.helpers.image_helper import ImageHelper
+from app.helpers.join_helper import JoinHelper
+from app.helpers.metrics import Metrics
+from app.helpers.ops_helper import OpsHelper
+from app.helpers.resource_helper import ResourceHelper
+from app.helpers.shared_state import world_lock
+from app.helpers.version_helper import VersionHelper
+
+Metrics.describe("slot_switch_downtime_seconds", "Unavailability of the last slot or version switch")
+Metrics.describe("slot_switch_downtime_seconds_sum", "Total unavailability caused by slot and version switches")
+Metrics.describe("slot_switch_downtime_seconds_count", "Slot and version switches")
+
+
+class SlotHelper:
+    """Helper class for applying slot settings to servers
+    
+    Settings that have a console command are queued and sent to running
+    servers in batches, the latest value of each winning. Every setting is
+    also passed to the container when it is created. Only a new version or
+    a switch to another slot replaces the running server.
+    """
+    _pending: Dict[int, Dict[str, str]] = {}
+    _switches: Dict[int, asyncio.Task] = {}
+    
+    @staticmethod
+    def environment(slot: Slot) -> Dict[str, str]:
+        """Build the container environment for a slot"""
+        return {
+            "VERSION": slot.Version,
+            "DIFFICULTY": DifficultyEnum(slot.Difficulty).name.lower(),
+            "MODE": GamemodeEnum(slot.GameMode).name.lower(),
+            "FORCE_GAMEMODE": str(slot.ForceGameMode).lower(),
+            "HARDCORE": str(slot.Hardcore).lower(),
+            "SPAWN_PROTECTION": str(slot.SpawnProtection)
+        }
+    
+    @staticmethod
+    def live_commands(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, str]:
+        """Get the console commands applying a changed environment to a running server"""
+        commands = {}
+        if old.get("DIFFICULTY") != new["DIFFICULTY"]:
+            commands["difficulty"] = f"difficulty {new['DIFFICULTY']}"
+        if old.get("MODE") != new["MODE"]:
+            commands["defaultgamemode"] = f"defaultgamemode {new['MODE']}"
+        return commands
+    
+    @staticmethod
+    def needs_restart(old: Dict[str, str], new: Dict[str, str], slot_id: int) -> bool:
+        """Check whether a running server must be replaced to use a slot"""
+        return old.get("SLOT_ID") != str(slot_id) or old.get("VERSION") != new["VERSION"]
+    
+    @classmethod
+    def queue_commands(cls, world_id: int, commands: Dict[str, str]) -> None:
+        """Queue console commands for a running server"""
+        cls._pending.setdefault(world_id, {}).update(commands)
+    
+    @classmethod
+    async def apply(cls, world: World, previous: Optional[Dict[str, str]] = None) -> None:
+        """Bring a world's running server in line with its active slot
+        
+        previous is the environment of the slot before the change. Settings
+        applied live never reach the container's own environment, so that
+        is only used to tell which slot and version the server runs.
+        """
+        docker_helper = DockerHelper(world.Id)
+        running = await docker_helper.get_running_slot()
+        if running is None:
+            return  # Used as is at the next start
+        
+        slot = world.ActiveSlot
+        environment = cls.environment(slot)
+        if cls.needs_restart(running, environment, slot.SlotId):
+            cls.schedule_switch(world.Id)
+        else:
+            cls.queue_commands(world.Id, cls.live_commands(previous or running, environment))
+    
+    @classmethod
+    def schedule_switch(cls, world_id: int) -> None:
+        """Replace a world's server in the background, once per world at a time"""
+        task = cls._switches.get(world_id)
+        if task and not task.done():
+            # The running switch rereads the active slot once it holds the lock
+            cls._switches[world_id] = asyncio.create_task(cls._switch_after(task, world_id))
+            return
+        cls._switches[world_id] = asyncio.create_task(cls._switch(world_id))
+    
+    @classmethod
+    async def _switch_after(cls, previous: asyncio.Task, world_id: int) -> None:
+        await asyncio.wait([previous])
+        await cls._switch(world_id)
+    
+    @classmethod
+    async def _switch(cls, world_id: int) -> None:
+        docker_helper = DockerHelper(world_id)
+        try:
+            async with world_lock(world_id):
+                db = SessionLocal()
+                try:
+                    world = db.query(World).options(
+                        joinedload(World.ActiveSlot), joinedload(World.Players), joinedload(World.Subscription)
+                    ).filter(World.Id == world_id).first()
+                    running = await docker_helper.get_running_slot()
+                    if not world or not world.ActiveSlot or running is None:
+                        return
+                    slot = world.ActiveSlot
+                    environment = cls.environment(slot)
+                    if not cls.needs_restart(running, environment, slot.SlotId):
+                        return  # An earlier switch already caught up
+                    
+                    image = await ImageHelper.ensure_for_version(slot.Version)
+                    OpsHelper.world_started(world_id)
+                    cls._pending.pop(world_id, None)
+                    port, downtime = await docker_helper.replace_server(
+                        slot.SlotId,
+                        files={"ops.json": OpsHelper.ops_json(db, world)},
+                        environment=environment,
+                        limits=ResourceHelper.get_limits(world),
+                        image=image
+                    )
+                    ContainerState.invalidate()
+                    
+                    kind = "slot" if running.get("SLOT_ID") != str(slot.SlotId) else "version"
+                    Metrics.set_gauge("slot_switch_downtime_seconds", round(downtime, 3), kind=kind)
+                    Metrics.increment("slot_switch_downtime_seconds_sum", downtime, kind=kind)
+                    Metrics.increment("slot_switch_downtime_seconds_count", kind=kind)
+                    
+                    JoinHelper.server_ready(db, world_id, port)
+                    VersionHelper.world_changed(db, world)
+                    db.commit()
+                finally:
+                    db.close()
+        except Exception as e:
+            print(f"Failed to switch world {world_id}: {e}")
+            ContainerState.invalidate()
+    
+    @classmethod
+    async def flush(cls) -> int:
+        """Send queued commands to running servers, one batch of console commands per world"""
+        pending, cls._pending = cls._pending, {}
+        applied = 0
+        for world_id, changes in pending.items():
+            docker_helper = DockerHelper(world_id)
+            commands: List[str] = list(changes.values())
+            try:
+                if not await docker_helper.is_running():
+                    continue
+                await docker_helper.execute_commands(commands)
+                applied += len(commands)
+            except Exception as e:
+                print(f"Failed to apply slot settings to world {world_id}: {e}")
+                cls._pending[world_id] = {**changes, **cls._pending.get(world_id, {})}
+        return applied
+    
+    @classmethod
+    async def run_flusher(cls, interval: float = 1.0) -> None:
+        """Periodically send queued commands"""
+        while True:
+            await asyncio.sleep(interval)
+            await cls.flush()
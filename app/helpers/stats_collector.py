@@ -0,0 +1,242 @@
+import json
+import time
+import asyncio
+import threading
+from array import array
+from typing import Dict, List, Optional
+from app.models import SessionLocal
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import StreamHandle, docker
+from app.helpers.metrics import Metrics
+from app.helpers.shared_state import CacheInvalidator, LeaderLock
+
+Metrics.describe("realm_cpu_percent", "CPU use of a realm's server, in percent of one CPU")
+Metrics.describe("realm_memory_bytes", "Memory used by a realm's server, without page cache")
+Metrics.describe("realm_pids", "Processes running in a realm's server container")
+
+# Fields of one sample, stored next to each other in the ring buffer
+_FIELDS = ("time", "cpu", "memory", "pids")
+
+
+class StatsWindow:
+    """Fixed-size ring buffer of the latest samples of one container
+    
+    Samples are stored flat in a single array of doubles, so a window costs
+    the same small, constant amount of memory however long a realm runs.
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._values = array("d", bytes(8 * len(_FIELDS) * size))
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def append(self, timestamp: float, cpu: float, memory: float, pids: float) -> None:
+        with self._lock:
+            offset = self._next * len(_FIELDS)
+            self._values[offset:offset + len(_FIELDS)] = array("d", (timestamp, cpu, memory, pids))
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+    
+    def samples(self) -> List[Dict[str, float]]:
+        """Get the buffered samples, oldest first"""
+        with self._lock:
+            start = (self._next - self._count) % self.size
+            indexes = [(start + i) % self.size for i in range(self._count)]
+            width = len(_FIELDS)
+            return [dict(zip(_FIELDS, self._values[i * width:(i + 1) * width])) for i in indexes]
+    
+    def summary(self) -> Optional[Dict[str, float]]:
+        """Get the latest, average and peak use over the window, or None without samples"""
+        samples = self.samples()
+        if not samples:
+            return None
+        cpu = [sample["cpu"] for sample in samples]
+        memory = [sample["memory"] for sample in samples]
+        return {
+            "samples": len(samples),
+            "updatedAt": samples[-1]["time"],
+            "cpuPercent": round(cpu[-1], 2),
+            "cpuPercentAvg": round(sum(cpu) / len(cpu), 2),
+            "cpuPercentMax": round(max(cpu), 2),
+            "memoryBytes": int(memory[-1]),
+            "memoryBytesAvg": int(sum(memory) / len(memory)),
+            "memoryBytesMax": int(max(memory)),
+            "pids": int(samples[-1]["pids"])
+        }
+
+
+def parse_stats(stats: dict) -> Optional[tuple]:
+    """Get CPU percent, memory bytes and process count from one Docker stats frame
+    
+    CPU is computed like `docker stats` does, from the deltas to the previous
+    frame the daemon includes. Page cache is left out of memory, since the
+    kernel reclaims it before hitting the limit.
+    """
+    cpu_stats = stats.get("cpu_stats") or {}
+    precpu_stats = stats.get("precpu_stats") or {}
+    memory_stats = stats.get("memory_stats") or {}
+    if "usage" not in memory_stats or "system_cpu_usage" not in precpu_stats:
+        return None  # The first frame has no previous sample to compare against
+    
+    cpu_delta = cpu_stats["cpu_usage"]["total_usage"] - precpu_stats["cpu_usage"]["total_usage"]
+    system_delta = cpu_stats["system_cpu_usage"] - precpu_stats["system_cpu_usage"]
+    online_cpus = cpu_stats.get("online_cpus") or len(cpu_stats["cpu_usage"].get("percpu_usage") or [1])
+    cpu = cpu_delta / system_delta * online_cpus * 100 if system_delta > 0 else 0.0
+    
+    details = memory_stats.get("stats") or {}
+    # cgroup v2 reports inactive_file, cgroup v1 reports cache
+    cache = details.get("inactive_file", details.get("total_inactive_file", details.get("cache", 0)))
+    memory = max(memory_stats["usage"] - cache, 0)
+    pids = (stats.get("pids_stats") or {}).get("current", 0)
+    return cpu, memory, pids
+
+
+class StatsCollector:
+    """Rolling resource usage of every running realm
+    
+    Only the worker holding the leader lock streams stats, one connection
+    per running container read by its own daemon thread. Each pass it
+    broadcasts the samples taken since the last one, so every worker keeps
+    the same windows and placement, hibernation and the admin endpoints
+    read get_summary on any of them instead of querying Docker themselves.
+    """
+    LEADER_KEY = 5
+    CACHE_NAME = "realm_stats"
+    WINDOW_SIZE = 60
+    _windows: Dict[int, StatsWindow] = {}
+    _streams: Dict[int, StreamHandle] = {}
+    _shared_until: Dict[int, float] = {}
+    _leader = LeaderLock(LEADER_KEY)
+    
+    @staticmethod
+    def _open_stream(world_id: int):
+        api = docker.from_env().api
+        response = api.get(
+            f"{api.base_url}/v{api.api_version}/containers/realm-server-{world_id}/stats",
+            params={"stream": True},
+            stream=True
+        )
+        response.raise_for_status()
+        frames = (json.loads(line) for line in response.iter_lines() if line)
+        return docker.types.CancellableStream(frames, response)
+    
+    @classmethod
+    def _read_stream(cls, world_id: int, window: StatsWindow, handle: StreamHandle) -> None:
+        try:
+            stream = cls._open_stream(world_id)
+            if handle.attach(stream):
+                for stats in stream:
+                    sample = parse_stats(stats)
+                    if sample:
+                        window.append(time.time(), *sample)
+        except Exception as e:
+            if not handle.stopped:
+                print(f"Stats stream of world {world_id} ended: {e}")
+        finally:
+            # Let the next sync open a new stream if the container still runs
+            if cls._streams.get(world_id) is handle:
+                cls._streams.pop(world_id, None)
+    
+    @classmethod
+    def sync(cls, running: set, stream: bool = True) -> None:
+        """Open streams for newly running realms and drop those that stopped
+        
+        Without stream, every open stream is closed and windows of running
+        realms are left to be filled by the leader's broadcasts.
+        """
+        for world_id in running:
+            window = cls._windows.setdefault(world_id, StatsWindow(cls.WINDOW_SIZE))
+            if stream and world_id not in cls._streams:
+                handle = StreamHandle()
+                cls._streams[world_id] = handle
+                threading.Thread(
+                    target=cls._read_stream,
+                    args=(world_id, window, handle),
+                    name=f"stats-{world_id}",
+                    daemon=True
+                ).start()
+        
+        for world_id in list(cls._streams):
+            if not stream or world_id not in running:
+                cls._streams.pop(world_id).stop()
+        
+        for world_id in list(cls._windows):
+            if world_id not in running:
+                del cls._windows[world_id]
+                cls._shared_until.pop(world_id, None)
+                for name in ("realm_cpu_percent", "realm_memory_bytes", "realm_pids"):
+                    Metrics.remove_gauge(name, world=str(world_id))
+    
+    @classmethod
+    def share(cls) -> int:
+        """Broadcast the samples taken since the last call to the other workers, returning how many"""
+        db = SessionLocal()
+        try:
+            count = 0
+            for world_id, window in list(cls._windows.items()):
+                since = cls._shared_until.get(world_id, 0.0)
+                samples = [sample for sample in window.samples() if sample["time"] > since]
+                if samples:
+                    rows = [[sample[field] for field in _FIELDS] for sample in samples]
+                    CacheInvalidator.publish(db, cls.CACHE_NAME, str(world_id), {"samples": rows})
+                    cls._shared_until[world_id] = samples[-1]["time"]
+                    count += len(samples)
+            db.commit()
+            return count
+        finally:
+            db.close()
+    
+    @classmethod
+    def _on_message(cls, key: Optional[str], data: Optional[dict]) -> None:
+        if key is None:
+            return  # Missed samples are only missing from the window until it wraps
+        window = cls._windows.setdefault(int(key), StatsWindow(cls.WINDOW_SIZE))
+        for row in data["samples"]:
+            window.append(*row)
+    
+    @classmethod
+    def publish_metrics(cls) -> None:
+        """Export the latest sample of every realm as gauges"""
+        for world_id, window in list(cls._windows.items()):
+            summary = window.summary()
+            if summary:
+                Metrics.set_gauge("realm_cpu_percent", summary["cpuPercent"], world=str(world_id))
+                Metrics.set_gauge("realm_memory_bytes", summary["memoryBytes"], world=str(world_id))
+                Metrics.set_gauge("realm_pids", summary["pids"], world=str(world_id))
+    
+    @classmethod
+    async def run_collector(cls, interval: float = 5.0) -> None:
+        """Keep one stats stream per running realm on the leader, and refresh the gauges on every worker"""
+        while True:
+            try:
+                leader = await cls._leader.is_leader()
+                cls.sync(await ContainerState.get_running(), stream=leader)
+                if leader:
+                    await asyncio.to_thread(cls.share)
+                cls.publish_metrics()
+            except Exception as e:
+                print(f"Stats collection failed: {e}")
+            await asyncio.sleep(interval)
+    
+    @classmethod
+    def get_window(cls, world_id: int) -> List[Dict[str, float]]:
+        """Get the buffered samples of a realm, oldest first"""
+        window = cls._windows.get(world_id)
+        return window.samples() if window else []
+    
+    @classmethod
+    def get_summary(cls, world_id: int) -> Optional[Dict[str, float]]:
+        """Get a realm's latest, average and peak use, or None if nothing was sampled"""
+        window = cls._windows.get(world_id)
+        return window.summary() if window else None
+    
+    @classmethod
+    def get_all(cls) -> Dict[int, Dict[str, float]]:
+        """Get the summary of every sampled realm"""
+        summaries = {world_id: window.summary() for world_id, window in list(cls._windows.items())}
+        return {world_id: summary for world_id, summary in summaries.items() if summary}
+
+
+CacheInvalidator.register(StatsCollector.CACHE_NAME, StatsCollector._on_message)
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from app.models import SessionLocal
+from app.models.entities import World, Subscription
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper
+from app.helpers.join_helper import JoinHelper
+from app.helpers.shared_state import world_lock
+from app.helpers.version_helper import VersionHelper
+
+
+class SubscriptionHelper:
+    """Helper class for subscription expiry
+    
+    Expiry is the generated Subscriptions.ExpiresAt column, so expired realms
+    are found with one range scan of its index.
+    """
+    SWEEP_BATCH_SIZE = 20
+    
+    @staticmethod
+    def days_left(subscription: Subscription, now: Optional[datetime] = None) -> int:
+        """Get the whole days left before a subscription expires, negative once expired"""
+        return (subscription.ExpiresAt - (now or datetime.now())).days
+    
+    @staticmethod
+    def expired_world_ids(db: Session, world_ids: List[int], now: Optional[datetime] = None) -> List[int]:
+        """Get which of the given worlds have an expired subscription"""
+        if not world_ids:
+            return []
+        rows = db.execute(
+            select(World.Id)
+            .join(Subscription, Subscription.Id == World.SubscriptionId)
+            .where(Subscription.ExpiresAt < (now or datetime.now()), World.Id.in_(world_ids))
+            .order_by(World.Id)
+        ).all()
+        return [row.Id for row in rows]
+    
+    @classmethod
+    def _find_expired_running(cls, running: List[int]) -> List[int]:
+        db = SessionLocal()
+        try:
+            return cls.expired_world_ids(db, running)
+        finally:
+            db.close()
+    
+    @classmethod
+    def _world_stopped(cls, world_id: int) -> None:
+        db = SessionLocal()
+        try:
+            world = db.query(World).options(joinedload(World.Players)).filter(World.Id == world_id).first()
+            if world:
+                VersionHelper.world_changed(db, world)
+            JoinHelper.server_stopped(db, world_id)
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    async def _close_expired(cls, world_id: int) -> bool:
+        docker_helper = DockerHelper(world_id)
+        async with world_lock(world_id):
+            # Another worker may have swept it already
+            if not await docker_helper.is_running():
+                return False
+            await docker_helper.stop_server()
+        await asyncio.to_thread(cls._world_stopped, world_id)
+        return True
+    
+    @classmethod
+    async def sweep(cls) -> int:
+        """Close the running realms whose subscription has expired, a batch at a time"""
+        running = sorted(await ContainerState.get_running())
+        expired = await asyncio.to_thread(cls._find_expired_running, running)
+        closed = 0
+        for start in range(0, len(expired), cls.SWEEP_BATCH_SIZE):
+            batch = expired[start:start + cls.SWEEP_BATCH_SIZE]
+            results = await asyncio.gather(*(cls._close_expired(world_id) for world_id in batch), return_exceptions=True)
+            for world_id, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    print(f"Failed to close expired world {world_id}: {result}")
+                elif result:
+                    closed += 1
+        if closed:
+            ContainerState.invalidate()
+        return closed
+    
+    @classmethod
+    async def run_sweeper(cls, interval: float = 60.0) -> None:
+        """Periodically close expired realms"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await cls.sweep()
+            except Exception as e:
+                print(f"Subscription sweep failed: {e}")
@@ -0,0 +1,219 @@
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import urllib.request
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
+import orjson
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import Template
+from app.helpers.change_listener import ChangeListener
+from app.helpers.metrics import Metrics
+
+Metrics.describe("template_reloads_total", "Template catalog reloads")
+Metrics.describe("template_world_downloads_total", "Template worlds downloaded into the local cache")
+
+
+def zip_to_tar(zip_path: Path, tar_path: Path) -> None:
+    """Repack a zipped world as a tar whose root is the world directory
+    
+    World zips often wrap the world in a folder, so everything is taken
+    relative to the shallowest level.dat.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        roots = [name[:-len("level.dat")] for name in archive.namelist() if PurePosixPath(name).name == "level.dat"]
+        if not roots:
+            raise ValueError("The archive contains no level.dat")
+        root = min(roots, key=len)
+        
+        with tarfile.open(tar_path, "w") as tar:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.startswith(root):
+                    continue
+                relative = PurePosixPath(info.filename[len(root):])
+                if relative.is_absolute() or ".." in relative.parts:
+                    continue  # Never let an archive write outside the world directory
+                entry = tarfile.TarInfo(str(relative))
+                entry.size = info.file_size
+                entry.mtime = time.mktime(info.date_time + (0, 0, -1))
+                with archive.open(info) as source:
+                    tar.addfile(entry, source)
+
+
+class TemplateHelper:
+    """Template catalog served from memory
+    
+    Templates are indexed by type and ordered by Id, so pages stay stable
+    across reloads, and the pages of DEFAULT_PAGE_SIZE are serialized once
+    per load. A trigger on Templates notifies every worker, which reloads
+    in the background. Template worlds are downloaded once into
+    TEMPLATE_CACHE_DIR and resets copy them from there.
+    """
+    CHANNEL = "templates_changed"
+    DEFAULT_PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 100
+    _by_type: Dict[str, List[dict]] = {}
+    _pages: Dict[Tuple[str, int, int], bytes] = {}
+    _world_files: Dict[int, str] = {}
+    _version: int = 0
+    _stale: bool = False
+    _reload_task: Optional[asyncio.Task] = None
+    _downloads: Dict[Path, asyncio.Task] = {}
+    # Set at startup from TEMPLATE_CACHE_DIR
+    _cache_dir = Path("template-cache")
+    
+    @staticmethod
+    def _to_dict(template: Template) -> dict:
+        return {
+            "id": str(template.Id),
+            "name": template.Name,
+            "version": template.Version,
+            "author": template.Author,
+            "link": template.Link,
+            "image": template.Image,
+            "trailer": template.Trailer,
+            "recommendedPlayers": template.RecommendedPlayers,
+            "type": template.Type
+        }
+    
+    @staticmethod
+    def _render_page(templates: List[dict], page: int, size: int) -> bytes:
+        start = (page - 1) * size
+        return orjson.dumps({
+            "templates": templates[start:start + size],
+            "page": page,
+            "size": size,
+            "total": len(templates)
+        })
+    
+    @classmethod
+    def load(cls, db: Session) -> None:
+        """Rebuild the index and its default pages, replacing the previous ones at once"""
+        templates = db.query(Template).order_by(Template.Id).all()
+        by_type: Dict[str, List[dict]] = {}
+        for template in templates:
+            by_type.setdefault(template.Type, []).append(cls._to_dict(template))
+        
+        pages = {}
+        for template_type, entries in by_type.items():
+            page_count = max(1, -(-len(entries) // cls.DEFAULT_PAGE_SIZE))
+            for page in range(1, page_count + 1):
+                pages[(template_type, page, cls.DEFAULT_PAGE_SIZE)] = cls._render_page(
+                    entries, page, cls.DEFAULT_PAGE_SIZE
+                )
+        
+        cls._by_type, cls._pages = by_type, pages
+        cls._world_files = {template.Id: template.WorldFile for template in templates if template.WorldFile}
+        cls._version = time.time_ns()
+        Metrics.increment("template_reloads_total")
+        cls._prune_cache()
+    
+    @classmethod
+    def configure(cls, cache_dir: Path) -> None:
+        cls._cache_dir = cache_dir
+    
+    @classmethod
+    def initialize(cls, db: Session) -> None:
+        """Load the catalog and follow changes made by anyone"""
+        cls.load(db)
+        ChangeListener.subscribe(cls.CHANNEL, cls._on_change)
+    
+    @classmethod
+    def _load_with_new_session(cls) -> None:
+        db = SessionLocal()
+        try:
+            cls.load(db)
+        finally:
+            db.close()
+    
+    @classmethod
+    async def _reload(cls) -> None:
+        # Changes arriving during a reload trigger one more, not one each
+        while cls._stale:
+            cls._stale = False
+            try:
+                await asyncio.to_thread(cls._load_with_new_session)
+            except Exception as e:
+                print(f"Failed to reload templates: {e}")
+                return
+    
+    @classmethod
+    def _on_change(cls, payload: Optional[str]) -> None:
+        cls._stale = True
+        if cls._reload_task is None or cls._reload_task.done():
+            cls._reload_task = asyncio.get_running_loop().create_task(cls._reload())
+    
+    @classmethod
+    def get_version(cls) -> int:
+        """Get a version that changes on every reload"""
+        return cls._version
+    
+    @classmethod
+    def get_page(cls, template_type: str, page: int, size: int) -> bytes:
+        """Get a serialized page of templates of a type"""
+        key = (template_type, page, size)
+        cached = cls._pages.get(key)
+        if cached is not None:
+            return cached
+        
+        templates = cls._by_type.get(template_type, [])
+        body = cls._render_page(templates, page, size)
+        if (page - 1) * size < len(templates):
+            # Other page sizes are kept once asked for, until the next reload
+            cls._pages[key] = body
+        return body
+    
+    @classmethod
+    def _cache_path(cls, template_id: int, url: str) -> Path:
+        # A changed URL gets a new file, so an outdated world is never reused
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return cls._cache_dir / f"{template_id}-{digest}.tar"
+    
+    @classmethod
+    def _prune_cache(cls) -> None:
+        if not cls._cache_dir.is_dir():
+            return
+        current = {cls._cache_path(template_id, url).name for template_id, url in cls._world_files.items()}
+        for path in cls._cache_dir.glob("*.tar"):
+            if path.name not in current:
+                path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _download(url: str, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=path.parent) as directory:
+            zip_path = Path(directory) / "world.zip"
+            with urllib.request.urlopen(url, timeout=60) as response, open(zip_path, "wb") as file:
+                shutil.copyfileobj(response, file, 1024 * 1024)
+            tar_path = Path(directory) / "world.tar"
+            zip_to_tar(zip_path, tar_path)
+            # Readers only ever see a complete file
+            os.replace(tar_path, path)
+    
+    @classmethod
+    async def get_world_file(cls, template_id: int) -> Path:
+        """Get the local tar of a template's world, downloading it on first use
+        
+        Raises LookupError if the template has no world file.
+        """
+        url = cls._world_files.get(template_id)
+        if not url:
+            raise LookupError(f"Template {template_id} has no world file")
+        path = cls._cache_path(template_id, url)
+        if path.is_file():
+            return path
+        
+        task = cls._downloads.get(path)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(cls._download, url, path))
+            cls._downloads[path] = task
+            task.add_done_callback(lambda _: cls._downloads.pop(path, None))
+            Metrics.increment("template_world_downloads_total")
+        await asyncio.shield(task)
+        return path
@@ -0,0 +1,172 @@
+import asyncio
+import time
+import hashlib
+from datetime import date
+from typing import Dict, Iterable, Optional, Set, Tuple
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from app.models import SessionLocal
+from app.models.entities import World
+from app.helpers.metrics import Metrics
+from app.helpers.shared_state import CacheInvalidator
+
+Metrics.describe("http_not_modified_total", "Polls answered with 304 Not Modified")
+Metrics.describe("http_not_modified_bytes_saved_total", "Estimated response bytes not sent thanks to 304s")
+Metrics.describe("http_not_modified_seconds_saved_total", "Estimated handler time not spent thanks to 304s")
+
+
+class VersionHelper:
+    """Per-world and per-player versions used to build ETags
+    
+    A version is the time_ns of the last change. Every mutation of a world
+    bumps the world and all players who can see it, and the bump is broadcast
+    so other workers adopt it. No version is older than the shared epoch:
+    a worker that starts, or finds it missed messages, sets a new epoch and
+    broadcasts it, and every worker adopts the latest. Workers so hand out
+    the same ETags for the same data, and bumps a worker never saw cannot
+    let an old ETag through.
+    """
+    CACHE_NAME = "versions"
+    EPOCH_KEY = "epoch"
+    _epoch: int = time.time_ns()
+    _worlds: Dict[int, int] = {}
+    _players: Dict[str, int] = {}
+    _player_worlds: Dict[str, Tuple[int, Tuple[int, ...]]] = {}
+    _epoch_task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def get_world_version(cls, world_id: int) -> int:
+        return max(cls._worlds.get(world_id, 0), cls._epoch)
+    
+    @classmethod
+    def get_player_version(cls, player_uuid: str) -> int:
+        return max(cls._players.get(player_uuid, 0), cls._epoch)
+    
+    @classmethod
+    def remember_player_worlds(cls, player_uuid: str, version: int, world_ids: Iterable[int]) -> None:
+        """Remember which worlds a player's list held at a version"""
+        cls._player_worlds[player_uuid] = (version, tuple(sorted(world_ids)))
+    
+    @classmethod
+    def get_player_worlds(cls, player_uuid: str) -> Optional[Tuple[int, ...]]:
+        """Get the worlds on a player's list, or None if not known at the current version"""
+        known = cls._player_worlds.get(player_uuid)
+        if known is None or known[0] != cls.get_player_version(player_uuid):
+            return None
+        return known[1]
+    
+    @classmethod
+    def new_epoch(cls) -> None:
+        """Invalidate every ETag handed out, on every worker"""
+        cls._publish_epoch(cls._advance_epoch())
+    
+    @classmethod
+    def _advance_epoch(cls) -> int:
+        epoch = time.time_ns()
+        cls._epoch = max(cls._epoch, epoch)
+        return epoch
+    
+    @classmethod
+    async def _share_epoch(cls, epoch: int) -> None:
+        try:
+            await asyncio.to_thread(cls._publish_epoch, epoch)
+        except Exception as e:
+            print(f"Failed to broadcast the version epoch: {e}")
+    
+    @classmethod
+    def _publish_epoch(cls, epoch: int) -> None:
+        db = SessionLocal()
+        try:
+            CacheInvalidator.publish(db, cls.CACHE_NAME, cls.EPOCH_KEY, {"epoch": epoch})
+            db.commit()
+        finally:
+            db.close()
+    
+    @classmethod
+    def _apply(cls, world_ids: Iterable[int], player_uuids: Iterable[str], version: int) -> None:
+        for world_id in world_ids:
+            cls._worlds[world_id] = max(version, cls._worlds.get(world_id, 0))
+        for player_uuid in player_uuids:
+            cls._players[player_uuid] = max(version, cls._players.get(player_uuid, 0))
+    
+    @classmethod
+    def bump(cls, db: Session, world_ids: Iterable[int] = (), player_uuids: Iterable[str] = ()) -> None:
+        """Bump versions, broadcasting when the session's transaction commits"""
+        world_ids = list(world_ids)
+        player_uuids = [uuid for uuid in player_uuids if uuid]
+        version = time.time_ns()
+        cls._apply(world_ids, player_uuids, version)
+        CacheInvalidator.publish(db, cls.CACHE_NAME, "", {
+            "worlds": world_ids,
+            "players": player_uuids,
+            "version": version
+        })
+    
+    @classmethod
+    def world_changed(cls, db: Session, world: World, extra_players: Iterable[str] = ()) -> None:
+        """Bump a world along with its owner and every player listed on it"""
+        player_uuids = [world.OwnerUUID, *(p.Uuid for p in world.Players), *extra_players]
+        cls.bump(db, [world.Id], player_uuids)
+    
+    @classmethod
+    def _on_message(cls, key: Optional[str], data: Optional[dict]) -> None:
+        if key is None:
+            # Messages were missed, so invalidate every ETag handed out here at
+            # once, and tell the other workers without blocking the event loop
+            epoch = cls._advance_epoch()
+            cls._epoch_task = asyncio.get_running_loop().create_task(cls._share_epoch(epoch))
+            return
+        if key == cls.EPOCH_KEY:
+            cls._epoch = max(cls._epoch, data["epoch"])
+            return
+        cls._apply(data["worlds"], data["players"], data["version"])
+
+
+CacheInvalidator.register(VersionHelper.CACHE_NAME, VersionHelper._on_message)
+
+
+def open_worlds(world_ids: Iterable[int], running: Set[int]) -> str:
+    """Describe which of the worlds run, as an ETag part
+    
+    Servers stop and crash outside the API without bumping any version, so
+    tags of responses holding world states must include this.
+    """
+    return ",".join(str(world_id) for world_id in sorted(world_ids) if world_id in running)
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from version parts, including the current day
+    
+    The day is part of every tag because days-left and expiry change with it.
+    """
+    raw = "|".join(str(part) for part in (*parts, date.today().toordinal()))
+    return f'W/"{hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()}"'
+
+
+# Moving averages of full response sizes and handler times per route
+_route_sizes: Dict[str, float] = {}
+_route_seconds: Dict[str, float] = {}
+
+
+def not_modified(request: Request, etag: str, route: str) -> Optional[Response]:
+    """Return a 304 response if the client already has this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    if etag not in (tag.strip() for tag in if_none_match.split(",")) and if_none_match.strip() != "*":
+        return None
+    
+    Metrics.increment("http_not_modified_total", route=route)
+    Metrics.increment("http_not_modified_bytes_saved_total", _route_sizes.get(route, 0), route=route)
+    Metrics.increment("http_not_modified_seconds_saved_total", _route_seconds.get(route, 0), route=route)
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def with_etag(response: Response, etag: str, route: str, started: float) -> Response:
+    """Attach an ETag to a full response and record its cost"""
+    response.headers["ETag"] = etag
+    elapsed = time.perf_counter() - started
+    size = len(response.body)
+    _route_sizes[route] = size if route not in _route_sizes else 0.9 * _route_sizes[route] + 0.1 * size
+    _route_seconds[route] = elapsed if route not in _route_seconds else 0.9 * _route_seconds[route] + 0.1 * elapsed
+    return response
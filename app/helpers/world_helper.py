@@ -1,6 +1,8 @@
+from typing import Set
 from sqlalchemy.orm import Session
+from app.models.entities import World
 from app.models.enums import StateEnum
-from app.helpers.docker_helper import DockerHelper
+from app.helpers.container_state import ContainerState
 
 
 class WorldHelper:
@@ -8,17 +10,16 @@ class WorldHelper:
         self.db = db
         self.world_id = world_id
     
-    async def get_state(self) -> str:
-        """Get the state of a world"""
-        from app.models.entities import World
-        
-        world = self.db.query(World).filter(World.Id == self.world_id).first()
-        
+    @staticmethod
+    def state_of(world: World, running: Set[int]) -> str:
+        """Get the state of a loaded world from a snapshot of the running servers"""
         if world.Name is None:
             return StateEnum.UNINITIALIZED.value
-        
-        docker_helper = DockerHelper(world.Id)
-        if await docker_helper.is_running():
+        if world.Id in running:
             return StateEnum.OPEN.value
-        
         return StateEnum.CLOSED.value
+    
+    async def get_state(self) -> str:
+        """Get the state of a world"""
+        world = self.db.query(World).filter(World.Id == self.world_id).first()
+        return self.state_of(world, await ContainerState.get_running())
@@ -1,13 +1,34 @@
 import os
 import sys
-import subprocess
+import signal
+import asyncio
 from contextlib import asynccontextmanager
+from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.models import engine, get_db, SessionLocal
-from app.models.entities import Base
+from app.models.schema import ensure_schema
 from app.helpers.config_helper import ConfigHelper
+from app.helpers.change_listener import ChangeListener
+from app.helpers.notification_helper import NotificationHelper
+from app.helpers.version_helper import VersionHelper
+from app.helpers.ops_helper import OpsHelper
+from app.helpers.activity_helper import ActivityHelper
+from app.helpers.deletion_helper import DeletionHelper
+from app.helpers.image_helper import ImageHelper, parse_tag_rules
+from app.helpers.template_helper import TemplateHelper
+from app.helpers.subscription_helper import SubscriptionHelper
+from app.helpers.region_helper import RegionHelper, parse_nodes
+from app.helpers.slot_helper import SlotHelper
+from app.helpers.stats_collector import StatsCollector
+from app.helpers.disk_usage_helper import DiskUsageHelper
+from app.helpers.rcon import RconPool
+from app.controllers.health import StartupState
+from app.middleware.readiness import ReadinessMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.coalescing import CoalescingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware, TokenBuckets
 
 # Load environment variables
 load_dotenv()
@@ -17,41 +38,144 @@ if not os.getenv("CONNECTION_STRING"):
     print("CONNECTION_STRING environment variable missing")
     sys.exit(1)
 
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "30"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "4"))
+SUBSCRIPTION_SWEEP_INTERVAL = float(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL", "60"))
+REGION_PROBE_INTERVAL = float(os.getenv("REGION_PROBE_INTERVAL", "30"))
+STATS_SYNC_INTERVAL = float(os.getenv("STATS_SYNC_INTERVAL", "5"))
+DISK_USAGE_INTERVAL = float(os.getenv("DISK_USAGE_INTERVAL", "60"))
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "2"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_FILE = os.getenv("RATE_LIMIT_FILE")
+# Endpoints clients poll, with a response that depends only on the request
+POLLED_PATHS = ("/worlds", "/invites/count/pending")
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize the application on startup and cleanup on shutdown"""
-    # Startup
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+
+def _configure() -> None:
+    """Apply the settings helpers read from the environment, once load_dotenv has run"""
+    RegionHelper.configure(parse_nodes(os.getenv("REGION_NODES", "")))
+    ImageHelper.configure(
+        os.getenv("SERVER_IMAGE", "realm-server"),
+        parse_tag_rules(os.getenv("SERVER_IMAGE_TAGS", "")),
+        int(os.getenv("SERVER_IMAGE_BUDGET_MB", "0")) * 1024 * 1024
+    )
+    TemplateHelper.configure(Path(os.getenv("TEMPLATE_CACHE_DIR", "template-cache")))
+    DiskUsageHelper.configure(
+        os.getenv("DISK_QUOTA_FILESYSTEM"),
+        int(os.getenv("DISK_QUOTA_PROJECT_BASE", "100000")),
+        os.getenv("DISK_SCAN_IMAGE", "busybox:latest")
+    )
+
+
+def _init_database_sync() -> None:
+    # Create missing tables unless the schema stamp is current
+    ensure_schema(engine)
     
-    # Initialize configuration
+    # Initialize configuration and load notifications
     db = SessionLocal()
     try:
         ConfigHelper.initialize(db)
+        NotificationHelper.load(db)
+        TemplateHelper.initialize(db)
     finally:
         db.close()
+
+
+async def _init_database() -> None:
+    await asyncio.to_thread(_init_database_sync)
     
-    # Check if docker is running
+    # Listen for changes made by other workers
+    await ChangeListener.start()
+    # Bumps made before this worker listened were missed, so no ETag handed out before may match
+    await asyncio.to_thread(VersionHelper.new_epoch)
+    StartupState.database = True
+
+
+async def _check_docker() -> None:
     try:
-        result = subprocess.run(
-            ["docker", "info"],
-            capture_output=True,
-            check=False
+        process = await asyncio.create_subprocess_exec(
+            "docker", "info",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
         )
-        if result.returncode != 0:
-            print("Docker is required to run, but its daemon is not running.")
-            sys.exit(1)
     except FileNotFoundError:
-        print("Docker is required to run, but it is not installed")
-        print("You can install it here: https://docs.docker.com/engine/install")
-        sys.exit(1)
+        raise RuntimeError(
+            "Docker is required to run, but it is not installed\n"
+            "You can install it here: https://docs.docker.com/engine/install"
+        )
+    
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    
+    if returncode != 0:
+        raise RuntimeError("Docker is required to run, but its daemon is not running.")
+    StartupState.docker = True
+
+
+async def _startup(background_tasks: list) -> None:
+    """Run the database and Docker checks concurrently"""
+    try:
+        _configure()
+    except ValueError as e:
+        StartupState.errors["configuration"] = str(e)
+    
+    results = await asyncio.gather(
+        asyncio.wait_for(_init_database(), STARTUP_TIMEOUT),
+        asyncio.wait_for(_check_docker(), STARTUP_TIMEOUT),
+        return_exceptions=True
+    )
+    for name, result in zip(("database", "docker"), results):
+        if isinstance(result, TimeoutError):
+            StartupState.errors[name] = f"Timed out after {STARTUP_TIMEOUT:g}s"
+        elif isinstance(result, Exception):
+            StartupState.errors[name] = str(result)
+    
+    if StartupState.errors:
+        for name, error in StartupState.errors.items():
+            print(f"Startup check '{name}' failed: {error}")
+        # Shut down the server the same way Ctrl+C would
+        os.kill(os.getpid(), signal.SIGTERM)
+        return
+    
+    background_tasks.extend([
+        asyncio.create_task(NotificationHelper.run_flusher()),
+        asyncio.create_task(OpsHelper.run_flusher()),
+        asyncio.create_task(SlotHelper.run_flusher()),
+        asyncio.create_task(RconPool.run_maintenance()),
+        asyncio.create_task(SubscriptionHelper.run_sweeper(SUBSCRIPTION_SWEEP_INTERVAL)),
+        asyncio.create_task(RegionHelper.run_prober(REGION_PROBE_INTERVAL)),
+        asyncio.create_task(StatsCollector.run_collector(STATS_SYNC_INTERVAL)),
+        asyncio.create_task(ActivityHelper.run_tailers()),
+        asyncio.create_task(ActivityHelper.run_writer()),
+        asyncio.create_task(DeletionHelper.run_worker()),
+        asyncio.create_task(DeletionHelper.run_reconciler()),
+        asyncio.create_task(ImageHelper.run_manager()),
+        asyncio.create_task(DiskUsageHelper.run_accountant(DISK_USAGE_INTERVAL))
+    ])
     
     print("Running Minecraft Realms Emulator")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the application on startup and cleanup on shutdown"""
+    # Startup runs in the background so the process answers /health/live
+    # right away, while /health/ready waits for the dependencies
+    background_tasks = []
+    startup_task = asyncio.create_task(_startup(background_tasks))
     
     yield  # Application runs here
     
-    # Shutdown (cleanup if needed)
+    # Shutdown
+    startup_task.cancel()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(startup_task, *background_tasks, return_exceptions=True)
+    await ChangeListener.stop()
 
 
 # Create FastAPI app with lifespan
@@ -62,6 +186,25 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Answer 503 until startup has finished
+app.add_middleware(ReadinessMiddleware, is_ready=StartupState.is_ready, exempt_prefixes=("/health",))
+
+# Run each burst of identical polls once, after limiting how often a player may poll
+app.add_middleware(CoalescingMiddleware, paths=POLLED_PATHS)
+app.add_middleware(
+    RateLimitMiddleware,
+    buckets=TokenBuckets(RATE_LIMIT_RATE, RATE_LIMIT_BURST, path=RATE_LIMIT_FILE),
+    paths=POLLED_PATHS
+)
+
+# Compress large JSON responses; streamed file routes must be listed in exclude_prefixes
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    level=COMPRESSION_LEVEL,
+    exclude_prefixes=("/health", "/admin/metrics")
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -73,8 +216,8 @@ app.add_middleware(
 
 # Import and include routers
 from app.controllers import worlds, activities, invites, mco, notifications
-from app.controllers import ops, regions, subscriptions, trial, upload, feature
-from app.controllers.admin import configuration, servers
+from app.controllers import ops, regions, subscriptions, trial, upload, feature, health
+from app.controllers.admin import configuration, servers, metrics
 
 app.include_router(worlds.router, prefix="/worlds", tags=["worlds"])
 app.include_router(activities.router, prefix="/activities", tags=["activities"])
@@ -87,8 +230,10 @@ app.include_router(subscriptions.router, prefix="/subscriptions", tags=["subscri
 app.include_router(trial.router, prefix="/trial", tags=["trial"])
 app.include_router(upload.router, prefix="/upload", tags=["upload"])
 app.include_router(feature.router, prefix="/feature", tags=["feature"])
+app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(configuration.router, prefix="/admin/configuration", tags=["admin"])
 app.include_router(servers.router, prefix="/admin/servers", tags=["admin"])
+app.include_router(metrics.router, prefix="/admin/metrics", tags=["admin"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Dict, List, Tuple
+from app.helpers.metrics import Metrics
+
+Metrics.describe("coalesced_requests_total", "Requests answered with the response of an identical one in flight")
+
+# Request headers that can change the response, besides the path and query
+_KEY_HEADERS = (b"cookie", b"if-none-match")
+
+
+class CoalescingMiddleware:
+    """ASGI middleware sharing one response between identical concurrent GETs
+    
+    Requests with the same path, query, cookie and If-None-Match as one in
+    flight wait for it instead of running the route again, then receive a
+    copy of its response. The first request runs in its own task, so the
+    others still get their answer if its client goes away.
+    """
+    
+    def __init__(self, app, paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.paths = frozenset(paths)
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+    
+    async def _capture(self, scope, receive) -> List[dict]:
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        await self.app(scope, receive, send)
+        return messages
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict((name, value) for name, value in scope["headers"] if name in _KEY_HEADERS)
+        key = (scope["path"], scope["query_string"], *(headers.get(name) for name in _KEY_HEADERS))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._capture(scope, receive))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            Metrics.increment("coalesced_requests_total", path=scope["path"])
+        
+        for message in await asyncio.shield(task):
+            await send(message)
@@ -0,0 +1,161 @@
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+from app.helpers.metrics import Metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+Metrics.describe("http_compressed_responses_total", "Responses sent compressed")
+Metrics.describe("http_compression_bytes_in_total", "Response bytes before compression")
+Metrics.describe("http_compression_bytes_out_total", "Response bytes after compression")
+
+
+def _build_codecs(level: int) -> Dict[str, Callable[[bytes], bytes]]:
+    """Build one compression function per encoding
+    
+    The zstd compressor is created once and reused for every response. zlib
+    and brotli have no reusable one-shot context, and copying a prebuilt
+    zlib.compressobj per response measured slower than zlib.compress, so
+    those two set up a fresh context per response.
+    """
+    codecs = {}
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=level)
+        codecs["zstd"] = compressor.compress
+    if brotli is not None:
+        codecs["br"] = lambda data: brotli.compress(data, quality=level, mode=brotli.MODE_TEXT)
+    # wbits=31 writes a gzip header and trailer in a single call
+    codecs["gzip"] = lambda data: zlib.compress(data, level, wbits=31)
+    return codecs
+
+
+def _with_vary(headers, exclude: Tuple[bytes, ...] = ()) -> list:
+    """Copy response headers, adding Accept-Encoding to Vary and leaving out the excluded ones"""
+    vary = b"Accept-Encoding"
+    result = []
+    for name, value in headers:
+        if name == b"vary":
+            vary = value if b"accept-encoding" in value.lower() else value + b", Accept-Encoding"
+        elif name not in exclude:
+            result.append((name, value))
+    result.append((b"vary", vary))
+    return result
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON responses above a size threshold
+    
+    The encoding is negotiated from Accept-Encoding, preferring zstd, then
+    brotli, then gzip. Only complete JSON bodies are compressed; streamed
+    responses and excluded prefixes pass through untouched. Every response
+    on the other routes carries Vary: Accept-Encoding, compressed or not, so
+    shared caches never serve one encoding to a client asking for another.
+    """
+    PREFERENCE = ("zstd", "br", "gzip")
+    
+    def __init__(self, app, minimum_size: int = 1024, level: int = 4, exclude_prefixes: Tuple[str, ...] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_prefixes = exclude_prefixes
+        self.codecs = _build_codecs(level)
+        self._negotiated: Dict[bytes, Optional[str]] = {}
+    
+    def _negotiate(self, header: bytes) -> Optional[str]:
+        # Clients send the same few headers, so remember each answer
+        if header in self._negotiated:
+            return self._negotiated[header]
+        accepted = _parse_accept_encoding(header.decode("latin-1"))
+        encoding = None
+        for name in self.PREFERENCE:
+            if name in self.codecs and accepted.get(name, accepted.get("*", 0.0)) > 0:
+                encoding = name
+                break
+        if len(self._negotiated) < 64:
+            self._negotiated[header] = encoding
+        return encoding
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = b""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value
+                break
+        encoding = self._negotiate(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": _with_vary(message["headers"])}
+                await send(message)
+            
+            await self.app(scope, receive, send_with_vary)
+            return
+        
+        start_message = None
+        
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Hold the start until the body shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._should_compress(start, body):
+                await send({**start, "headers": _with_vary(start["headers"])})
+                await send(message)
+                return
+            
+            compressed = self.codecs[encoding](body)
+            headers = _with_vary(start["headers"], exclude=(b"content-length",))
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+            
+            Metrics.increment("http_compressed_responses_total", encoding=encoding)
+            Metrics.increment("http_compression_bytes_in_total", len(body), encoding=encoding)
+            Metrics.increment("http_compression_bytes_out_total", len(compressed), encoding=encoding)
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    def _should_compress(self, start: dict, body: bytes) -> bool:
+        if len(body) < self.minimum_size or start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        is_json = False
+        for name, value in start["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                is_json = value.startswith(b"application/json")
+        return is_json
@@ -0,0 +1,110 @@
+import os
+import math
+import mmap
+import time
+import zlib
+from typing import Optional, Tuple
+from app.helpers.metrics import Metrics
+
+Metrics.describe("rate_limited_requests_total", "Requests rejected because the player ran out of tokens")
+
+# Doubles per slot: tokens left and when they were last refilled
+_SLOT_WIDTH = 2
+
+
+def parse_player_uuid(cookie: bytes) -> Optional[str]:
+    """Get the player UUID from a raw Minecraft cookie header, or None if malformed"""
+    parts = cookie.split(b";")[0].split(b":")
+    if len(parts) < 3 or not parts[2]:
+        return None
+    return parts[2].decode("latin-1")
+
+
+class TokenBuckets:
+    """Token buckets of every player in a fixed table of doubles
+    
+    Keys are hashed into one of slots buckets, so memory stays constant
+    however many players show up; players sharing a slot share its tokens.
+    Given the path of a file, such as one under /dev/shm, the table is
+    memory mapped from it and shared by every worker on the host. Updates
+    are not locked across workers, so concurrent requests may now and then
+    both get the last token.
+    """
+    
+    def __init__(self, rate: float, burst: float, slots: int = 65536, path: Optional[str] = None):
+        self.rate = rate
+        self.burst = burst
+        self.slots = slots
+        size = 8 * _SLOT_WIDTH * slots
+        if path:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, size)
+                self._buffer = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        else:
+            self._buffer = bytearray(size)
+        self._values = memoryview(self._buffer).cast("d")
+    
+    def take(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take a token for a key, returning whether it was granted and else the seconds until one is"""
+        now = time.time() if now is None else now
+        offset = (zlib.crc32(key.encode("utf-8")) % self.slots) * _SLOT_WIDTH
+        tokens, stamp = self._values[offset], self._values[offset + 1]
+        if stamp == 0 or stamp > now:
+            tokens = self.burst  # Never used, or written with a clock that has since gone back
+        else:
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        
+        granted = tokens >= 1
+        if granted:
+            tokens -= 1
+        self._values[offset] = tokens
+        self._values[offset + 1] = now
+        return granted, 0.0 if granted else (1 - tokens) / self.rate
+
+
+class RateLimitMiddleware:
+    """ASGI middleware limiting how often each player may call polled endpoints
+    
+    Players are told apart by the UUID in their cookie; requests without one
+    pass through and are rejected by the routes themselves. Rejected
+    requests are answered 429 with a Retry-After before reaching the app.
+    """
+    
+    def __init__(self, app, buckets: TokenBuckets, paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.buckets = buckets
+        self.paths = frozenset(paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        player_uuid = None
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                player_uuid = parse_player_uuid(value)
+                break
+        if player_uuid is None:
+            await self.app(scope, receive, send)
+            return
+        
+        granted, retry_after = self.buckets.take(player_uuid)
+        if granted:
+            await self.app(scope, receive, send)
+            return
+        
+        Metrics.increment("rate_limited_requests_total", path=scope["path"])
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(math.ceil(retry_after)).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
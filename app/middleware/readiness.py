@@ -0,0 +1,32 @@
+from typing import Callable, Tuple
+
+
+class ReadinessMiddleware:
+    """ASGI middleware answering 503 until the application is ready"""
+    
+    def __init__(self, app, is_ready: Callable[[], bool], exempt_prefixes: Tuple[str, ...] = ()):
+        self.app = app
+        self.is_ready = is_ready
+        self.exempt_prefixes = exempt_prefixes
+        self._ready = False
+    
+    async def __call__(self, scope, receive, send):
+        if self._ready or scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+        
+        if self.is_ready():
+            # Readiness never goes back, so stop checking once reached
+            self._ready = True
+            await self.app(scope, receive, send)
+            return
+        
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", b"1")
+            ]
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Service is starting"}'})
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, func
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, JSON, Text, Index, Computed, func, event
+from sqlalchemy.orm import relationship, Session, with_loader_criteria
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from datetime import datetime
 from app.models import Base
 from app.models.enums import GamemodeEnum, DifficultyEnum
@@ -8,16 +8,22 @@ from app.models.enums import GamemodeEnum, DifficultyEnum
 
 class World(Base):
     __tablename__ = "Worlds"
+    __table_args__ = (
+        # text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+        Index("ix_Worlds_Name_pattern", "Name", postgresql_ops={"Name": "text_pattern_ops"}),
+    )
 
     Id = Column(Integer, primary_key=True, index=True)
-    Owner = Column(String, nullable=True)
-    OwnerUUID = Column(String, nullable=True)
+    Owner = Column(String, nullable=True, index=True)
+    OwnerUUID = Column(String, nullable=True, index=True)
     Name = Column(String, nullable=True)
     Motd = Column(String, nullable=True)
     WorldType = Column(String, default="NORMAL")
     MaxPlayers = Column(Integer, default=10)
     Member = Column(Boolean, default=False)
     RegionSelectionPreference = Column(JSONB, nullable=True)
+    # Set when the owner deletes the world; a DeletionJob removes it for good
+    DeletedAt = Column(DateTime, nullable=True)
 
     # Foreign Keys
     SubscriptionId = Column(Integer, ForeignKey("Subscriptions.Id"), nullable=True)
@@ -26,7 +32,9 @@ class World(Base):
     ParentWorldId = Column(Integer, ForeignKey("Worlds.Id"), nullable=True)
 
     # Relationships
-    Subscription = relationship("Subscription", back_populates="World", foreign_keys=[SubscriptionId])
+    # Worlds.SubscriptionId and Subscriptions.WorldId are separate keys, so these are
+    # two independent many-to-one links rather than one bidirectional relationship
+    Subscription = relationship("Subscription", foreign_keys=[SubscriptionId])
     Minigame = relationship("Template")
     ActiveSlot = relationship("Slot", foreign_keys=[ActiveSlotId], post_update=True)
     Slots = relationship("Slot", back_populates="World", foreign_keys="Slot.WorldId")
@@ -34,16 +42,33 @@ class World(Base):
     ParentWorld = relationship("World", remote_side=[Id])
 
 
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted_worlds(state):
+    """Leave soft-deleted worlds out of every ORM query unless include_deleted is set"""
+    if state.is_select and not state.execution_options.get("include_deleted", False):
+        state.statement = state.statement.options(
+            with_loader_criteria(World, World.DeletedAt.is_(None), include_aliases=True)
+        )
+
+
 class Subscription(Base):
     __tablename__ = "Subscriptions"
 
     Id = Column(Integer, primary_key=True, index=True)
     WorldId = Column(Integer, ForeignKey("Worlds.Id"))
     StartDate = Column(DateTime, server_default=func.now())
+    # Generated by Postgres, so it can never drift from StartDate
+    ExpiresAt = Column(DateTime, Computed('"StartDate" + interval \'30 days\'', persisted=True), index=True)
     SubscriptionType = Column(String, nullable=False)
+    # Resource limits of the realm, falling back to the Realm* settings when null
+    MemoryLimit = Column(Integer, nullable=True)
+    CpuLimit = Column(Integer, nullable=True)
+    PidsLimit = Column(Integer, nullable=True)
+    # Disk quota of the realm's volume in MiB, falling back to RealmDiskQuota when null
+    DiskQuota = Column(Integer, nullable=True)
 
     # Relationships
-    World = relationship("World", back_populates="Subscription", foreign_keys=[WorldId])
+    World = relationship("World", foreign_keys=[WorldId])
 
 
 class Player(Base):
@@ -62,6 +87,21 @@ class Player(Base):
     World = relationship("World", back_populates="Players")
 
 
+class PlayerSession(Base):
+    __tablename__ = "PlayerSessions"
+    __table_args__ = (
+        # Serves per-world activity by join time, and makes replayed log lines no-ops
+        Index("ix_PlayerSessions_WorldId_JoinTime", "WorldId", "JoinTime", "PlayerUUID", unique=True),
+    )
+
+    Id = Column(Integer, primary_key=True)
+    WorldId = Column(Integer, ForeignKey("Worlds.Id"), nullable=False)
+    PlayerUUID = Column(String, nullable=False)
+    PlayerName = Column(String, default="")
+    JoinTime = Column(DateTime, nullable=False)
+    LeaveTime = Column(DateTime, nullable=True)
+
+
 class Slot(Base):
     __tablename__ = "Slots"
 
@@ -103,7 +143,7 @@ class Invite(Base):
 
     Id = Column(Integer, primary_key=True, index=True)
     InvitationId = Column(String, nullable=False)
-    RecipientUuid = Column(String, nullable=False)
+    RecipientUuid = Column(String, nullable=False, index=True)
     WorldId = Column(Integer, ForeignKey("Worlds.Id"), nullable=False)
     Date = Column(DateTime, server_default=func.now())
 
@@ -120,6 +160,22 @@ class Configuration(Base):
 
 class Template(Base):
     __tablename__ = "Templates"
+    __table_args__ = {
+        "info": {
+            # Every worker reloads its template catalog on this notification
+            "triggers": [
+                """CREATE OR REPLACE FUNCTION notify_templates_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('templates_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql""",
+                """CREATE OR REPLACE TRIGGER "Templates_changed"
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "Templates"
+FOR EACH STATEMENT EXECUTE FUNCTION notify_templates_changed()"""
+            ]
+        }
+    }
 
     Id = Column(Integer, primary_key=True, index=True)
     Name = Column(String, default="")
@@ -130,6 +186,8 @@ class Template(Base):
     Trailer = Column(String, default="")
     RecommendedPlayers = Column(String, default="")
     Type = Column(String, nullable=False)
+    # URL of the zipped world a reset from this template copies
+    WorldFile = Column(String, nullable=True)
 
 
 class Notification(Base):
@@ -153,3 +211,34 @@ class SeenNotification(Base):
     Id = Column(Integer, primary_key=True, index=True)
     PlayerUUID = Column(String, nullable=False)
     NotificationUUID = Column(String, nullable=False)
+
+
+class PlayerNotificationState(Base):
+    __tablename__ = "PlayerNotificationStates"
+
+    PlayerUUID = Column(String, primary_key=True)
+    # Ids of the notifications seen that still exist
+    SeenIds = Column(ARRAY(Integer), nullable=False, server_default="{}")
+
+
+class DeletionJob(Base):
+    __tablename__ = "DeletionJobs"
+
+    Id = Column(Integer, primary_key=True)
+    # No foreign key, since the job outlives the world row it removes
+    WorldId = Column(Integer, nullable=False, unique=True)
+    CreatedAt = Column(DateTime, server_default=func.now())
+    RunAfter = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    Attempts = Column(Integer, default=0, nullable=False)
+    LastError = Column(Text, nullable=True)
+
+
+class VolumeUsage(Base):
+    __tablename__ = "VolumeUsages"
+
+    # No foreign key, since a scan may still report a world being deleted
+    WorldId = Column(Integer, primary_key=True)
+    Bytes = Column(BigInteger, nullable=False)
+    # Bytes per slot id, only known when measured by a scan
+    SlotBytes = Column(JSON, nullable=True)
+    MeasuredAt = Column(DateTime, nullable=False)
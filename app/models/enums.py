@@ -101,3 +101,7 @@ class SettingsEnum(str, Enum):
     TrialMode = "TrialMode"
     OnlineMode = "OnlineMode"
     AutomaticRealmsCreation = "AutomaticRealmsCreation"
+    RealmMemoryLimit = "RealmMemoryLimit"
+    RealmCpuLimit = "RealmCpuLimit"
+    RealmPidsLimit = "RealmPidsLimit"
+    RealmDiskQuota = "RealmDiskQuota"
@@ -0,0 +1,64 @@
+import hashlib
+from sqlalchemy import Column, MetaData, String, Table, inspect, select, delete, insert, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.schema import CreateTable, CreateIndex, CreateColumn
+from sqlalchemy.dialects import postgresql
+from app.models.entities import Base
+
+# Kept out of Base.metadata so the stamp does not hash itself
+_stamp_metadata = MetaData()
+schema_version_table = Table(
+    "SchemaVersion",
+    _stamp_metadata,
+    Column("Version", String, primary_key=True)
+)
+
+
+def get_schema_version() -> str:
+    """Hash the DDL of every table so any model change yields a new version"""
+    dialect = postgresql.dialect()
+    digest = hashlib.sha256()
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode("utf-8"))
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode("utf-8"))
+        for trigger in table.info.get("triggers", ()):
+            digest.update(trigger.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """Create missing tables unless the stored stamp matches the models
+    
+    Returns True if the schema had to be created or updated.
+    """
+    version = get_schema_version()
+    with engine.connect() as connection:
+        try:
+            current = connection.execute(select(schema_version_table.c.Version)).scalar()
+        except ProgrammingError:
+            current = None
+    
+    if current == version:
+        return False
+    
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # create_all skips existing tables, so add columns and indexes declared since they were created
+        inspector = inspect(connection)
+        for table in Base.metadata.tables.values():
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN IF NOT EXISTS {ddl}'))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+            # Declared in the table's info, written to be safe to run again
+            for trigger in table.info.get("triggers", ()):
+                connection.execute(text(trigger))
+        schema_version_table.create(connection, checkfirst=True)
+        connection.execute(delete(schema_version_table))
+        connection.execute(insert(schema_version_table).values(Version=version))
+    return True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from app.models.enums import DifficultyEnum, GamemodeEnum
 
 
@@ -25,6 +25,13 @@ class UpdateWorldConfigurationRequest(BaseModel):
     WorldType: Optional[str] = None
 
 
+class ResetWorldRequest(BaseModel):
+    seed: str = ""
+    worldTemplateId: int = -1
+    levelType: int = 0
+    generateStructures: bool = True
+
+
 class PlayerRequest(BaseModel):
     Name: str
     Uuid: str
@@ -32,3 +39,7 @@ class PlayerRequest(BaseModel):
     Accepted: bool = False
     Online: bool = False
     Permission: str = "MEMBER"
+
+
+class NotificationUuidsRequest(BaseModel):
+    uuidList: List[str]
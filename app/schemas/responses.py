@@ -101,8 +101,20 @@ class ErrorResponse(BaseModel):
     errorMsg: str
 
 
+class PendingInviteResponse(BaseModel):
+    invitationId: str
+    worldName: Optional[str]
+    worldOwnerName: Optional[str]
+    worldOwnerUuid: Optional[str]
+    date: int
+
+
 class InviteList(BaseModel):
-    invites: List[Any]
+    invites: List[PendingInviteResponse]
+
+
+class PendingInviteCountResponse(BaseModel):
+    count: int
 
 
 class OpsResponse(BaseModel):
@@ -121,6 +133,17 @@ class NewsResponse(BaseModel):
     newsLink: str
 
 
+class ConfigurationChangeResponse(BaseModel):
+    key: str
+    oldValue: Any = None
+    newValue: Any = None
+
+
+class ConfigurationUpdateResponse(BaseModel):
+    success: bool = True
+    changes: List[ConfigurationChangeResponse] = []
+
+
 class MinecraftPlayerInfo(BaseModel):
     id: str
     name: str
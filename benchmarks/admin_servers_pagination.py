@@ -0,0 +1,81 @@
+"""Admin server listing benchmark.
+
+Seeds worlds into the database at CONNECTION_STRING and times one page of
+the admin listing at increasing depths, with keyset pagination on World.Id
+against the equivalent OFFSET query. Keyset latency should stay flat as the
+table grows while OFFSET grows with depth. Seeded rows are removed at exit.
+
+Needs a reachable Postgres with the schema created.
+
+Usage: python -m benchmarks.admin_servers_pagination [--worlds 50000] [--limit 100]
+"""
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import delete, insert, select
+from app.models import SessionLocal
+from app.models.entities import World
+from app.controllers.admin.servers import _build_query, _row_to_dict
+
+SEED_OWNER = "benchmark-admin-servers"
+
+
+def seed(db, count: int) -> None:
+    rows = [
+        {"Owner": SEED_OWNER, "OwnerUUID": f"{i:032x}", "Name": f"Realm {i}", "Motd": "Benchmark"}
+        for i in range(count)
+    ]
+    for start in range(0, count, 5000):
+        db.execute(insert(World), rows[start:start + 5000])
+    db.commit()
+
+
+def _time(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worlds", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        seed(db, args.worlds)
+        ids = [row.Id for row in db.execute(select(World.Id).order_by(World.Id))]
+        total = len(ids)
+        query = _build_query(set(), None, None, None, None)
+        
+        results = []
+        for fraction in (0.0, 0.25, 0.5, 0.75, 0.99):
+            depth = int(total * fraction)
+            after = ids[depth - 1] if depth else None
+            keyset = query if after is None else query.where(World.Id > after)
+            results.append({
+                "depth": depth,
+                "keyset_ms": _time(lambda: [_row_to_dict(r, set()) for r in db.execute(keyset.limit(args.limit))], args.runs),
+                "offset_ms": _time(lambda: [_row_to_dict(r, set()) for r in db.execute(query.offset(depth).limit(args.limit))], args.runs)
+            })
+        
+        print(json.dumps({
+            "worlds": total,
+            "limit": args.limit,
+            "pages": results
+        }, indent=2))
+    finally:
+        db.rollback()
+        db.execute(delete(World).where(World.Owner == SEED_OWNER))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
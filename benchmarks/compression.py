@@ -0,0 +1,63 @@
+"""Response compression benchmark.
+
+Compresses /worlds payloads of several sizes with every codec available to
+CompressionMiddleware and reports CPU time per response against bytes
+saved, to help pick COMPRESSION_MIN_SIZE and COMPRESSION_LEVEL.
+
+Usage: python -m benchmarks.compression [--level 4] [--runs 200]
+"""
+import argparse
+import json
+import time
+from fastapi.responses import ORJSONResponse
+from app.controllers.worlds import _build_world_response
+from app.helpers.minecraft_version_parser import MinecraftVersion
+from app.middleware.compression import _build_codecs
+from benchmarks.world_list_serialization import make_worlds
+
+# (worlds, players per world) giving payloads from a few hundred bytes to about a megabyte
+SHAPES = [(1, 1), (1, 10), (5, 20), (20, 50), (50, 100), (100, 200)]
+
+
+def make_payload(world_count: int, player_count: int) -> bytes:
+    game_ver = MinecraftVersion("1.21.1")
+    worlds = make_worlds(world_count, player_count)
+    servers = [_build_world_response(world, "OPEN", game_ver, "1.21.1") for world in worlds]
+    return ORJSONResponse({"servers": servers}).body
+
+
+def measure(compress, payload: bytes, runs: int) -> dict:
+    started = time.process_time()
+    for _ in range(runs):
+        compressed = compress(payload)
+    cpu = (time.process_time() - started) / runs
+    saved = len(payload) - len(compressed)
+    return {
+        "bytes": len(compressed),
+        "ratio": round(len(payload) / len(compressed), 2),
+        "cpu_us": round(cpu * 1e6, 1),
+        "saved_bytes_per_cpu_ms": round(saved / (cpu * 1000), 0) if cpu else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--level", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    
+    codecs = _build_codecs(args.level)
+    results = []
+    for world_count, player_count in SHAPES:
+        payload = make_payload(world_count, player_count)
+        results.append({
+            "worlds": world_count,
+            "players_per_world": player_count,
+            "payload_bytes": len(payload),
+            **{name: measure(compress, payload, args.runs) for name, compress in codecs.items()}
+        })
+    print(json.dumps({"level": args.level, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
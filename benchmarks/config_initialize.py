@@ -0,0 +1,89 @@
+"""Startup benchmark for ConfigHelper.initialize against a large settings table.
+
+Seeds the Configuration table with extra rows, then times initialize and a
+bulk update while counting the statements sent to Postgres. Requires
+CONNECTION_STRING to point at a disposable database.
+
+Usage: python -m benchmarks.config_initialize [--rows 10000] [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import event, delete
+from sqlalchemy.dialects.postgresql import insert
+from app.models import engine, SessionLocal
+from app.models.entities import Base, Configuration
+from app.helpers.config_helper import ConfigHelper
+
+BENCH_PREFIX = "_bench_"
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, *args):
+        self.count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    
+    Base.metadata.create_all(bind=engine, tables=[Configuration.__table__])
+    db = SessionLocal()
+    db.execute(insert(Configuration).values([
+        {"Key": f"{BENCH_PREFIX}{i}", "Value": json.dumps(i)}
+        for i in range(args.rows)
+    ]).on_conflict_do_nothing(index_elements=[Configuration.Key]))
+    db.commit()
+    
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        timings = []
+        for _ in range(args.runs):
+            ConfigHelper._config_cache = {}
+            counter.count = 0
+            started = time.perf_counter()
+            ConfigHelper.initialize(db)
+            timings.append(time.perf_counter() - started)
+        initialize_statements = counter.count
+        
+        original = {key: ConfigHelper.get_setting(key) for key in ConfigHelper.get_defaults()}
+        counter.count = 0
+        started = time.perf_counter()
+        changes = ConfigHelper.set_settings(db, {
+            "NewsLink": "https://example.com/bench",
+            "TrialMode": not original["TrialMode"],
+            "OnlineMode": original["OnlineMode"]
+        })
+        update_seconds = time.perf_counter() - started
+        update_statements = counter.count
+        ConfigHelper.set_settings(db, original)
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+        db.execute(delete(Configuration).where(Configuration.Key.startswith(BENCH_PREFIX)))
+        db.commit()
+        db.close()
+    
+    print(json.dumps({
+        "rows": args.rows,
+        "initialize": {
+            "median_ms": round(statistics.median(timings) * 1000, 2),
+            "max_ms": round(max(timings) * 1000, 2),
+            "statements": initialize_statements
+        },
+        "bulk_update": {
+            "ms": round(update_seconds * 1000, 2),
+            "statements": update_statements,
+            "changed_keys": [change.key for change in changes]
+        }
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
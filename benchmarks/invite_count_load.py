@@ -0,0 +1,80 @@
+"""Load test for pending-invite count polling.
+
+Simulates title-screen polling of ``/invites/count/pending`` by many players
+against the invites router, with the database replaced by a session that only
+counts the queries it receives. After the first poll of each player every
+request should be served from ``InviteHelper`` without a database round-trip.
+
+Usage: python -m benchmarks.invite_count_load [--players 10000] [--polls 3]
+"""
+import argparse
+import json
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.models import get_db
+from app.controllers import invites
+from app.helpers.invite_helper import InviteHelper
+
+
+class CountingQuery:
+    def __init__(self, session):
+        self.session = session
+    
+    def filter(self, *args):
+        return self
+    
+    def count(self):
+        self.session.queries += 1
+        return 1
+
+
+class CountingSession:
+    def __init__(self):
+        self.queries = 0
+    
+    def query(self, *args):
+        return CountingQuery(self)
+    
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--polls", type=int, default=3)
+    args = parser.parse_args()
+    
+    session = CountingSession()
+    app = FastAPI()
+    app.include_router(invites.router, prefix="/invites")
+    app.dependency_overrides[get_db] = lambda: session
+    client = TestClient(app)
+    
+    InviteHelper._pending_counts.clear()
+    cookies = [
+        f"sid=token:{i:032x}:{i:032x};user=player{i};version=1.21"
+        for i in range(args.players)
+    ]
+    
+    results = {}
+    for poll in range(args.polls):
+        queries_before = session.queries
+        started = time.perf_counter()
+        for cookie in cookies:
+            response = client.get("/invites/count/pending", headers={"cookie": cookie})
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - started
+        results[f"poll_{poll}"] = {
+            "requests": args.players,
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(args.players / elapsed, 1),
+            "db_queries": session.queries - queries_before,
+        }
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""RCON throughput benchmark.
+
+Compares console commands per second sent with the previous path (one
+``exec_run(["rcon-cli", command])`` per command) against the pooled RCON
+connection, both one command at a time and pipelined in batches.
+
+With --world-id the commands go to that realm's running server and need
+Docker. Without it, the RCON numbers are measured against an in-process
+server speaking the RCON protocol, which shows the client's own overhead.
+
+Usage: python -m benchmarks.rcon_throughput [--world-id 1] [--commands 500] [--batch 50]
+"""
+import argparse
+import asyncio
+import json
+import time
+from app.helpers.rcon import RconPool
+from tests.fake_rcon import PASSWORD, start_fake_server
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1)
+
+
+def measure_exec_run(world_id: int, count: int) -> float:
+    from app.helpers.docker_helper import docker
+    container = docker.from_env().containers.get(f"realm-server-{world_id}")
+    started = time.perf_counter()
+    for _ in range(count):
+        container.exec_run(["rcon-cli", "list"])
+    return _rate(count, time.perf_counter() - started)
+
+
+async def measure_rcon(world_id: int, resolve, count: int, batch: int) -> dict:
+    # Connect outside the timed section, as the pool keeps connections open
+    await RconPool.execute(world_id, ["list"], resolve)
+    
+    started = time.perf_counter()
+    for _ in range(count):
+        await RconPool.execute(world_id, ["list"], resolve)
+    sequential = _rate(count, time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    for _ in range(count // batch):
+        await RconPool.execute(world_id, ["list"] * batch, resolve)
+    pipelined = _rate(count // batch * batch, time.perf_counter() - started)
+    
+    RconPool.discard(world_id)
+    return {"sequential": sequential, "pipelined": pipelined}
+
+
+async def run(args) -> dict:
+    if args.world_id is None:
+        server, port = await start_fake_server()
+        
+        async def resolve():
+            return "127.0.0.1", port, PASSWORD
+        
+        async with server:
+            rcon = await measure_rcon(0, resolve, args.commands, args.batch)
+            # Let the handler see the closed connection before the server shuts down
+            await asyncio.sleep(0.01)
+            return {"server": "in-process", "rcon": rcon}
+    
+    from app.helpers.docker_helper import DockerHelper
+    docker_helper = DockerHelper(args.world_id)
+    return {
+        "server": f"realm-server-{args.world_id}",
+        "exec_run": await asyncio.to_thread(measure_exec_run, args.world_id, min(args.commands, 100)),
+        "rcon": await measure_rcon(args.world_id, docker_helper.get_rcon_endpoint, args.commands, args.batch)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--world-id", type=int, default=None)
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    print(json.dumps({"commands_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Realm lifecycle benchmark against the in-process fake Docker daemon.
+
+Starts --realms servers through DockerHelper, --concurrency at a time, waits
+for each to finish booting, lists them through ContainerState, then stops
+and deletes them all. No Docker daemon, image or database is needed, so
+thousands of realms fit on one machine. Reports the duration, throughput
+and latency percentiles of each phase, and per Docker operation the calls
+made and the peak number in flight, as JSON.
+
+Usage: python -m benchmarks.realm_lifecycle [--realms 1000] [--concurrency 50] [--latency 0.002] [--boot-time 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, List
+from tests.fake_docker import FakeDocker, docker_host, serve
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _phase(world_ids: List[int], concurrency: int, action: Callable[[int], Awaitable[None]]) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    
+    async def run(world_id: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await action(world_id)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(run(world_id) for world_id in world_ids))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "seconds": round(elapsed, 3),
+        "per_second": round(len(world_ids) / elapsed, 1),
+        "errors": errors,
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2)
+    }
+
+
+async def _start(world_id: int) -> None:
+    helper = DockerHelper(world_id)
+    await helper.create_volume()
+    await helper.start_server(1, image="realm-server")
+    if not await helper.wait_until_ready(60):
+        raise RuntimeError(f"World {world_id} did not boot")
+
+
+async def _stop(world_id: int) -> None:
+    await DockerHelper(world_id).stop_server()
+
+
+async def _delete(world_id: int) -> None:
+    await DockerHelper(world_id).delete_server()
+
+
+async def _list(runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        ContainerState.invalidate()
+        started = time.perf_counter()
+        running = await ContainerState.get_running()
+        timings.append(time.perf_counter() - started)
+    ordered = sorted(timings)
+    return {"running": len(running), "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2)}
+
+
+async def _run(args) -> dict:
+    world_ids = list(range(1, args.realms + 1))
+    results = {"start": await _phase(world_ids, args.concurrency, _start)}
+    results["list"] = await _list(args.list_runs)
+    results["stop"] = await _phase(world_ids, args.concurrency, _stop)
+    results["delete"] = await _phase(world_ids, args.concurrency, _delete)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--realms", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds the fake daemon adds to each call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--boot-time", type=float, default=0.5, help="seconds a server takes to become ready")
+    parser.add_argument("--list-runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    state = FakeDocker(latency=args.latency, jitter=args.jitter, boot_time=args.boot_time, seed=args.seed)
+    server, _ = serve(state=state)
+    os.environ["DOCKER_HOST"] = docker_host(server)
+    try:
+        results = asyncio.run(_run(args))
+    finally:
+        server.shutdown()
+    
+    results["docker_calls"] = dict(state.calls.most_common())
+    results["docker_peak_in_flight"] = dict(state.peak_in_flight.most_common())
+    print(json.dumps({"config": vars(args), **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
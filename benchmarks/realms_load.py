@@ -0,0 +1,307 @@
+"""End-to-end load test replaying the traffic of Realms clients.
+
+Seeds players and the worlds they own, with members and pending invites,
+into the Postgres at CONNECTION_STRING, then starts the app under uvicorn
+against the stand-in daemon of tests.fake_docker. Each simulated
+client sits on the title screen polling /mco/available, /worlds,
+/invites/count/pending and /notifications as one player after another, and
+now and then opens, joins and closes one of that player's worlds.
+Throughput and latency percentiles are reported per route as JSON, along
+with the commit measured, so runs can be compared between commits. Seeded
+rows are removed afterwards unless --keep is given.
+
+The startup check runs `docker info`, so the docker CLI must be on PATH,
+though no Docker daemon is needed. Rate limiting is lifted unless
+--rate-limit is given, so the polls measure the routes themselves.
+
+Usage: python -m benchmarks.realms_load [--players 1000] [--worlds 500] [--clients 64] [--seconds 30]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+import httpx
+from sqlalchemy import bindparam, insert, select, update
+from app.models import SessionLocal, engine
+from app.models.entities import World, Slot, Player, Invite, Subscription, SeenNotification, PlayerNotificationState
+from app.models.schema import ensure_schema
+from app.helpers.deletion_helper import DeletionHelper
+
+# Seeded players get UUIDs starting with this, so their rows can be found and removed
+UUID_PREFIX = "10ad7e57"
+TITLE_SCREEN = ("/mco/available", "/worlds", "/invites/count/pending", "/notifications")
+
+
+@dataclass
+class SimulatedPlayer:
+    uuid: str
+    name: str
+    version: str
+    worlds: List[int] = field(default_factory=list)
+    
+    @property
+    def cookie(self) -> str:
+        return f"sid=token:{self.uuid}:{self.uuid};user={self.name};version={self.version}"
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    limited: int = 0
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def cleanup() -> int:
+    """Remove every seeded world, with its rows, and the state of seeded players"""
+    db = SessionLocal()
+    try:
+        world_ids = db.execute(
+            select(World.Id)
+            .where(World.OwnerUUID.startswith(UUID_PREFIX))
+            .execution_options(include_deleted=True)
+        ).scalars().all()
+        db.execute(Player.__table__.delete().where(Player.__table__.c.Uuid.startswith(UUID_PREFIX)))
+        db.execute(Invite.__table__.delete().where(Invite.__table__.c.RecipientUuid.startswith(UUID_PREFIX)))
+        for entity in (SeenNotification, PlayerNotificationState):
+            table = entity.__table__
+            db.execute(table.delete().where(table.c.PlayerUUID.startswith(UUID_PREFIX)))
+        db.commit()
+    finally:
+        db.close()
+    for world_id in world_ids:
+        DeletionHelper._remove_rows(world_id)
+    return len(world_ids)
+
+
+def seed(
+    player_count: int,
+    world_count: int,
+    members: int,
+    invites: int,
+    version: str,
+    rng: random.Random
+) -> List[SimulatedPlayer]:
+    """Create the players' worlds, each with one slot, a subscription, members and invites"""
+    players = [
+        SimulatedPlayer(uuid=f"{UUID_PREFIX}{i:024x}", name=f"loadtest{i}", version=version)
+        for i in range(player_count)
+    ]
+    owners = [players[i % player_count] for i in range(world_count)]
+    db = SessionLocal()
+    try:
+        world_ids = db.execute(
+            insert(World).returning(World.Id, sort_by_parameter_order=True),
+            [
+                {"Owner": owner.name, "OwnerUUID": owner.uuid, "Name": f"Load test {i}", "Motd": "", "Member": False}
+                for i, owner in enumerate(owners)
+            ]
+        ).scalars().all()
+        slot_ids = db.execute(
+            insert(Slot).returning(Slot.Id, sort_by_parameter_order=True),
+            [{"WorldId": world_id, "SlotId": 1, "SlotName": "", "Version": version} for world_id in world_ids]
+        ).scalars().all()
+        subscription_ids = db.execute(
+            insert(Subscription).returning(Subscription.Id, sort_by_parameter_order=True),
+            [{"WorldId": world_id, "SubscriptionType": "NORMAL"} for world_id in world_ids]
+        ).scalars().all()
+        worlds = World.__table__
+        db.execute(
+            update(worlds)
+            .where(worlds.c.Id == bindparam("world_id"))
+            .values(ActiveSlotId=bindparam("slot_id"), SubscriptionId=bindparam("subscription_id")),
+            [
+                {"world_id": world_id, "slot_id": slot_id, "subscription_id": subscription_id}
+                for world_id, slot_id, subscription_id in zip(world_ids, slot_ids, subscription_ids)
+            ]
+        )
+        
+        member_rows, invite_rows = [], []
+        for world_id, owner in zip(world_ids, owners):
+            owner.worlds.append(world_id)
+            picked = rng.sample(players, min(player_count, members + invites + 1))
+            others = [player for player in picked if player is not owner]
+            for player in others[:members]:
+                member_rows.append({"WorldId": world_id, "Name": player.name, "Uuid": player.uuid, "Accepted": True})
+            for player in others[members:members + invites]:
+                invite_rows.append({
+                    "WorldId": world_id,
+                    "RecipientUuid": player.uuid,
+                    "InvitationId": f"{world_id}-{player.uuid}"
+                })
+                member_rows.append({"WorldId": world_id, "Name": player.name, "Uuid": player.uuid, "Accepted": False})
+        if member_rows:
+            db.execute(insert(Player), member_rows)
+        if invite_rows:
+            db.execute(insert(Invite), invite_rows)
+        db.commit()
+    finally:
+        db.close()
+    return players
+
+
+async def _wait_ready(base_url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+async def _run_clients(
+    base_url: str,
+    players: List[SimulatedPlayer],
+    args,
+    seconds: float,
+    rng: random.Random
+) -> Dict[str, RouteStats]:
+    stats: Dict[str, RouteStats] = {}
+    deadline = time.perf_counter() + seconds
+    
+    async def call(client: httpx.AsyncClient, player: SimulatedPlayer, method: str, path: str, route: str) -> None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers={"cookie": player.cookie})
+            status = response.status_code
+        except httpx.TransportError:
+            status = 0
+        route_stats = stats.setdefault(route, RouteStats())
+        route_stats.latencies.append(time.perf_counter() - started)
+        if status == 429:
+            route_stats.limited += 1
+        elif not 200 <= status < 400:
+            route_stats.errors += 1
+    
+    async def client_loop(client_id: int) -> None:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            index = client_id
+            while time.perf_counter() < deadline:
+                player = players[index % len(players)]
+                index += args.clients
+                for path in TITLE_SCREEN:
+                    await call(client, player, "GET", path, path)
+                if player.worlds and rng.random() < args.action_rate:
+                    world_id = rng.choice(player.worlds)
+                    await call(client, player, "PUT", f"/worlds/{world_id}/open", "/worlds/{id}/open")
+                    await call(client, player, "GET", f"/worlds/v1/{world_id}/join/pc", "/worlds/v1/{id}/join/pc")
+                    await call(client, player, "PUT", f"/worlds/{world_id}/close", "/worlds/{id}/close")
+                if args.think:
+                    await asyncio.sleep(rng.expovariate(1 / args.think))
+    
+    await asyncio.gather(*(client_loop(c) for c in range(args.clients)))
+    return stats
+
+
+def _report(stats: Dict[str, RouteStats], seconds: float) -> dict:
+    routes = {}
+    for route, route_stats in sorted(stats.items()):
+        ordered = sorted(route_stats.latencies)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": route_stats.errors,
+            "rate_limited": route_stats.limited,
+            "requests_per_second": round(len(ordered) / seconds, 1),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+            "p90_ms": round(_percentile(ordered, 0.90) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2)
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "requests": total,
+        "errors": sum(route["errors"] for route in routes.values()),
+        "requests_per_second": round(total / seconds, 1),
+        "routes": routes
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--worlds", type=int, default=500)
+    parser.add_argument("--members", type=int, default=3, help="accepted members per world")
+    parser.add_argument("--invites", type=int, default=1, help="pending invites per world")
+    parser.add_argument("--version", default="1.21.4", help="game version of the clients and slots")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument(
+        "--action-rate", type=float, default=0.01,
+        help="chance of an open, join and close after each round of polls"
+    )
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds a client waits between rounds")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=5097)
+    parser.add_argument("--docker-port", type=int, default=2397)
+    parser.add_argument("--rate-limit", action="store_true", help="keep the configured rate limits")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in the database")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    ensure_schema(engine)
+    cleanup()
+    players = seed(args.players, args.worlds, args.members, args.invites, args.version, rng)
+    
+    docker_process = subprocess.Popen(
+        [sys.executable, "-m", "tests.fake_docker", "--port", str(args.docker_port)],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    docker_host = json.loads(docker_process.stdout.readline())["docker_host"]
+    env = dict(os.environ, DOCKER_HOST=docker_host)
+    if not args.rate_limit:
+        env["RATE_LIMIT_RATE"] = env["RATE_LIMIT_BURST"] = "1000000"
+    base_url = f"http://127.0.0.1:{args.port}"
+    app_process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(_wait_ready(base_url, 60))
+        if args.warmup:
+            asyncio.run(_run_clients(base_url, players, args, args.warmup, rng))
+        started = time.perf_counter()
+        stats = asyncio.run(_run_clients(base_url, players, args, args.seconds, rng))
+        elapsed = time.perf_counter() - started
+    finally:
+        app_process.terminate()
+        app_process.wait()
+        docker_process.terminate()
+        docker_process.wait()
+        if not args.keep:
+            cleanup()
+    
+    result = {"commit": _commit(), "config": vars(args), **_report(stats, elapsed)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
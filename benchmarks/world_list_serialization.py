@@ -0,0 +1,123 @@
+"""Micro-benchmark of the /worlds response serialization.
+
+Compares the previous path (one pydantic model per world and player, then
+FastAPI validating the result against response_model and encoding it with
+the standard JSON response) with the current path (plain dicts built once
+and encoded by ORJSONResponse) on 50 worlds with 100 players each.
+
+Usage: python -m benchmarks.world_list_serialization [--worlds 50] [--players 100]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from types import SimpleNamespace
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from app.controllers.worlds import _build_world_response
+from app.helpers.minecraft_version_parser import MinecraftVersion
+from app.schemas.responses import ServersResponse, WorldResponse, PlayerResponse
+
+
+def make_worlds(world_count: int, player_count: int) -> list:
+    return [
+        SimpleNamespace(
+            Id=w,
+            Owner=f"owner{w}",
+            OwnerUUID=f"{w:032x}",
+            Name=f"Realm {w}",
+            Motd="A long message of the day " * 4,
+            WorldType="NORMAL",
+            MaxPlayers=10,
+            Member=False,
+            Minigame=None,
+            ActiveSlot=SimpleNamespace(SlotId=1, Version="1.21.1", GameMode=0, Hardcore=False),
+            Players=[
+                SimpleNamespace(
+                    Id=w * player_count + p,
+                    Name=f"player{p}",
+                    Uuid=f"{p:032x}",
+                    Operator=p % 10 == 0,
+                    Accepted=True,
+                    Online=p % 3 == 0,
+                    Permission="MEMBER"
+                )
+                for p in range(player_count)
+            ]
+        )
+        for w in range(world_count)
+    ]
+
+
+def previous_path(worlds: list, field) -> bytes:
+    servers = [
+        WorldResponse(
+            Id=world.Id,
+            Owner=world.Owner,
+            OwnerUUID=world.OwnerUUID,
+            Name=world.Name,
+            Motd=world.Motd,
+            GameMode=world.ActiveSlot.GameMode,
+            IsHardcore=world.ActiveSlot.Hardcore,
+            State="OPEN",
+            WorldType=world.WorldType,
+            MaxPlayers=world.MaxPlayers,
+            ActiveSlot=world.ActiveSlot.SlotId,
+            Member=world.Member,
+            Players=[PlayerResponse.model_validate(p) for p in world.Players],
+            ActiveVersion=world.ActiveSlot.Version,
+            Compatibility="COMPATIBLE"
+        )
+        for world in worlds
+    ]
+    content = asyncio.run(serialize_response(field=field, response_content=ServersResponse(servers=servers)))
+    return JSONResponse(content).body
+
+
+def current_path(worlds: list) -> bytes:
+    game_ver = MinecraftVersion("1.21.1")
+    servers = [_build_world_response(world, "OPEN", game_ver, "1.21.1") for world in worlds]
+    return ORJSONResponse({"servers": servers}).body
+
+
+def _time(fn, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "min_ms": round(min(timings) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worlds", type=int, default=50)
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    
+    worlds = make_worlds(args.worlds, args.players)
+    field = APIRoute("/worlds", lambda: None, response_model=ServersResponse).response_field
+    
+    previous = previous_path(worlds, field)
+    current = current_path(worlds)
+    assert json.loads(previous) == json.loads(current), "Serialized payloads differ"
+    
+    previous_timing = _time(lambda: previous_path(worlds, field), args.runs)
+    current_timing = _time(lambda: current_path(worlds), args.runs)
+    print(json.dumps({
+        "worlds": args.worlds,
+        "players_per_world": args.players,
+        "payload_bytes": len(current),
+        "previous": previous_timing,
+        "current": current_timing,
+        "speedup": round(previous_timing["median_ms"] / current_timing["median_ms"], 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Multi-worker scaling benchmark for /worlds.
+
+Starts the app under gunicorn with 1..N workers and measures /worlds
+throughput with a fixed number of concurrent clients, so the speedup per
+added core can be compared. Requires a reachable Postgres at
+CONNECTION_STRING and a Docker daemon (or a stand-in at DOCKER_HOST).
+
+Usage: python -m benchmarks.worlds_scaling [--max-workers 4] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+
+def _cookie(i: int) -> str:
+    return f"sid=token:{i:032x}:{i:032x};user=bench{i};version=1.21"
+
+
+async def _wait_ready(base_url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+async def _load(base_url: str, clients: int, players: int, seconds: float) -> dict:
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    
+    async def client_loop(client_id: int):
+        nonlocal completed, errors
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            i = client_id
+            while time.perf_counter() < deadline:
+                response = await client.get("/worlds", headers={"cookie": _cookie(i % players)})
+                if response.status_code == 200:
+                    completed += 1
+                else:
+                    errors += 1
+                i += clients
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(c) for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {"requests": completed, "errors": errors, "requests_per_second": round(completed / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args()
+    
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for workers in range(1, args.max_workers + 1):
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            asyncio.run(_wait_ready(base_url, 60))
+            # Warm up caches and connection pools before measuring
+            asyncio.run(_load(base_url, args.clients, args.players, 2))
+            result = asyncio.run(_load(base_url, args.clients, args.players, args.seconds))
+        finally:
+            process.terminate()
+            process.wait()
+        result["workers"] = workers
+        results.append(result)
+    
+    baseline = results[0]["requests_per_second"] or 1
+    for result in results:
+        result["speedup"] = round(result["requests_per_second"] / baseline, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
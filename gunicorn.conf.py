@@ -0,0 +1,28 @@
+"""Gunicorn configuration for running the emulator with several workers
+
+Start with:  gunicorn -c gunicorn.conf.py app.main:app
+
+Send SIGHUP to the master for a graceful rolling restart: new workers are
+started with the current code and configuration, and the old ones finish
+their in-flight requests (up to graceful_timeout) before exiting.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker opens its own database connections and LISTEN connection
+preload_app = False
+
+# Time given to a worker to drain in-flight requests on restart or shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers over time, staggered so they never restart together
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-" if os.getenv("ACCESS_LOG") else None
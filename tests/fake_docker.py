@@ -0,0 +1,783 @@
+"""In-process stand-in for the Docker Engine API.
+
+Implements the subset of the API the app uses through docker-py: containers
+(create, start, stop, kill, wait, rename, remove, inspect, list, archive
+upload, logs, stats and the rcon-cli exec fallback), volumes, images and
+events. Started containers print the line a Minecraft server prints once it
+accepts players, after boot_time seconds, and `rcon-cli stop` stops them.
+Nothing is run; state lives in memory, indexed so thousands of simulated
+realms stay cheap, and is gone with the process.
+
+Every request can be slowed down by a fixed latency plus seeded jitter, and
+made to fail: failures are queued per operation with fail_next, for
+deterministic tests, or drawn at a rate per operation. Operations are named
+after the handler methods, such as start_container or list_containers, and
+calls and peak concurrency per operation are counted.
+
+Point the app at it with DOCKER_HOST=tcp://127.0.0.1:<port>, or
+unix://<path> when serving on a socket.
+
+Usage: python -m tests.fake_docker [--port 2375 | --socket PATH] [--latency 0.005] [--fail start_container=0.1]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import secrets
+import socketserver
+import struct
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+API_VERSION = "1.43"
+# Strips the version prefix docker-py puts in front of every path
+_VERSIONED = re.compile(r"^/v\d+\.\d+(/.*)$")
+# Synthetic usage reported by stats: a quarter of a CPU, 512 MiB and 30 processes
+_CPU_SHARE = 0.25
+_ONLINE_CPUS = 4
+_MEMORY_BYTES = 512 * 1024 * 1024
+_PAGE_CACHE_BYTES = 32 * 1024 * 1024
+_PIDS = 30
+
+
+def _stamp(moment: float) -> str:
+    """Format a time like Docker does in log timestamps, with nanoseconds"""
+    text = datetime.fromtimestamp(moment, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return f"{text}000Z"
+
+
+def _frame(data: bytes, stream: int = 1) -> bytes:
+    """Wrap output in the multiplexed stream header of containers without a TTY"""
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+def _chunk(data: bytes) -> bytes:
+    """Encode one chunk of a chunked HTTP body"""
+    return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+
+def _image_ref(image: str) -> str:
+    return image if ":" in image.rsplit("/", 1)[-1] else f"{image}:latest"
+
+
+@dataclass
+class FakeContainer:
+    id: str
+    name: str
+    image: str
+    config: dict
+    host_config: dict
+    created: float = field(default_factory=time.time)
+    status: str = "created"
+    logs: List[Tuple[float, bytes]] = field(default_factory=list)
+    # Bumped on every start, so a boot timer never finishes a later run
+    runs: int = 0
+    
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+    
+    def port_bindings(self) -> Dict[str, List[dict]]:
+        return self.host_config.get("PortBindings") or {}
+    
+    def summary(self) -> dict:
+        ports = []
+        for port, bindings in self.port_bindings().items():
+            private, _, kind = port.partition("/")
+            for binding in bindings or []:
+                ports.append({
+                    "IP": binding.get("HostIp") or "0.0.0.0",
+                    "PrivatePort": int(private),
+                    "PublicPort": int(binding["HostPort"]),
+                    "Type": kind or "tcp"
+                })
+        return {
+            "Id": self.id,
+            "Names": [f"/{self.name}"],
+            "Image": self.image,
+            "Created": int(self.created),
+            "State": self.status,
+            "Status": "Up" if self.running else "Exited (0)",
+            "Ports": ports if self.running else []
+        }
+    
+    def inspect(self) -> dict:
+        return {
+            "Id": self.id,
+            "Name": f"/{self.name}",
+            "Image": self.image,
+            "Created": datetime.fromtimestamp(self.created, timezone.utc).isoformat(),
+            "State": {"Status": self.status, "Running": self.running, "ExitCode": 0},
+            "Config": {**self.config, "Tty": False},
+            "HostConfig": self.host_config,
+            "NetworkSettings": {
+                "Ports": self.port_bindings() if self.running else {},
+                # No address, so the app falls back to exec for console commands
+                "Networks": {"bridge": {"IPAddress": ""}}
+            }
+        }
+    
+    def stats(self, sample: int, previous: Optional[int]) -> dict:
+        """Build a stats frame; the first frame of a stream has no previous sample, like Docker's"""
+        
+        def cpu(at: int) -> dict:
+            return {
+                "cpu_usage": {"total_usage": int(at * _CPU_SHARE * 1e9)},
+                "system_cpu_usage": int(at * _ONLINE_CPUS * 1e9),
+                "online_cpus": _ONLINE_CPUS
+            }
+        
+        return {
+            "read": datetime.now(timezone.utc).isoformat(),
+            "name": f"/{self.name}",
+            "id": self.id,
+            "cpu_stats": cpu(sample),
+            "precpu_stats": cpu(previous) if previous is not None else {"cpu_usage": {"total_usage": 0}},
+            "memory_stats": {
+                "usage": _MEMORY_BYTES + _PAGE_CACHE_BYTES,
+                "limit": self.host_config.get("Memory") or 16 * 1024 ** 3,
+                "stats": {"inactive_file": _PAGE_CACHE_BYTES}
+            },
+            "pids_stats": {"current": _PIDS}
+        }
+
+
+class DockerError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeDocker:
+    """In-memory Docker state behind the HTTP handler"""
+    EVENT_HISTORY = 10000
+    
+    def __init__(
+        self,
+        images: Tuple[str, ...] = ("realm-server:latest",),
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        boot_time: float = 0.0,
+        stats_interval: float = 1.0,
+        failure_rates: Optional[Dict[str, float]] = None,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.boot_time = boot_time
+        self.stats_interval = stats_interval
+        self.failure_rates = dict(failure_rates or {})
+        self.containers: Dict[str, FakeContainer] = {}
+        self.names: Dict[str, str] = {}
+        self.volumes: Dict[str, dict] = {}
+        self.images: Dict[str, dict] = {}
+        self.events: Deque[dict] = deque(maxlen=self.EVENT_HISTORY)
+        self.calls: Counter = Counter()
+        self.peak_in_flight: Counter = Counter()
+        self.changed = threading.Condition()
+        self._in_flight: Counter = Counter()
+        self._failures: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._random = random.Random(seed)
+        for image in images:
+            self._add_image(image)
+    
+    def fail_next(self, operation: str, count: int = 1, status: int = 500, message: str = "injected failure") -> None:
+        """Make the next count calls of an operation fail with the given status"""
+        with self.changed:
+            self._failures.setdefault(operation, deque()).extend([(status, message)] * count)
+    
+    def begin(self, operation: str) -> float:
+        """Account for a call and get the latency to apply to it"""
+        with self.changed:
+            self.calls[operation] += 1
+            self._in_flight[operation] += 1
+            self.peak_in_flight[operation] = max(self.peak_in_flight[operation], self._in_flight[operation])
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+    
+    def end(self, operation: str) -> None:
+        with self.changed:
+            self._in_flight[operation] -= 1
+    
+    def check_failure(self, operation: str) -> None:
+        """Raise the failure queued or drawn for a call, if any"""
+        queued = self._failures.get(operation)
+        if queued:
+            raise DockerError(*queued.popleft())
+        rate = self.failure_rates.get(operation)
+        if rate and self._random.random() < rate:
+            raise DockerError(500, "injected failure")
+    
+    def emit(self, kind: str, action: str, actor_id: str, **attributes: str) -> None:
+        moment = time.time_ns()
+        self.events.append({
+            "Type": kind,
+            "Action": action,
+            "Actor": {"ID": actor_id, "Attributes": attributes},
+            "scope": "local",
+            "time": moment // 1_000_000_000,
+            "timeNano": moment
+        })
+        self.changed.notify_all()
+    
+    def _add_image(self, ref: str) -> None:
+        ref = _image_ref(ref)
+        self.images[ref] = {
+            "Id": f"sha256:{secrets.token_hex(32)}",
+            "RepoTags": [ref],
+            "Created": int(time.time()),
+            "Size": 500 * 1024 * 1024
+        }
+    
+    def find(self, reference: str) -> FakeContainer:
+        container_id = self.names.get(reference.lstrip("/"), reference)
+        container = self.containers.get(container_id)
+        if container:
+            return container
+        if len(reference) >= 12:
+            for container in self.containers.values():
+                if container.id.startswith(reference):
+                    return container
+        raise DockerError(404, f"No such container: {reference}")
+    
+    def log(self, container: FakeContainer, text: str) -> None:
+        moment = time.time()
+        clock = time.strftime("%H:%M:%S", time.localtime(moment))
+        container.logs.append((moment, f"[{clock}] [Server thread/INFO]: {text}\n".encode()))
+        self.changed.notify_all()
+    
+    def create(self, name: Optional[str], body: dict) -> FakeContainer:
+        image = _image_ref(body["Image"])
+        if image not in self.images:
+            raise DockerError(404, f"No such image: {image}")
+        if name and name in self.names:
+            raise DockerError(409, f'Conflict. The container name "/{name}" is already in use')
+        container_id = secrets.token_hex(32)
+        container = FakeContainer(
+            id=container_id,
+            name=name or container_id[:12],
+            image=image,
+            config={key: value for key, value in body.items() if key != "HostConfig"},
+            host_config=body.get("HostConfig") or {}
+        )
+        self.containers[container.id] = container
+        self.names[container.name] = container.id
+        self.emit("container", "create", container.id, name=container.name, image=image)
+        return container
+    
+    def start(self, container: FakeContainer) -> None:
+        container.runs += 1
+        self.emit("container", "start", container.id, name=container.name)
+        if container.config.get("Entrypoint"):
+            # Helper containers run a short command and exit
+            container.status = "exited"
+            self.emit("container", "die", container.id, name=container.name, exitCode="0")
+            return
+        container.status = "running"
+        self.log(container, "Starting minecraft server")
+        if self.boot_time:
+            timer = threading.Timer(self.boot_time, self._finish_boot, args=(container, container.runs))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._finish_boot(container, container.runs)
+    
+    def _finish_boot(self, container: FakeContainer, run: int) -> None:
+        with self.changed:
+            if container.running and container.runs == run:
+                self.log(container, f'Done ({self.boot_time:.3f}s)! For help, type "help"')
+    
+    def stop(self, container: FakeContainer) -> None:
+        if container.running:
+            self.log(container, "Stopping server")
+            container.status = "exited"
+            self.emit("container", "die", container.id, name=container.name, exitCode="0")
+        if container.host_config.get("AutoRemove"):
+            self.remove(container)
+    
+    def remove(self, container: FakeContainer) -> None:
+        container.status = "exited"
+        if self.containers.pop(container.id, None) is None:
+            return
+        if self.names.get(container.name) == container.id:
+            del self.names[container.name]
+        self.emit("container", "destroy", container.id, name=container.name)
+    
+    def rename(self, container: FakeContainer, name: str) -> None:
+        if self.names.get(name, container.id) != container.id:
+            raise DockerError(409, f'Conflict. The container name "/{name}" is already in use')
+        old_name = container.name
+        del self.names[old_name]
+        container.name = name
+        self.names[name] = container.id
+        self.emit("container", "rename", container.id, name=name, oldName=f"/{old_name}")
+    
+    def execute(self, container: FakeContainer, command: List[str]) -> bytes:
+        if not container.running:
+            raise DockerError(409, f"Container {container.id} is not running")
+        if command[:1] == ["rcon-cli"] and command[1:] == ["stop"]:
+            self.stop(container)
+        return b""
+    
+    def volume_in_use(self, name: str) -> bool:
+        return any(
+            bind.split(":", 1)[0] == name
+            for container in self.containers.values()
+            for bind in container.host_config.get("Binds") or []
+        )
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, which Nagle would hold back for a delayed ACK
+    disable_nagle_algorithm = True
+    state: FakeDocker
+    
+    ROUTES = [
+        ("GET", r"/_ping", "ping"),
+        ("HEAD", r"/_ping", "ping"),
+        ("GET", r"/version", "version"),
+        ("GET", r"/info", "info"),
+        ("GET", r"/events", "events"),
+        ("GET", r"/containers/json", "list_containers"),
+        ("POST", r"/containers/create", "create_container"),
+        ("GET", r"/containers/(?P<ref>[^/]+)/json", "inspect_container"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/start", "start_container"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/(?:stop|kill)", "stop_container"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/wait", "wait_container"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/rename", "rename_container"),
+        ("PUT", r"/containers/(?P<ref>[^/]+)/archive", "put_archive"),
+        ("GET", r"/containers/(?P<ref>[^/]+)/logs", "container_logs"),
+        ("GET", r"/containers/(?P<ref>[^/]+)/stats", "container_stats"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/exec", "create_exec"),
+        ("DELETE", r"/containers/(?P<ref>[^/]+)", "remove_container"),
+        ("POST", r"/exec/(?P<ref>[^/]+)/start", "start_exec"),
+        ("GET", r"/exec/(?P<ref>[^/]+)/json", "inspect_exec"),
+        ("GET", r"/volumes", "list_volumes"),
+        ("POST", r"/volumes/create", "create_volume"),
+        ("GET", r"/volumes/(?P<ref>[^/]+)", "inspect_volume"),
+        ("DELETE", r"/volumes/(?P<ref>[^/]+)", "remove_volume"),
+        ("GET", r"/images/json", "list_images"),
+        ("POST", r"/images/create", "pull_image"),
+        ("GET", r"/images/(?P<ref>.+)/json", "inspect_image"),
+        ("DELETE", r"/images/(?P<ref>.+)", "remove_image"),
+    ]
+    _compiled = [(method, re.compile(f"^{pattern}$"), name) for method, pattern, name in ROUTES]
+    _execs: Dict[str, Tuple[str, List[str]]] = {}
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _dispatch(self) -> None:
+        url = urlsplit(self.path)
+        match = _VERSIONED.match(url.path)
+        path = match.group(1) if match else url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        
+        for method, pattern, name in self._compiled:
+            route = pattern.match(path)
+            if method == self.command and route:
+                self._handle(name, route.groupdict())
+                return
+        self._send_json(404, {"message": f"page not found: {self.command} {path}"})
+    
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _dispatch
+    
+    def _handle(self, operation: str, arguments: dict) -> None:
+        delay = self.state.begin(operation)
+        try:
+            if delay:
+                time.sleep(delay)
+            try:
+                with self.state.changed:
+                    self.state.check_failure(operation)
+                    stream = getattr(self, operation)(**arguments)
+            except DockerError as e:
+                self._send_json(e.status, {"message": str(e)})
+                return
+            # Streaming handlers hand back the rest of their work, run without the lock
+            if stream:
+                try:
+                    stream()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client stopped reading
+        finally:
+            self.state.end(operation)
+    
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Api-Version", API_VERSION)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+    
+    def _send_json(self, status: int, data) -> None:
+        self._send(status, json.dumps(data).encode())
+    
+    def _start_stream(self, content_type: str, chunked: bool = False) -> None:
+        # Streams end when the connection does, like the daemon's hijacked ones
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+    
+    def _flag(self, name: str, default: bool = False) -> bool:
+        value = self.query.get(name)
+        return default if value is None else value in ("1", "true", "True")
+    
+    def _json_body(self) -> dict:
+        return json.loads(self.body or b"{}")
+    
+    def _filters(self) -> Dict[str, List[str]]:
+        filters = json.loads(self.query.get("filters") or "{}")
+        # Older clients send {"name": {"value": true}} instead of lists
+        return {key: list(value) for key, value in filters.items()}
+    
+    def ping(self):
+        self._send(200, b"OK", "text/plain")
+    
+    def version(self):
+        self._send_json(200, {
+            "Version": "24.0.0-fake",
+            "ApiVersion": API_VERSION,
+            "MinAPIVersion": "1.12",
+            "Os": "linux",
+            "Arch": "amd64"
+        })
+    
+    def info(self):
+        containers = self.state.containers.values()
+        self._send_json(200, {
+            "ID": "fake",
+            "Name": "fake-docker",
+            "ServerVersion": "24.0.0-fake",
+            "Containers": len(containers),
+            "ContainersRunning": sum(container.running for container in containers),
+            "Images": len(self.state.images),
+            "NCPU": _ONLINE_CPUS,
+            "OperatingSystem": "fake"
+        })
+    
+    def events(self):
+        filters = self._filters()
+        since = float(self.query.get("since") or time.time())
+        until = float(self.query["until"]) if self.query.get("until") else None
+        
+        def wanted(event: dict) -> bool:
+            actor = event["Actor"]
+            return (
+                event["timeNano"] >= since * 1e9
+                and all(event["Type"] == kind for kind in filters.get("type", []))
+                and all(event["Action"] == action for action in filters.get("event", []))
+                and all(
+                    reference in (actor["ID"], actor["Attributes"].get("name"))
+                    for reference in filters.get("container", [])
+                )
+            )
+        
+        self._start_stream("application/json", chunked=True)
+        backlog = [event for event in self.state.events if wanted(event)]
+        seen = self.state.events[-1]["timeNano"] if self.state.events else 0
+        
+        def follow():
+            nonlocal backlog, seen
+            while True:
+                for event in backlog:
+                    self.wfile.write(_chunk(json.dumps(event).encode() + b"\n"))
+                self.wfile.flush()
+                with self.state.changed:
+                    while not self.state.events or self.state.events[-1]["timeNano"] == seen:
+                        remaining = until - time.time() if until is not None else None
+                        if remaining is not None and remaining <= 0:
+                            self.wfile.write(_chunk(b""))
+                            return
+                        self.state.changed.wait(remaining)
+                    backlog = [event for event in self.state.events if event["timeNano"] > seen and wanted(event)]
+                    seen = self.state.events[-1]["timeNano"]
+        
+        return follow
+    
+    def list_containers(self):
+        names = self._filters().get("name") or []
+        everything = self._flag("all")
+        containers = [
+            container.summary() for container in self.state.containers.values()
+            if (everything or container.running)
+            and all(re.search(name, container.name) for name in names)
+        ]
+        self._send_json(200, containers)
+    
+    def create_container(self):
+        container = self.state.create(self.query.get("name"), self._json_body())
+        self._send_json(201, {"Id": container.id, "Warnings": []})
+    
+    def inspect_container(self, ref):
+        self._send_json(200, self.state.find(ref).inspect())
+    
+    def start_container(self, ref):
+        container = self.state.find(ref)
+        if container.running:
+            self._send(304, b"")
+            return
+        self.state.start(container)
+        self._send(204, b"")
+    
+    def stop_container(self, ref):
+        self.state.stop(self.state.find(ref))
+        self._send(204, b"")
+    
+    def wait_container(self, ref):
+        container = self.state.find(ref)
+        while container.running:
+            self.state.changed.wait()
+        self._send_json(200, {"StatusCode": 0})
+    
+    def rename_container(self, ref):
+        self.state.rename(self.state.find(ref), self.query["name"])
+        self._send(204, b"")
+    
+    def put_archive(self, ref):
+        self.state.find(ref)
+        self._send(200, b"")
+    
+    def remove_container(self, ref):
+        container = self.state.find(ref)
+        if container.running and not self._flag("force"):
+            raise DockerError(409, "You cannot remove a running container. Stop it before attempting removal")
+        if container.running:
+            self.state.emit("container", "kill", container.id, name=container.name)
+            self.state.emit("container", "die", container.id, name=container.name, exitCode="137")
+        self.state.remove(container)
+        self._send(204, b"")
+    
+    def container_logs(self, ref):
+        container = self.state.find(ref)
+        timestamps = self._flag("timestamps")
+        since = float(self.query.get("since") or 0)
+        tail = self.query.get("tail", "all")
+        
+        def render(lines):
+            return b"".join(
+                _frame((f"{_stamp(moment)} ".encode() if timestamps else b"") + line)
+                for moment, line in lines if moment >= since
+            )
+        
+        lines = container.logs if tail == "all" else container.logs[-int(tail):] if int(tail) else []
+        if not self._flag("follow"):
+            self._send(200, render(lines), "application/vnd.docker.raw-stream")
+            return
+        
+        self._start_stream("application/vnd.docker.raw-stream")
+        sent = len(container.logs)
+        chunk = render(lines)
+        
+        def follow():
+            nonlocal sent, chunk
+            while True:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                with self.state.changed:
+                    while container.running and len(container.logs) == sent:
+                        self.state.changed.wait()
+                    if len(container.logs) == sent:
+                        return  # Stopped with nothing left to send
+                    chunk = render(container.logs[sent:])
+                    sent = len(container.logs)
+        
+        return follow
+    
+    def container_stats(self, ref):
+        container = self.state.find(ref)
+        if not self._flag("stream", True):
+            # Docker waits for a second sample unless asked for one shot
+            self._send_json(200, container.stats(2, None if self._flag("one-shot") else 1))
+            return
+        
+        self._start_stream("application/json", chunked=True)
+        
+        def stream():
+            sample, previous = 1, None
+            while True:
+                frame = container.stats(sample, previous)
+                self.wfile.write(_chunk(json.dumps(frame).encode() + b"\n"))
+                self.wfile.flush()
+                with self.state.changed:
+                    # Stopping wakes every waiter, so a stopped container ends its stream right away
+                    self.state.changed.wait_for(lambda: not container.running, self.state.stats_interval)
+                    if not container.running:
+                        self.wfile.write(_chunk(b""))
+                        return
+                sample, previous = sample + 1, sample
+        
+        return stream
+    
+    def create_exec(self, ref):
+        container = self.state.find(ref)
+        exec_id = secrets.token_hex(32)
+        self._execs[exec_id] = (container.id, self._json_body()["Cmd"])
+        self._send_json(201, {"Id": exec_id})
+    
+    def start_exec(self, ref):
+        container_id, command = self._execs[ref]
+        output = self.state.execute(self.state.find(container_id), command)
+        self._start_stream("application/vnd.docker.raw-stream")
+        
+        def write_output():
+            # docker-py reads exec output straight from the socket, so let it take
+            # the headers off before output shows up in the same read
+            time.sleep(0.01)
+            self.wfile.write(_frame(output) if output else b"")
+        
+        return write_output
+    
+    def inspect_exec(self, ref):
+        container_id, command = self._execs.pop(ref)
+        self._send_json(200, {"ID": ref, "Running": False, "ExitCode": 0, "ContainerID": container_id})
+    
+    def list_volumes(self):
+        names = self._filters().get("name") or []
+        volumes = [volume for name, volume in self.state.volumes.items() if all(n in name for n in names)]
+        self._send_json(200, {"Volumes": volumes, "Warnings": []})
+    
+    def create_volume(self):
+        name = self._json_body().get("Name") or secrets.token_hex(32)
+        if name not in self.state.volumes:
+            self.state.volumes[name] = {
+                "Name": name,
+                "Driver": "local",
+                "Mountpoint": f"/var/lib/docker/volumes/{name}/_data",
+                "CreatedAt": datetime.now(timezone.utc).isoformat(),
+                "Labels": {},
+                "Scope": "local"
+            }
+            self.state.emit("volume", "create", name, driver="local")
+        self._send_json(201, self.state.volumes[name])
+    
+    def inspect_volume(self, ref):
+        if ref not in self.state.volumes:
+            raise DockerError(404, f"get {ref}: no such volume")
+        self._send_json(200, self.state.volumes[ref])
+    
+    def remove_volume(self, ref):
+        if ref not in self.state.volumes:
+            raise DockerError(404, f"get {ref}: no such volume")
+        if self.state.volume_in_use(ref):
+            raise DockerError(409, f"remove {ref}: volume is in use")
+        del self.state.volumes[ref]
+        self.state.emit("volume", "destroy", ref, driver="local")
+        self._send(204, b"")
+    
+    def list_images(self):
+        references = self._filters().get("reference") or []
+        images = [
+            image for ref, image in self.state.images.items()
+            if all(ref == r or ref.startswith(f"{r}:") for r in references)
+        ]
+        self._send_json(200, images)
+    
+    def pull_image(self):
+        ref = f"{self.query['fromImage']}:{self.query.get('tag') or 'latest'}"
+        self.state._add_image(ref)
+        self.state.emit("image", "pull", ref)
+        self._send(200, json.dumps({"status": f"Downloaded newer image for {ref}"}).encode())
+    
+    def inspect_image(self, ref):
+        image = self.state.images.get(_image_ref(ref))
+        if not image:
+            raise DockerError(404, f"No such image: {ref}")
+        self._send_json(200, image)
+    
+    def remove_image(self, ref):
+        ref = _image_ref(ref)
+        if any(container.image == ref for container in self.state.containers.values()):
+            raise DockerError(409, f"conflict: unable to remove repository reference {ref}, it is in use")
+        if self.state.images.pop(ref, None) is None:
+            raise DockerError(404, f"No such image: {ref}")
+        self.state.emit("image", "untag", ref)
+        self._send_json(200, [{"Untagged": ref}])
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(
+    port: int = 0,
+    state: Optional[FakeDocker] = None,
+    path: Optional[str] = None
+) -> Tuple[socketserver.BaseServer, FakeDocker]:
+    """Serve a fake daemon on a background thread, on a unix socket if path is given
+    
+    Returns the server and its state; docker_host(server) gives the value for DOCKER_HOST.
+    """
+    state = state or FakeDocker()
+    handler = type("Handler", (FakeDockerHandler,), {"state": state})
+    if path:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = _UnixServer(path, handler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-docker", daemon=True).start()
+    return server, state
+
+
+def docker_host(server: socketserver.BaseServer) -> str:
+    """Get the DOCKER_HOST pointing at a server started by serve"""
+    if isinstance(server.server_address, str):
+        return f"unix://{server.server_address}"
+    return f"tcp://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=2375)
+    parser.add_argument("--socket", help="serve on this unix socket instead of TCP")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many seconds more, at random")
+    parser.add_argument("--boot-time", type=float, default=0.0, help="seconds until a started server is ready")
+    parser.add_argument("--stats-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--fail", action="append", default=[], metavar="OPERATION=RATE",
+        help="fail this share of an operation's calls, e.g. start_container=0.1"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    failure_rates = {}
+    for item in args.fail:
+        operation, _, rate = item.partition("=")
+        failure_rates[operation] = float(rate)
+    state = FakeDocker(
+        latency=args.latency,
+        jitter=args.jitter,
+        boot_time=args.boot_time,
+        stats_interval=args.stats_interval,
+        failure_rates=failure_rates,
+        seed=args.seed
+    )
+    server, _ = serve(args.port, state, args.socket)
+    print(json.dumps({"docker_host": docker_host(server)}), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""In-process server speaking the RCON protocol, for tests and benchmarks"""
+import asyncio
+import struct
+
+PASSWORD = "fake-rcon"
+
+
+async def _serve_rcon(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            header = await reader.readexactly(4)
+            body = await reader.readexactly(struct.unpack("<i", header)[0])
+            request_id, packet_type = struct.unpack("<ii", body[:8])
+            payload = body[8:-2]
+            if packet_type == 3 and payload.decode() != PASSWORD:
+                request_id, response = -1, b""
+            else:
+                response = b"There are 0 of a max of 10 players online: " if packet_type == 2 else b""
+            reply = struct.pack("<ii", request_id, 0 if packet_type == 2 else 2) + response + b"\x00\x00"
+            writer.write(struct.pack("<i", len(reply)) + reply)
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+async def start_fake_server():
+    """Start an RCON server answering every command, returning it with its port"""
+    server = await asyncio.start_server(_serve_rcon, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
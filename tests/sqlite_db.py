@@ -0,0 +1,32 @@
+"""In-memory SQLite stand-in for the tables a test touches
+
+Only the listed tables are created, since some others use Postgres-only
+DDL. pg_notify is recorded instead of sent, so helpers that broadcast
+through the change listener run unchanged.
+"""
+import json
+from typing import List, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.models.entities import Base
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb(element, compiler, **kw):
+    return "JSON"
+
+
+def make_session(*entities) -> Tuple[Session, List[dict]]:
+    """Get a session on a fresh database holding the tables of entities, and the payloads it notifies"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    notified: List[dict] = []
+    
+    @event.listens_for(engine, "connect")
+    def register_functions(connection, record):
+        connection.create_function("pg_notify", 2, lambda channel, payload: notified.append(json.loads(payload)))
+    
+    Base.metadata.create_all(engine, tables=[entity.__table__ for entity in entities])
+    return sessionmaker(bind=engine, autoflush=False)(), notified
@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from app.helpers import activity_helper
+from app.helpers.activity_helper import ActivityEvent, ActivityHelper, parse_line
+from app.helpers.metrics import Metrics
+from app.helpers.version_helper import VersionHelper
+
+
+def test_parse_line_pairs_names_with_uuids():
+    """Test that login lines supply the UUID of the following join and leave events"""
+    uuids = {}
+    lines = [
+        "2024-05-01T10:00:00.100000000Z [10:00:00] [User Authenticator #1/INFO]: "
+        "UUID of player Steve is 069a79f4-44e9-4726-a5be-fca90e38aaf5\n",
+        "2024-05-01T10:00:00.200000000Z [10:00:00] [Server thread/INFO]: Steve joined the game\n",
+        "2024-05-01T10:00:01.000000000Z [10:00:01] [Server thread/INFO]: <Steve> hello\n",
+        "2024-05-01T11:00:00Z [11:00:00] [Server thread/INFO]: Steve left the game\n",
+        "2024-05-01T11:00:05Z [11:00:05] [Server thread/INFO]: Stopping server\n"
+    ]
+    events = [event for event in (parse_line(7, line, uuids) for line in lines) if event]
+    
+    assert [event.kind for event in events] == ["join", "leave", "stop"]
+    assert events[0].uuid == events[1].uuid == "069a79f444e94726a5befca90e38aaf5"
+    expected = datetime(2024, 5, 1, 10, 0, 0, 200000, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert events[0].time == expected
+    assert events[2].world_id == 7
+
+
+class RecordingSession:
+    """Session keeping the SQL and parameters of every executed statement"""
+    
+    def __init__(self):
+        self.executed = []
+    
+    def execute(self, statement, parameters=None):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.executed.append((str(compiled), parameters or compiled.params))
+        uuids = ["owner"] if '"Worlds"' in str(compiled) else ["a", "b"]
+        return SimpleNamespace(rowcount=2, scalars=lambda: SimpleNamespace(all=lambda: uuids))
+
+
+def test_write_inserts_joins_and_reconciles_online_players(monkeypatch):
+    """Test that a batch inserts joins in one statement, only each player's last event sets Online, and the worlds are bumped"""
+    bumps = []
+    monkeypatch.setattr(VersionHelper, "bump", lambda db, world_ids, player_uuids: bumps.append((world_ids, player_uuids)))
+    moment = datetime(2024, 5, 1, 10)
+    events = [
+        ActivityEvent("join", 1, moment, "a", "Alex"),
+        ActivityEvent("join", 1, moment, "b", "Steve"),
+        ActivityEvent("leave", 1, moment, "b", "Steve"),
+        ActivityEvent("join", 2, moment, "c", "Sam"),
+        ActivityEvent("stop", 2, moment, None, None)
+    ]
+    db = RecordingSession()
+    
+    assert ActivityHelper.write(db, events) == 2
+    inserts = [sql for sql, _ in db.executed if sql.startswith("INSERT")]
+    assert len(inserts) == 1 and "DO NOTHING" in inserts[0]
+    players = [parameters for sql, parameters in db.executed if sql.startswith('UPDATE "Players"')]
+    # Stopping the server takes every player of world 2 offline, including the one who joined before
+    assert players == [
+        {"Online": False, "WorldId_1": [2]},
+        [{"world_id": 1, "uuid": "a", "online": True}, {"world_id": 1, "uuid": "b", "online": False}]
+    ]
+    assert bumps == [([1, 2], ["owner", "a", "b"])]
+
+
+class CountingSession:
+    def __init__(self):
+        self.commits = 0
+    
+    def commit(self):
+        self.commits += 1
+    
+    def rollback(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+def test_a_batch_that_keeps_failing_drops_only_the_rejected_events(monkeypatch):
+    """Test that after MAX_ATTEMPTS failed flushes the batch is split and only events the database rejects are dropped"""
+    moment = datetime(2024, 5, 1, 10)
+    good = ActivityEvent("join", 1, moment, "a", "Alex")
+    bad = ActivityEvent("join", 9, moment, "b", "Steve")
+    written = []
+    dropped = []
+    
+    def write(db, events):
+        if bad in events:
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        written.extend(events)
+        return len(events)
+    
+    monkeypatch.setattr(activity_helper, "SessionLocal", CountingSession)
+    monkeypatch.setattr(ActivityHelper, "write", write)
+    monkeypatch.setattr(ActivityHelper, "_queue", activity_helper.deque([good, bad, good]))
+    monkeypatch.setattr(ActivityHelper, "_failures", 0)
+    monkeypatch.setattr(Metrics, "increment", lambda name, value=1, **labels: dropped.append(labels))
+    
+    for _ in range(ActivityHelper.MAX_ATTEMPTS - 1):
+        with pytest.raises(IntegrityError):
+            ActivityHelper._flush_with_new_session()
+        assert list(ActivityHelper._queue) == [good, bad, good]
+    
+    assert ActivityHelper._flush_with_new_session() == 2
+    assert written == [good, good]
+    assert dropped == [{"kind": "join"}]
+    assert not ActivityHelper._queue
+
+
+def test_a_lost_connection_never_drops_events(monkeypatch):
+    """Test that errors not caused by the events keep them queued, even once the batch is split"""
+    event = ActivityEvent("leave", 1, datetime(2024, 5, 1, 10), "a", "Alex")
+    
+    def write(db, events):
+        raise OperationalError("UPDATE", {}, Exception("connection refused"))
+    
+    monkeypatch.setattr(activity_helper, "SessionLocal", CountingSession)
+    monkeypatch.setattr(ActivityHelper, "write", write)
+    monkeypatch.setattr(ActivityHelper, "_queue", activity_helper.deque([event]))
+    monkeypatch.setattr(ActivityHelper, "_failures", 0)
+    
+    for _ in range(ActivityHelper.MAX_ATTEMPTS + 1):
+        with pytest.raises(OperationalError):
+            ActivityHelper._flush_with_new_session()
+    assert list(ActivityHelper._queue) == [event]
@@ -0,0 +1,62 @@
+import gzip
+import asyncio
+from app.middleware.compression import CompressionMiddleware
+
+
+def make_app(body: bytes, content_type: bytes = b"application/json"):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def call(middleware, accept_encoding: bytes) -> list:
+    messages = []
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {"type": "http", "path": "/worlds", "headers": [(b"accept-encoding", accept_encoding)]}
+    asyncio.run(middleware(scope, None, send))
+    return messages
+
+
+def test_compresses_large_json_with_accepted_encoding():
+    """Test that large JSON bodies are gzipped when only gzip is accepted"""
+    body = b'{"servers":[' + b'{"name":"Realm"},' * 200 + b'{}]}'
+    start, message = call(CompressionMiddleware(make_app(body)), b"gzip, zstd;q=0")
+    
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert int(headers[b"content-length"]) == len(message["body"])
+    assert gzip.decompress(message["body"]) == body
+
+
+def test_skips_small_and_non_json_bodies():
+    """Test that bodies below the threshold or not JSON pass through"""
+    small = b'{"servers":[]}'
+    start, message = call(CompressionMiddleware(make_app(small)), b"gzip")
+    assert b"content-encoding" not in dict(start["headers"])
+    assert message["body"] == small
+    
+    assert dict(start["headers"])[b"vary"] == b"Accept-Encoding"
+    
+    text = b"x" * 4096
+    start, message = call(CompressionMiddleware(make_app(text, b"text/plain")), b"gzip")
+    assert b"content-encoding" not in dict(start["headers"])
+    assert message["body"] == text
+
+
+def test_uncompressed_responses_still_vary_on_encoding():
+    """Test that responses sent as is, with or without an accepted encoding, tell caches they vary"""
+    body = b'{"servers":[' + b'{"name":"Realm"},' * 200 + b'{}]}'
+    for accept_encoding in (b"identity", b""):
+        start, message = call(CompressionMiddleware(make_app(body)), accept_encoding)
+        headers = dict(start["headers"])
+        assert b"content-encoding" not in headers
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert message["body"] == body
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+import pytest
+from app.helpers.config_helper import ConfigHelper
+
+
+@pytest.fixture(autouse=True)
+def config_cache():
+    ConfigHelper._config_cache = {"OnlineMode": False, "NewsLink": ""}
+    ConfigHelper._version = 0
+    ConfigHelper._version_changed = None
+    yield
+
+
+def test_validate_rejects_wrong_types():
+    """Test that values are validated against Settings"""
+    ConfigHelper.validate("OnlineMode", True)
+    ConfigHelper.validate("NewsLink", "https://example.com")
+    
+    with pytest.raises(ValueError):
+        ConfigHelper.validate("OnlineMode", "true")
+    with pytest.raises(ValueError):
+        ConfigHelper.validate("NewsLink", 1)
+    with pytest.raises(ValueError):
+        ConfigHelper.validate("NotASetting", True)
+
+
+def test_change_notification_updates_cache():
+    """Test that a broadcast change updates the cache and version"""
+    ConfigHelper._on_change(json.dumps({"OnlineMode": True}))
+    
+    assert ConfigHelper.get_setting("OnlineMode") is True
+    assert ConfigHelper.get_version() == 1
+    
+    # Repeated notifications of the same value are not new versions
+    ConfigHelper._on_change(json.dumps({"OnlineMode": True}))
+    assert ConfigHelper.get_version() == 1
+
+
+def test_wait_for_version_converges():
+    """Test that waiters see a change delivered within the timeout"""
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, ConfigHelper._on_change, json.dumps({"NewsLink": "x"}))
+        converged = await ConfigHelper.wait_for_version(1, timeout=1.0)
+        timed_out = await ConfigHelper.wait_for_version(2, timeout=0.05)
+        return converged, timed_out
+    
+    converged, timed_out = asyncio.run(scenario())
+    assert converged
+    assert not timed_out
+
+
+def test_resync_reloads_off_the_event_loop(monkeypatch):
+    """Test that a resync reads settings in a thread, and a change arriving meanwhile triggers one more read"""
+    reads = []
+    release = threading.Event()
+    
+    def read():
+        reads.append(threading.current_thread() is threading.main_thread())
+        release.wait(1.0)
+        return [("NewsLink", f"read {len(reads)}")]
+    
+    monkeypatch.setattr(ConfigHelper, "_read_with_new_session", read)
+    
+    async def scenario():
+        ConfigHelper._on_change(None)
+        while not reads:
+            await asyncio.sleep(0.01)
+        ConfigHelper._on_change(json.dumps({"OnlineMode": True}))
+        assert ConfigHelper.get_setting("NewsLink") == ""
+        release.set()
+        await ConfigHelper._reload_task
+    
+    asyncio.run(scenario())
+    assert reads == [False, False]
+    assert ConfigHelper.get_setting("NewsLink") == "read 2"
+    assert ConfigHelper.get_setting("OnlineMode") is True
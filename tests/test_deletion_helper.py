@@ -0,0 +1,84 @@
+import asyncio
+from datetime import timedelta
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+from sqlalchemy.orm import Session
+from app.controllers.invites import get_pending_invites, invite_player
+from app.helpers import deletion_helper
+from app.helpers.deletion_helper import DeletionHelper
+from app.helpers.invite_helper import InviteHelper
+from app.models.entities import DeletionJob, Invite, Player, World
+from app.schemas.requests import PlayerRequest
+from tests.sqlite_db import make_session
+
+
+def _where_clauses(*statements):
+    """Run statements through a session that records their final SQL instead of sending it"""
+    db = Session()
+    executed = []
+    
+    @event.listens_for(db, "do_orm_execute")
+    def capture(state):
+        executed.append(str(state.statement.compile(dialect=postgresql.dialect())).split("WHERE", 1)[-1])
+        return IteratorResult(SimpleResultMetaData([]), iter([]))
+    
+    for statement in statements:
+        db.execute(statement)
+    return executed
+
+
+def test_soft_deleted_worlds_are_hidden_unless_asked_for():
+    """Test that queries on worlds, directly or through a join, leave out soft-deleted ones unless include_deleted is set"""
+    hidden, joined, included = _where_clauses(
+        select(World).where(World.Id == 1),
+        select(Player).join(World, Player.WorldId == World.Id),
+        select(World).where(World.Id == 1).execution_options(include_deleted=True)
+    )
+    
+    assert '"Worlds"."DeletedAt" IS NULL' in hidden
+    assert '"Worlds"."DeletedAt" IS NULL' in joined
+    assert "DeletedAt" not in included
+
+
+def test_failed_jobs_back_off_exponentially_up_to_the_cap(monkeypatch):
+    """Test that each failed attempt doubles the delay before the next, up to MAX_BACKOFF"""
+    delays = []
+    
+    class RecordingSession:
+        def execute(self, statement):
+            params = statement.compile(dialect=postgresql.dialect()).params
+            delays.extend(value for value in params.values() if isinstance(value, timedelta))
+        
+        def commit(self):
+            pass
+        
+        def close(self):
+            pass
+    
+    monkeypatch.setattr(deletion_helper, "SessionLocal", RecordingSession)
+    for attempts in (0, 1, 3, 20):
+        DeletionHelper._retry_later(1, attempts, "failed")
+    
+    assert delays == [timedelta(seconds=seconds) for seconds in (10, 20, 80, DeletionHelper.MAX_BACKOFF)]
+
+
+def test_deleting_a_world_withdraws_its_open_invites(monkeypatch):
+    """Test that a soft-deleted world's invites leave the pending list and count, along with unaccepted players"""
+    monkeypatch.setattr(InviteHelper, "_pending_counts", {})
+    db, _ = make_session(World, Player, Invite, DeletionJob)
+    world = World(Name="Island", Owner="owner", OwnerUUID="owner-uuid")
+    db.add(world)
+    db.add(Player(Name="member", Uuid="member-uuid", Accepted=True, World=world))
+    db.commit()
+    asyncio.run(invite_player(world.Id, PlayerRequest(Name="guest", Uuid="guest-uuid"), world=world, db=db))
+    assert InviteHelper.get_pending_count(db, "guest-uuid") == 1
+    
+    DeletionHelper.soft_delete(db, world)
+    db.commit()
+    
+    pending = asyncio.run(get_pending_invites(player_info={"uuid": "guest-uuid"}, db=db))
+    assert pending.invites == []
+    assert InviteHelper.get_pending_count(db, "guest-uuid") == 0
+    remaining = db.execute(select(Player.Uuid).execution_options(include_deleted=True)).scalars().all()
+    assert remaining == ["member-uuid"]
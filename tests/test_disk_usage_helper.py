@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from app.helpers import disk_usage_helper
+from app.helpers.disk_usage_helper import (
+    DiskUsageHelper, MIB, parse_du_output, parse_project_report, parse_slot_usage, select_scans
+)
+
+
+def test_scan_output_maps_to_worlds():
+    """Test that du lines of mounted volumes become bytes per world, ignoring anything else"""
+    output = "1024\t/v/7\n0\t/v/12\ndu: /v/9: No such file or directory\n"
+    
+    assert parse_du_output(output) == {7: 1024 * 1024, 12: 0}
+
+
+def test_project_report_skips_other_projects():
+    """Test that only projects above the id base are reported, with usage and hard limit in bytes"""
+    output = "#0 0 0 0 00 [--------]\n#100007 2048 0 4096 00 [--------]\n#100012 10 0 0 00 [--------]\n"
+    
+    assert parse_project_report(output, 100000) == {7: (2048 * 1024, 4096 * 1024), 12: (10 * 1024, 0)}
+
+
+def test_only_changed_or_stale_volumes_are_rescanned():
+    """Test that stopped volumes keep their measurement until stale, and new ones go first"""
+    measured = {1: 1000.0, 2: 900.0, 3: 100.0}
+    
+    assert select_scans([1, 2, 3, 4], measured, active={2}, now=1100.0, max_age=500) == [4, 3, 2]
+    assert select_scans([1, 2, 3], measured, active=set(), now=1100.0, max_age=5000) == []
+
+
+def test_scan_output_maps_to_slots():
+    """Test that du lines of slot directories become bytes per slot of each world"""
+    output = "512\t/v/7/slot-1\n256\t/v/7/slot-3\n1024\t/v/7\n64\t/v/12/slot-2\n"
+    
+    assert parse_slot_usage(output) == {7: {1: 512 * 1024, 3: 256 * 1024}, 12: {2: 64 * 1024}}
+    assert parse_du_output(output) == {7: 1024 * 1024}
+
+
+def test_reset_only_counts_the_other_slots(monkeypatch):
+    """Test that a reset is held to the space the other slots leave, and to its own size without a breakdown"""
+    monkeypatch.setattr(disk_usage_helper.ResourceHelper, "get_disk_quota", lambda world: 100)
+    world = SimpleNamespace(Id=7)
+    
+    def session(row):
+        return SimpleNamespace(execute=lambda statement: SimpleNamespace(first=lambda: row))
+    
+    measured = session(SimpleNamespace(Bytes=95 * MIB, SlotBytes={"1": 90 * MIB, "2": 4 * MIB}))
+    assert not DiskUsageHelper.has_room(measured, world, 10 * MIB)
+    assert DiskUsageHelper.has_room(measured, world, 10 * MIB, replacing_slot=1)
+    assert not DiskUsageHelper.has_room(measured, world, 10 * MIB, replacing_slot=2)
+    
+    unbroken = session(SimpleNamespace(Bytes=95 * MIB, SlotBytes=None))
+    assert DiskUsageHelper.has_room(unbroken, world, 10 * MIB, replacing_slot=1)
+    assert not DiskUsageHelper.has_room(unbroken, world, 101 * MIB, replacing_slot=1)
@@ -0,0 +1,15 @@
+import pytest
+from app.helpers.docker_helper import DockerHelper
+
+
+def test_generation_properties_escape_the_seed():
+    """Test that reset options become server.properties lines a text seed cannot break out of"""
+    properties = DockerHelper.generation_properties("my seed\\\nop=1é", 1, False).decode("ascii")
+    
+    assert properties.splitlines() == [
+        "level-seed=my\\u0020seed\\u005c\\u000aop=1\\u00e9",
+        "level-type=flat",
+        "generate-structures=false"
+    ]
+    with pytest.raises(ValueError):
+        DockerHelper.generation_properties("", 4, True)
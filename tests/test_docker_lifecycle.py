@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import threading
+import pytest
+from tests.fake_docker import FakeDocker, docker_host, serve
+from app.helpers import activity_helper
+from app.helpers.activity_helper import ActivityHelper
+from app.helpers.container_state import ContainerState
+from app.helpers.docker_helper import DockerHelper, StreamHandle
+from app.helpers.stats_collector import StatsCollector
+
+
+@pytest.fixture
+def fake_docker(monkeypatch):
+    server, state = serve(state=FakeDocker(stats_interval=0.02))
+    monkeypatch.setenv("DOCKER_HOST", docker_host(server))
+    ContainerState.invalidate()
+    yield state
+    server.shutdown()
+    server.server_close()
+    ContainerState.invalidate()
+
+
+def test_start_and_stop_server(fake_docker):
+    """Test that a started server boots, shows up as running and stops through the console"""
+    async def run():
+        helper = DockerHelper(1)
+        await helper.create_volume()
+        port = await helper.start_server(1, files={"ops.json": b"[]"}, image="realm-server")
+        assert await helper.wait_until_ready(5)
+        assert await ContainerState.get_port(1) == port
+        
+        await helper.stop_server()
+        ContainerState.invalidate()
+        assert await ContainerState.get_running() == set()
+    
+    asyncio.run(run())
+    assert fake_docker.calls["start_exec"] == 1
+
+
+def test_boot_wait_timeout_releases_the_log_reader(fake_docker, monkeypatch):
+    """Test that a boot wait timing out closes the log stream, so its reader thread returns"""
+    finished = threading.Event()
+    wait_for_log = DockerHelper._wait_for_log
+    
+    def watched(stream, marker):
+        try:
+            return wait_for_log(stream, marker)
+        finally:
+            finished.set()
+    
+    monkeypatch.setattr(DockerHelper, "_wait_for_log", staticmethod(watched))
+    fake_docker.boot_time = 30
+    
+    async def run():
+        helper = DockerHelper(1)
+        await helper.start_server(1, image="realm-server")
+        return await helper.wait_until_ready(0.2)
+    
+    assert not asyncio.run(run())
+    assert finished.wait(2)
+
+
+def test_failed_switch_leaves_no_replacement_behind(fake_docker):
+    """Test that a replacement failing to start is removed, so the next switch can create it again"""
+    async def run():
+        helper = DockerHelper(2)
+        await helper.start_server(1, image="realm-server")
+        fake_docker.fail_next("start_container")
+        with pytest.raises(Exception):
+            await helper.replace_server(2, {}, {}, image="realm-server")
+        assert fake_docker.containers == {}
+        
+        await helper.replace_server(2, {}, {}, image="realm-server", timeout=5)
+        return await helper.get_running_slot()
+    
+    environment = asyncio.run(run())
+    assert environment["SLOT_ID"] == "2"
+    assert [container.name for container in fake_docker.containers.values()] == ["realm-server-2"]
+
+
+def test_stats_stream_fills_window(fake_docker):
+    """Test that the collector reads usage from the container's stats stream"""
+    asyncio.run(DockerHelper(3).start_server(1, image="realm-server"))
+    StatsCollector.sync({3})
+    try:
+        deadline = time.monotonic() + 5
+        while len(StatsCollector.get_window(3)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        summary = StatsCollector.get_summary(3)
+        assert summary["cpuPercent"] == 25.0
+        assert summary["pids"] == 30
+    finally:
+        StatsCollector.sync(set())
+
+
+def test_stopping_a_stats_stream_does_not_wait_for_a_frame(fake_docker):
+    """Test that a realm no longer running has its stats reader return at once"""
+    asyncio.run(DockerHelper(4).start_server(1, image="realm-server"))
+    fake_docker.stats_interval = 30
+    StatsCollector.sync({4})
+    deadline = time.monotonic() + 5
+    while fake_docker.calls["container_stats"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    reader = next(thread for thread in threading.enumerate() if thread.name == "stats-4")
+    
+    StatsCollector.sync(set())
+    reader.join(2)
+    assert not reader.is_alive()
+
+
+def test_tailer_skips_bad_lines_and_stops_at_once(fake_docker, monkeypatch):
+    """Test that a line failing to parse does not end the tailer, and that stopping it needs no new line"""
+    parsed = []
+    
+    def failing(world_id, line, uuids):
+        parsed.append(line)
+        raise ValueError("unexpected line")
+    
+    monkeypatch.setattr(activity_helper, "parse_line", failing)
+    monkeypatch.setattr(ActivityHelper, "_queue", activity_helper.deque())
+    asyncio.run(DockerHelper(5).start_server(1, image="realm-server"))
+    handle = StreamHandle()
+    tailer = threading.Thread(target=ActivityHelper._tail, args=(5, 1, handle), daemon=True)
+    tailer.start()
+    deadline = time.monotonic() + 5
+    while len(parsed) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(parsed) >= 2 and tailer.is_alive()
+    
+    handle.stop()
+    tailer.join(2)
+    assert not tailer.is_alive()
+    assert not ActivityHelper._queue
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from app.helpers.image_helper import CachedImage, ImageHelper, parse_tag_rules, select_evictions
+
+
+def test_versions_map_to_tags_by_rule():
+    """Test that each version takes the tag of the newest rule it reaches"""
+    ImageHelper.configure("localhost:5000/realm-server", parse_tag_rules("0.0=java8,1.20.5=java21,1.18=java17"))
+    
+    assert ImageHelper.get_image("1.21.1") == "localhost:5000/realm-server:java21"
+    assert ImageHelper.get_tag("1.20.4") == "java17"
+    assert ImageHelper.get_tag("1.12.2") == "java8"
+    assert ImageHelper.get_tag("24w14a") == "java21"
+    
+    ImageHelper.configure("realm-server", parse_tag_rules("0.0={version}"))
+    assert ImageHelper.get_tag("1.21.1") == "1.21.1"
+    ImageHelper.configure("realm-server", [])
+    assert ImageHelper.get_image("1.21.1") == "realm-server:latest"
+
+
+def test_evictions_are_lru_and_skip_images_in_use():
+    """Test that eviction frees the budget from the least recently used unused images"""
+    images = [
+        CachedImage("realm-server:a", 400, last_used=1),
+        CachedImage("realm-server:b", 400, last_used=2),
+        CachedImage("realm-server:c", 400, last_used=3),
+        CachedImage("realm-server:d", 400, last_used=4)
+    ]
+    
+    assert select_evictions(images, 1000, keep=set(), wanted=set()) == ["realm-server:a", "realm-server:b"]
+    assert select_evictions(images, 1000, keep={"realm-server:a"}, wanted=set()) == ["realm-server:b", "realm-server:c"]
+    assert select_evictions(images, 1000, keep=set(), wanted={"realm-server:a"}) == ["realm-server:b", "realm-server:c"]
+    assert select_evictions(images, 0, keep=set(), wanted=set()) == []
+
+
+def test_marking_an_image_used_publishes_off_the_event_loop(monkeypatch):
+    """Test that the use is recorded in memory at once and broadcast from a worker thread"""
+    published = []
+    monkeypatch.setattr(ImageHelper, "_last_used", {})
+    monkeypatch.setattr(ImageHelper, "_publish_use", lambda image, at: published.append(
+        (image, at, threading.current_thread() is threading.main_thread())
+    ))
+    
+    asyncio.run(ImageHelper.mark_used("realm-server:java21"))
+    
+    at = ImageHelper._last_used["realm-server:java21"]
+    assert published == [("realm-server:java21", at, False)]
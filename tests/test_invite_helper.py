@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from app.controllers.invites import accept_invite, get_pending_invites_count, invite_player, reject_invite
+from app.helpers.deletion_helper import DeletionHelper
+from app.helpers.invite_helper import InviteHelper
+from app.models.entities import DeletionJob, Invite, Player, World
+from app.schemas.requests import PlayerRequest
+from tests.sqlite_db import make_session
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(InviteHelper, "_pending_counts", {})
+    db, notified = make_session(World, Player, Invite, DeletionJob)
+    db.notified = notified
+    yield db
+    db.close()
+
+
+def _add_world(db, name: str) -> World:
+    world = World(Name=name, Owner="owner", OwnerUUID="owner-uuid")
+    db.add(world)
+    db.commit()
+    return world
+
+
+def _invite(db, world: World, uuid: str = "guest-uuid") -> None:
+    asyncio.run(invite_player(world.Id, PlayerRequest(Name="guest", Uuid=uuid), world=world, db=db))
+
+
+def _count(db, uuid: str = "guest-uuid") -> int:
+    return asyncio.run(get_pending_invites_count(player_info={"uuid": uuid}, db=db)).count
+
+
+def _invitation_id(db, world: World) -> str:
+    return db.query(Invite.InvitationId).filter(Invite.WorldId == world.Id).scalar()
+
+
+def test_count_follows_invites_accepts_and_rejects(db):
+    """Test that the cached count stays equal to the stored invites through each change"""
+    first, second, third = (_add_world(db, name) for name in ("a", "b", "c"))
+    assert _count(db) == 0
+    
+    for world in (first, second, third):
+        _invite(db, world)
+    assert _count(db) == 3
+    
+    asyncio.run(accept_invite(_invitation_id(db, first), player_info={"uuid": "guest-uuid"}, db=db))
+    assert _count(db) == 2
+    asyncio.run(reject_invite(_invitation_id(db, second), player_info={"uuid": "guest-uuid"}, db=db))
+    assert _count(db) == 1
+    
+    DeletionHelper.soft_delete(db, third)
+    db.commit()
+    assert _count(db) == 0
+    # Every cached count was also right when it was reloaded
+    InviteHelper.invalidate(None)
+    assert _count(db) == 0
+
+
+def test_changes_tell_other_workers_to_drop_their_count(db):
+    """Test that each change broadcasts the recipient, and that a broadcast drops the cached count"""
+    world = _add_world(db, "a")
+    assert _count(db) == 0
+    _invite(db, world)
+    
+    broadcasts = [message["key"] for message in db.notified if message["cache"] == InviteHelper.CACHE_NAME]
+    assert broadcasts == ["guest-uuid"]
+    InviteHelper.invalidate("guest-uuid")
+    assert "guest-uuid" not in InviteHelper._pending_counts
+    assert _count(db) == 1
@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.helpers.join_helper import JoinHelper
+from app.helpers.container_state import ContainerState
+from app.helpers.config_helper import ConfigHelper
+
+
+def test_join_uses_cached_address_and_starts_closed_worlds_once():
+    """Test that ready servers are joined from the map and closed ones start once"""
+    ConfigHelper._config_cache = {"DefaultServerAddress": "realms.example"}
+    JoinHelper._ready = {1: 25570}
+    JoinHelper._booting = {}
+    JoinHelper._starts = {}
+    world = SimpleNamespace(Id=1, ActiveSlot=SimpleNamespace(SlotId=1))
+    
+    async def scenario():
+        with patch.object(ContainerState, "get_running", AsyncMock(return_value={1})), \
+                patch.object(ContainerState, "get_port", AsyncMock(return_value=25570)), \
+                patch.object(JoinHelper, "_start", AsyncMock()) as start, \
+                patch("app.helpers.join_helper.OpsHelper.ops_json", return_value=b"[]"):
+            ready = await JoinHelper.join(MagicMock(), world, {}, None)
+            
+            # The server stopped outside the API, so joining starts it again, once
+            ContainerState.get_running.return_value = set()
+            ContainerState.get_port.return_value = None
+            first = await JoinHelper.join(MagicMock(), world, {}, None)
+            second = await JoinHelper.join(MagicMock(), world, {}, None)
+            await asyncio.sleep(0)
+            return ready, first, second, start.await_count
+    
+    ready, first, second, starts = asyncio.run(scenario())
+    assert ready == {"address": "realms.example:25570", "pendingUpdate": False}
+    assert first["pendingUpdate"] and second["pendingUpdate"]
+    assert starts == 1
@@ -0,0 +1,18 @@
+import asyncio
+from starlette.requests import Request
+from app.controllers.mco import get_news
+from app.helpers.config_helper import ConfigHelper
+
+
+def _news_etag(monkeypatch, news_link, version):
+    monkeypatch.setattr(ConfigHelper, "_config_cache", {"NewsLink": news_link})
+    monkeypatch.setattr(ConfigHelper, "_version", version)
+    request = Request({"type": "http", "method": "GET", "path": "/mco/v1/news", "headers": []})
+    return asyncio.run(get_news(request, cookie="", db=None)).headers["etag"]
+
+
+def test_news_tag_follows_the_link_not_the_worker(monkeypatch):
+    """Test that workers with different configuration versions tag the same link alike"""
+    first = _news_etag(monkeypatch, "https://example.com/a", 1)
+    assert _news_etag(monkeypatch, "https://example.com/a", 7) == first
+    assert _news_etag(monkeypatch, "https://example.com/b", 7) != first
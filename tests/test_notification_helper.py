@@ -0,0 +1,95 @@
+from unittest.mock import MagicMock
+from sqlalchemy.dialects import postgresql
+from app.helpers.notification_helper import NotificationHelper
+from app.helpers.shared_state import CacheInvalidator
+
+
+def _load(notifications):
+    NotificationHelper._notifications = [
+        (n_id, {"notificationUuid": n_uuid, "dismissable": dismissable})
+        for n_id, n_uuid, dismissable in notifications
+    ]
+    NotificationHelper._ids_by_uuid = {n_uuid: n_id for n_id, n_uuid, _ in notifications}
+    NotificationHelper._dismissable = {n_uuid for _, n_uuid, dismissable in notifications if dismissable}
+    NotificationHelper._seen = {"player": set()}
+    NotificationHelper._dirty = set()
+    NotificationHelper._newly_seen = {}
+
+
+def test_mark_seen_hides_notification():
+    """Test that seen notifications are no longer served"""
+    _load([(1, "a", False), (2, "b", False), (70, "c", False)])
+    
+    NotificationHelper.mark_seen(MagicMock(), "player", ["b", "c"])
+    
+    unseen = NotificationHelper.get_unseen(None, "player")
+    assert [n["notificationUuid"] for n in unseen] == ["a"]
+    assert NotificationHelper._dirty == {"player"}
+
+
+def test_dismiss_ignores_non_dismissable():
+    """Test that only dismissable notifications can be dismissed"""
+    _load([(1, "a", True), (2, "b", False)])
+    
+    NotificationHelper.dismiss(MagicMock(), "player", ["a", "b"])
+    
+    unseen = NotificationHelper.get_unseen(None, "player")
+    assert [n["notificationUuid"] for n in unseen] == ["b"]
+
+
+def test_unchanged_state_is_not_queued():
+    """Test that marking unknown notifications does not queue a write"""
+    _load([(1, "a", False)])
+    
+    db = MagicMock()
+    NotificationHelper.mark_seen(db, "player", ["unknown"])
+    
+    assert NotificationHelper._dirty == set()
+    db.commit.assert_not_called()
+
+
+def test_remote_seen_state_is_merged():
+    """Test that seen state broadcast by another worker is merged"""
+    _load([(1, "a", False), (2, "b", False)])
+    
+    NotificationHelper.merge_remote("player", {"ids": [2]})
+    
+    unseen = NotificationHelper.get_unseen(None, "player")
+    assert [n["notificationUuid"] for n in unseen] == ["a"]
+    # Only the worker that marked the notification persists it
+    assert NotificationHelper._dirty == set()
+
+
+def test_only_the_batched_writer_commits_and_broadcasts(monkeypatch):
+    """Test that marking is kept in memory until flush, which broadcasts just the newly seen Ids"""
+    _load([(1, "a", False), (2, "b", False), (70, "c", False)])
+    published = []
+    monkeypatch.setattr(
+        CacheInvalidator, "publish", lambda db, name, key, data: published.append((key, data))
+    )
+    
+    db = MagicMock()
+    NotificationHelper.mark_seen(db, "player", ["b"])
+    NotificationHelper.mark_seen(db, "player", ["b", "c"])
+    db.commit.assert_not_called()
+    assert published == []
+    
+    assert NotificationHelper.flush(db) == 1
+    assert published == [("player", {"ids": [2, 70]})]
+    db.commit.assert_called_once()
+    assert NotificationHelper._newly_seen == {}
+
+
+def test_flush_unions_new_ids_with_the_stored_ones(monkeypatch):
+    """Test that a flush writes only the new Ids and merges them on conflict instead of overwriting"""
+    _load([(1, "a", False), (2, "b", False), (100000, "c", False)])
+    NotificationHelper._seen = {"player": {1}}
+    monkeypatch.setattr(CacheInvalidator, "publish", lambda db, name, key, data: None)
+    
+    db = MagicMock()
+    NotificationHelper.mark_seen(db, "player", ["a", "c"])
+    NotificationHelper.flush(db)
+    
+    compiled = db.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    assert list(compiled.params.values()) == ["player", [100000]]
+    assert '"PlayerNotificationStates"."SeenIds" || excluded."SeenIds"' in str(compiled)
@@ -0,0 +1,30 @@
+import asyncio
+from types import SimpleNamespace
+from app.helpers import ops_helper
+from app.helpers.docker_helper import DockerHelper
+from app.helpers.ops_helper import OpsHelper
+from app.helpers.rcon import RconError, RconPool
+
+
+def test_batched_changes_reach_the_console_one_command_each(monkeypatch):
+    """Test that a batch falling back to rcon-cli runs one exec per command, since rcon-cli joins its arguments"""
+    executed = []
+    container = SimpleNamespace(
+        status="running",
+        exec_run=lambda command: executed.append(command) or SimpleNamespace(output=b"")
+    )
+    
+    class StubDockerHelper(DockerHelper):
+        def __init__(self, world_id: int):
+            self.world_id = world_id
+            self.docker_client = SimpleNamespace(containers=SimpleNamespace(get=lambda name: container))
+    
+    async def unreachable(world_id, commands, resolve):
+        raise RconError("No route to the container network")
+    
+    monkeypatch.setattr(ops_helper, "DockerHelper", StubDockerHelper)
+    monkeypatch.setattr(RconPool, "execute", unreachable)
+    monkeypatch.setattr(OpsHelper, "_pending", {7: {"alice": True, "bob": False}})
+    
+    assert asyncio.run(OpsHelper.flush()) == 2
+    assert executed == [["rcon-cli", "op alice"], ["rcon-cli", "deop bob"]]
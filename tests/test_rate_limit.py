@@ -0,0 +1,99 @@
+import asyncio
+from app.helpers.metrics import Metrics
+from app.middleware.coalescing import CoalescingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware, TokenBuckets, parse_player_uuid
+
+COOKIE = b"sid=token:abc:069a79f444e94726a5befca90e38aaf5;user=Notch;version=1.21.4"
+
+
+def make_scope(cookie: bytes = COOKIE, path: str = "/worlds") -> dict:
+    return {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [(b"cookie", cookie)]}
+
+
+def test_parses_uuid_from_cookie():
+    """Test that the player UUID is read from the sid part of the cookie"""
+    assert parse_player_uuid(COOKIE) == "069a79f444e94726a5befca90e38aaf5"
+    assert parse_player_uuid(b"user=Notch") is None
+
+
+def test_buckets_refill_over_time():
+    """Test that a burst is granted, then tokens come back at the rate"""
+    buckets = TokenBuckets(rate=2, burst=3, slots=16)
+    assert [buckets.take("a", now=100.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert buckets.take("a", now=100.0)[1] == 0.5
+    assert buckets.take("b", now=100.0)[0]
+    assert buckets.take("a", now=100.5)[0]
+    assert not buckets.take("a", now=100.5)[0]
+
+
+def test_buckets_are_shared_through_a_file(tmp_path):
+    """Test that two tables mapped from the same file see each other's tokens"""
+    path = str(tmp_path / "buckets")
+    first = TokenBuckets(rate=1, burst=1, slots=16, path=path)
+    second = TokenBuckets(rate=1, burst=1, slots=16, path=path)
+    assert first.take("a", now=100.0)[0]
+    assert not second.take("a", now=100.0)[0]
+
+
+def test_rejects_players_out_of_tokens():
+    """Test that a player over the limit gets 429 without reaching the app"""
+    calls = []
+    
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    
+    middleware = RateLimitMiddleware(app, TokenBuckets(rate=0.001, burst=1, slots=16), paths=("/worlds",))
+    statuses = []
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+    
+    async def run():
+        for _ in range(2):
+            await middleware(make_scope(), None, send)
+        await middleware(make_scope(path="/worlds/1"), None, send)
+    
+    before = Metrics.get("rate_limited_requests_total", path="/worlds")
+    asyncio.run(run())
+    assert statuses == [200, 429, 200]
+    assert calls == ["/worlds", "/worlds/1"]
+    assert Metrics.get("rate_limited_requests_total", path="/worlds") == before + 1
+
+
+def test_coalesces_identical_concurrent_requests():
+    """Test that identical requests in flight run the app once and all get its response"""
+    calls = []
+    
+    async def app(scope, receive, send):
+        calls.append(scope["headers"])
+        number = len(calls)
+        await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(number).encode()})
+    
+    middleware = CoalescingMiddleware(app, paths=("/worlds",))
+    
+    async def call(scope) -> bytes:
+        bodies = []
+        
+        async def send(message):
+            if message["type"] == "http.response.body":
+                bodies.append(message["body"])
+        
+        await middleware(scope, None, send)
+        return bodies[0]
+    
+    async def run():
+        return await asyncio.gather(
+            call(make_scope()), call(make_scope()), call(make_scope()),
+            call(make_scope(cookie=COOKIE.replace(b"Notch", b"Dinnerbone")))
+        )
+    
+    before = Metrics.get("coalesced_requests_total", path="/worlds")
+    bodies = asyncio.run(run())
+    assert len(calls) == 2
+    assert bodies[0] == bodies[1] == bodies[2] != bodies[3]
+    assert Metrics.get("coalesced_requests_total", path="/worlds") == before + 2
@@ -0,0 +1,23 @@
+import asyncio
+import pytest
+from app.helpers.rcon import RconClient, RconError
+from tests.fake_rcon import PASSWORD, start_fake_server
+
+
+def test_pipelined_commands_and_failed_login():
+    """Test that pipelined responses match their commands and bad passwords are refused"""
+    async def scenario():
+        server, port = await start_fake_server()
+        async with server:
+            client = await RconClient.connect("127.0.0.1", port, PASSWORD)
+            responses = await client.commands(["list", "list", "list"])
+            client.close()
+            
+            with pytest.raises(RconError):
+                await RconClient.connect("127.0.0.1", port, "wrong")
+            await asyncio.sleep(0.01)
+        return responses
+    
+    responses = asyncio.run(scenario())
+    assert len(responses) == 3
+    assert all(response.startswith("There are 0") for response in responses)
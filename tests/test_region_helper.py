@@ -0,0 +1,36 @@
+import time
+import pytest
+from app.helpers.region_helper import RegionHelper, RegionSample, parse_nodes
+from app.models.enums import RegionEnum, RegionServiceQualityEnum
+
+
+def test_recommend_prefers_manual_region_unless_poor():
+    """Test that manual preferences win unless the region is poor or unknown"""
+    RegionHelper.configure(parse_nodes("EastUs=east:2375,WestEurope=west:2375:10"))
+    now = time.monotonic()
+    RegionHelper._samples = {
+        RegionEnum.EastUs: RegionSample(ping_ms=20, load=0.1, measured_at=now),
+        RegionEnum.WestEurope: RegionSample(ping_ms=80, load=0.5, measured_at=now)
+    }
+    manual = {"regionSelectionPreference": "MANUAL", "preferredRegion": "WestEurope"}
+    
+    assert RegionHelper.get_quality(RegionEnum.EastUs) == RegionServiceQualityEnum.Great
+    assert RegionHelper.recommend(manual) == RegionEnum.WestEurope
+    assert RegionHelper.recommend({"regionSelectionPreference": 0}) == RegionEnum.EastUs
+    
+    # A full node is poor, so the manual choice falls back to the best region
+    RegionHelper._samples[RegionEnum.WestEurope].load = 1.0
+    assert RegionHelper.recommend(manual) == RegionEnum.EastUs
+    
+    # Stale samples are unknown
+    RegionHelper._samples[RegionEnum.EastUs].measured_at = now - RegionHelper.TTL - 1
+    assert RegionHelper.get_quality(RegionEnum.EastUs) == RegionServiceQualityEnum.Unknown
+    RegionHelper.configure([])
+
+
+def test_malformed_nodes_name_the_entry():
+    """Test that a malformed REGION_NODES entry is reported instead of crashing with a bare error"""
+    with pytest.raises(ValueError, match="Mars=red:2375"):
+        parse_nodes("EastUs=east:2375,Mars=red:2375")
+    with pytest.raises(ValueError, match="EastUs=east"):
+        parse_nodes("EastUs=east")
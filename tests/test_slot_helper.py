@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+from app.helpers.slot_helper import SlotHelper
+
+
+def make_slot(**options):
+    slot = dict(Version="1.21.1", Difficulty=2, GameMode=0, ForceGameMode=False, SpawnProtection=0, Hardcore=False)
+    slot.update(options)
+    return SimpleNamespace(**slot)
+
+
+def test_only_version_or_slot_changes_restart():
+    """Test that difficulty and game mode apply live while version and slot restart"""
+    running = {**SlotHelper.environment(make_slot()), "SLOT_ID": "1"}
+    changed = SlotHelper.environment(make_slot(Difficulty=3, GameMode=1))
+    
+    assert not SlotHelper.needs_restart(running, changed, 1)
+    assert SlotHelper.live_commands(running, changed) == {
+        "difficulty": "difficulty hard",
+        "defaultgamemode": "defaultgamemode creative"
+    }
+    assert SlotHelper.needs_restart(running, changed, 2)
+    assert SlotHelper.needs_restart(running, SlotHelper.environment(make_slot(Version="1.21.4")), 1)
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+from app.helpers import stats_collector
+from app.helpers.shared_state import CacheInvalidator
+from app.helpers.stats_collector import StatsCollector, StatsWindow, parse_stats
+
+
+def test_window_keeps_latest_samples_in_order():
+    """Test that the ring buffer overwrites the oldest samples once full"""
+    window = StatsWindow(3)
+    for i in range(5):
+        window.append(float(i), cpu=10.0 * i, memory=100.0 * i, pids=i)
+    
+    assert [sample["time"] for sample in window.samples()] == [2.0, 3.0, 4.0]
+    summary = window.summary()
+    assert summary["cpuPercent"] == 40.0
+    assert summary["cpuPercentAvg"] == 30.0
+    assert summary["memoryBytesMax"] == 400
+
+
+def test_parse_stats_excludes_page_cache():
+    """Test that CPU is computed from deltas and memory leaves out inactive files"""
+    stats = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 300}, "system_cpu_usage": 2000, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 100}, "system_cpu_usage": 1000},
+        "memory_stats": {"usage": 1000, "stats": {"inactive_file": 250}},
+        "pids_stats": {"current": 42}
+    }
+    assert parse_stats(stats) == (80.0, 750, 42)
+    assert parse_stats({"memory_stats": {}, "precpu_stats": {}}) is None
+
+
+def test_leader_shares_new_samples_with_other_workers(monkeypatch):
+    """Test that each pass broadcasts only the samples taken since the last, and that they fill other windows"""
+    published = []
+    monkeypatch.setattr(stats_collector, "SessionLocal", lambda: SimpleNamespace(commit=lambda: None, close=lambda: None))
+    monkeypatch.setattr(CacheInvalidator, "publish", lambda db, name, key, data: published.append((key, data)))
+    monkeypatch.setattr(StatsCollector, "_windows", {5: StatsWindow(3)})
+    monkeypatch.setattr(StatsCollector, "_shared_until", {})
+    
+    StatsCollector._windows[5].append(1.0, cpu=10.0, memory=100.0, pids=3)
+    assert StatsCollector.share() == 1
+    StatsCollector._windows[5].append(2.0, cpu=20.0, memory=200.0, pids=4)
+    assert StatsCollector.share() == 1
+    assert StatsCollector.share() == 0
+    
+    StatsCollector._windows.clear()
+    for key, data in published:
+        StatsCollector._on_message(key, data)
+    assert [sample["cpu"] for sample in StatsCollector.get_window(5)] == [10.0, 20.0]
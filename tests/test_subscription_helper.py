@@ -0,0 +1,14 @@
+from datetime import datetime
+from types import SimpleNamespace
+from app.helpers.subscription_helper import SubscriptionHelper
+
+
+def test_days_left_counts_whole_days():
+    """Test that days left matches the previous StartDate + 30 days arithmetic"""
+    now = datetime(2024, 1, 10, 12, 0)
+    subscription = SimpleNamespace(ExpiresAt=datetime(2024, 1, 31, 0, 0))
+    
+    assert SubscriptionHelper.days_left(subscription, now) == 20
+    assert SubscriptionHelper.days_left(subscription, datetime(2024, 1, 31, 0, 0)) == 0
+    # Just past expiry counts as expired
+    assert SubscriptionHelper.days_left(subscription, datetime(2024, 1, 31, 0, 1)) == -1
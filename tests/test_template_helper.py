@@ -0,0 +1,41 @@
+import tarfile
+import zipfile
+import orjson
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.helpers.template_helper import TemplateHelper, zip_to_tar
+
+
+def make_template(template_id, template_type):
+    return SimpleNamespace(
+        Id=template_id, Name=f"Map {template_id}", Version="1.21", Author="", Link="", Image=None,
+        Trailer="", RecommendedPlayers="", Type=template_type, WorldFile=None
+    )
+
+
+def test_pages_are_precomputed_per_type():
+    """Test that templates are paged by type in Id order without querying again"""
+    db = MagicMock()
+    templates = [make_template(i, "MINIGAME" if i % 2 else "ADVENTUREMAP") for i in range(1, 26)]
+    db.query.return_value.order_by.return_value.all.return_value = templates
+    TemplateHelper.load(db)
+    
+    second = orjson.loads(TemplateHelper.get_page("MINIGAME", 2, 10))
+    assert [t["id"] for t in second["templates"]] == [str(i) for i in range(21, 26, 2)]
+    assert second["total"] == 13
+    assert ("ADVENTUREMAP", 2, 10) in TemplateHelper._pages
+    assert orjson.loads(TemplateHelper.get_page("INSPIRATION", 1, 10))["templates"] == []
+    assert db.query.call_count == 1
+
+
+def test_zip_to_tar_strips_the_wrapping_folder(tmp_path):
+    """Test that a world wrapped in a folder is repacked relative to its level.dat"""
+    zip_path = tmp_path / "world.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("My Map/level.dat", b"level")
+        archive.writestr("My Map/region/r.0.0.mca", b"region")
+        archive.writestr("../evil", b"nope")
+    
+    zip_to_tar(zip_path, tmp_path / "world.tar")
+    with tarfile.open(tmp_path / "world.tar") as tar:
+        assert sorted(tar.getnames()) == ["level.dat", "region/r.0.0.mca"]
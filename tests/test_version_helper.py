@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from app.helpers.version_helper import VersionHelper, make_etag, open_worlds
+
+
+def test_world_list_tag_follows_server_state():
+    """Test that a server stopping outside the API changes the tag, and a bump forgets the known list"""
+    VersionHelper._players = {}
+    version = VersionHelper.get_player_version("player")
+    VersionHelper.remember_player_worlds("player", version, [3, 1])
+    
+    known = VersionHelper.get_player_worlds("player")
+    assert known == (1, 3)
+    running = make_etag("worlds", "player", version, open_worlds(known, {1, 3, 8}))
+    stopped = make_etag("worlds", "player", version, open_worlds(known, {1, 8}))
+    assert running != stopped
+    
+    VersionHelper._apply([], ["player"], version + 1)
+    assert VersionHelper.get_player_worlds("player") is None
+
+
+def test_latest_epoch_is_shared_by_all_workers():
+    """Test that a broadcast epoch replaces older versions and an older one is ignored"""
+    VersionHelper._worlds = {1: VersionHelper._epoch + 10}
+    epoch = VersionHelper._epoch + 100
+    
+    VersionHelper._on_message(VersionHelper.EPOCH_KEY, {"epoch": epoch})
+    VersionHelper._on_message(VersionHelper.EPOCH_KEY, {"epoch": epoch - 50})
+    
+    assert VersionHelper.get_world_version(1) == epoch
+    assert VersionHelper.get_world_version(2) == epoch
+    assert VersionHelper.get_player_version("player") == epoch
+
+
+def test_missed_messages_start_a_new_epoch_without_blocking(monkeypatch):
+    """Test that a resync invalidates tags at once and broadcasts the epoch from a thread"""
+    published = []
+    monkeypatch.setattr(VersionHelper, "_publish_epoch", lambda epoch: published.append(
+        (epoch, threading.current_thread() is threading.main_thread())
+    ))
+    VersionHelper._worlds = {1: VersionHelper._epoch + 10**12}
+    before = VersionHelper._epoch
+    
+    async def scenario():
+        VersionHelper._on_message(None, None)
+        assert VersionHelper._epoch > before
+        assert published == []
+        await VersionHelper._epoch_task
+    
+    asyncio.run(scenario())
+    assert published == [(VersionHelper._epoch, False)]